@@ -32,7 +32,7 @@ if typing.TYPE_CHECKING:
     from openage.convert.entity_object.conversion.aoc.genie_unit import GenieUnitObject,\
         GenieAmbientGroup, GenieBuildingLineGroup, GenieMonkGroup, GenieUnitLineGroup,\
         GenieUnitTaskGroup, GenieUnitTransformGroup, GenieVariantGroup, GenieVillagerGroup,\
-        GenieGameEntityGroup
+        GenieGameEntityGroup, GenieGarrisonMode
     from openage.convert.entity_object.export.media_export_request import MediaExportRequest
     from openage.convert.entity_object.export.metadata_export import MetadataExport
     from openage.convert.value_object.init.game_version import GameVersion
@@ -110,6 +110,9 @@ class GenieObjectContainer(ConverterObjectContainer):
         # Stores which line a unit is part of
         self.unit_ref: dict[int, GenieGameEntityGroup] = {}
 
+        # Secondary indexes of the unit and building lines (see index_lines())
+        self._clear_line_indexes()
+
         # Phase 3: sprites, sounds
         # Animation or Terrain graphics
         self.combined_sprites: dict[int, CombinedSprite] = {}
@@ -121,5 +124,57 @@ class GenieObjectContainer(ConverterObjectContainer):
         self.sound_exports: dict[int, MediaExportRequest] = {}
         self.metadata_exports: list[MetadataExport] = []
 
+    def index_lines(self) -> None:
+        """
+        Create the secondary indexes for the unit and building lines.
+
+        The indexes are ordered like the lines in unit_lines, followed
+        by building_lines. They have to be recreated when lines are
+        added or when the creatables of a line change, because the
+        garrison mode depends on them.
+        """
+        self._clear_line_indexes()
+
+        lines = {}
+        lines.update(self.unit_lines)
+        lines.update(self.building_lines)
+
+        for line in lines.values():
+            head_unit = line.get_head_unit()
+
+            self.head_unit_ref.setdefault(line.get_head_unit_id(), []).append(line)
+            self.class_lines.setdefault(line.get_class_id(), []).append(line)
+
+            if head_unit.has_member("unit_commands"):
+                command_types = set()
+                for command in head_unit["unit_commands"].value:
+                    type_id = command["type"].value
+                    if type_id not in command_types:
+                        command_types.add(type_id)
+                        self.command_lines.setdefault(type_id, []).append(line)
+
+            if line.is_creatable():
+                train_location_id = line.get_train_location_id()
+                self.creatable_lines.setdefault(train_location_id, []).append(line)
+
+            if line.is_garrison():
+                garrison_mode = line.get_garrison_mode()
+                self.garrison_mode_lines.setdefault(garrison_mode, []).append(line)
+
+    def _clear_line_indexes(self) -> None:
+        """
+        Reset the secondary indexes of the unit and building lines.
+        """
+        # key: head unit ID; value: lines with this head unit
+        self.head_unit_ref: dict[int, list[GenieGameEntityGroup]] = {}
+        # key: class ID; value: lines with this unit class
+        self.class_lines: dict[int, list[GenieGameEntityGroup]] = {}
+        # key: command type; value: lines that can execute the command
+        self.command_lines: dict[int, list[GenieGameEntityGroup]] = {}
+        # key: train location ID; value: lines created there
+        self.creatable_lines: dict[int, list[GenieGameEntityGroup]] = {}
+        # key: garrison mode; value: garrison lines with this mode
+        self.garrison_mode_lines: dict[GenieGarrisonMode, list[GenieGameEntityGroup]] = {}
+
     def __repr__(self):
         return "GenieObjectContainer"
@@ -32,6 +32,21 @@ class DataDefinition:
         """
         raise NotImplementedError(f"{type(self)} has not implemented dump() method")
 
+    def dump_to(self, stream: typing.TextIO) -> None:
+        """
+        Writes the human-readable content to a text stream.
+
+        Definitions with large contents override this to avoid
+        creating the whole content as a string.
+        """
+        stream.write(self.dump())
+
+    def release(self) -> None:
+        """
+        Free the content of the definition after it has been exported.
+        Only the target path is kept.
+        """
+
     def set_filename(self, filename: str) -> None:
         """
         Sets the filename for the file.
@@ -7,6 +7,9 @@ manages imports.
 from __future__ import annotations
 import typing
 
+import io
+from tempfile import SpooledTemporaryFile
+
 from .....nyan.nyan_structs import NyanObject
 from .....util.ordered_set import OrderedSet
 from ..data_definition import DataDefinition
@@ -17,6 +20,13 @@ if typing.TYPE_CHECKING:
 
 FILE_VERSION = "0.1.0"
 
+# Size of the dumped objects that is kept in memory before
+# they are moved to a temporary file
+OBJECT_SPOOL_SIZE = 4 * 1024 * 1024
+
+# Number of characters copied from the temporary file at once
+COPY_CHUNK_SIZE = 64 * 1024
+
 
 class NyanFile(DataDefinition):
     """
@@ -62,31 +72,49 @@ class NyanFile(DataDefinition):
         """
         Returns the string that represents the nyan file.
         """
-        fileinfo_str = f"# NYAN FILE\nversion {FILE_VERSION}\n\n"
-        import_str = ""
-        objects_str = ""
+        stream = io.StringIO()
+        self.dump_to(stream)
 
-        for nyan_object in self.nyan_objects:
-            objects_str += nyan_object.dump(import_tree=self.import_tree)
+        return stream.getvalue()
+
+    def dump_to(self, stream: typing.TextIO) -> None:
+        """
+        Writes the nyan file to a text stream.
 
-        # Removes one empty newline at the end of the objects definition
-        objects_str = objects_str[:-1]
+        The imports are only known after all objects have been dumped,
+        so the objects are written to a spooled temporary file first.
+        """
+        with SpooledTemporaryFile(max_size=OBJECT_SPOOL_SIZE, mode="w+",
+                                  encoding="utf-8", newline="\n") as objects_file:
+            for nyan_object in self.nyan_objects:
+                nyan_object.dump_to(objects_file, import_tree=self.import_tree)
 
-        import_aliases = self.import_tree.get_import_dict()
-        self.import_tree.clear_marks()
+            stream.write(f"# NYAN FILE\nversion {FILE_VERSION}\n\n")
 
-        for alias, fqon in import_aliases.items():
-            import_str += "import "
+            import_aliases = self.import_tree.get_import_dict()
+            self.import_tree.clear_marks()
 
-            import_str += ".".join(fqon)
+            for alias, fqon in import_aliases.items():
+                stream.write(f"import {'.'.join(fqon)} as {alias}\n")
 
-            import_str += f" as {alias}\n"
+            stream.write("\n")
 
-        import_str += "\n"
+            # Removes one empty newline at the end of the objects definition
+            objects_file.seek(0)
+            chunk = objects_file.read(COPY_CHUNK_SIZE)
+            while chunk:
+                next_chunk = objects_file.read(COPY_CHUNK_SIZE)
+                if not next_chunk:
+                    chunk = chunk[:-1]
 
-        output_str = fileinfo_str + import_str + objects_str
+                stream.write(chunk)
+                chunk = next_chunk
 
-        return output_str
+    def release(self) -> None:
+        """
+        Remove the nyan objects from the file after it has been exported.
+        """
+        self.nyan_objects = OrderedSet()
 
     def get_fqon(self) -> str:
         """
@@ -15,7 +15,7 @@ from ..util.fslike.wrapper import (DirectoryCreator,
                                    Synchronizer as AccessSynchronizer)
 from ..util.strings import format_progress
 from .service.debug_info import debug_cli_args, debug_game_version, debug_mounts
-from .service.init.conversion_required import conversion_required
+from .service.init.conversion_required import conversion_required, store_source_fingerprint
 from .service.init.mount_asset_dirs import mount_asset_dirs
 from .service.init.version_detect import create_version_objects
 from .tool.interactive import interactive_browser
@@ -59,6 +59,14 @@ def convert_assets(
     if "compression_level" not in vars(args):
         args.compression_level = 1
 
+    # Use all CPUs if the number of jobs was not set
+    if "jobs" not in vars(args):
+        args.jobs = None
+
+    # Check nyan objects once before they are exported
+    if "nyan_validation" not in vars(args):
+        args.nyan_validation = "deferred"
+
     # Set verbosity for debug output
     if "debug_info" not in vars(args) or not args.debug_info:
         if args.devmode:
@@ -128,6 +136,9 @@ def convert_assets(
 
         converted_count += 1
 
+    # remember the source files for detecting changes later
+    store_source_fingerprint(converted_path, srcdir.resolve_native_path())
+
     # clean args
     del args.srcdir
     del args.targetdir
@@ -182,10 +193,26 @@ def init_subparser(cli: ArgumentParser):
 
     cli.add_argument(
         "--no-pickle-cache", action='store_true',
-        help="don't use a pickle file to skip the dat file reading.")
+        help="don't use the gamespec cache to skip the dat file reading.")
+
+    cli.add_argument(
+        "--no-media-ledger", action='store_true',
+        help="convert all media files, even if they are unchanged since the last conversion.")
+
+    cli.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help=("number of worker processes/threads (default: number of CPUs). "
+              "Media files are always read by one thread and written by the main thread"))
+
+    cli.add_argument(
+        "--parallel-read", action='store_true',
+        help=("also use the worker processes to read the civs of the dat file "
+              "(experimental)"))
 
     cli.add_argument(
-        "--jobs", "-j", type=int, default=None)
+        "--nyan-validation", default="deferred", choices=["eager", "deferred", "off"],
+        help=("when to check the created nyan objects: on every change (eager), "
+              "once before export (deferred) or never (off)"))
 
     cli.add_argument(
         "--interactive", "-i", action='store_true',
@@ -205,7 +232,8 @@ def init_subparser(cli: ArgumentParser):
 
     cli.add_argument(
         "--low-memory", action='store_true',
-        help="Activate low memory mode")
+        help=("Activate low memory mode: parse dat records on access and "
+              "free data files as soon as they are written"))
 
 
 def main(args, error):
@@ -237,7 +265,7 @@ def main(args, error):
     from ..assets import get_asset_path
     outdir = get_asset_path(args.output_dir)
 
-    if args.force or wanna_convert() or conversion_required(outdir, args):
+    if args.force or wanna_convert() or conversion_required(outdir, args, args.source_dir):
         if not convert_assets(outdir, args, srcdir):
             err("game asset conversion failed")
             return 1
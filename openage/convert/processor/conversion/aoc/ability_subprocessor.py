@@ -80,6 +80,8 @@ class AoCAbilitySubprocessor:
         name_lookup_dict = internal_name_lookups.get_entity_lookups(dataset.game_version)
         command_lookup_dict = internal_name_lookups.get_command_lookups(dataset.game_version)
         gset_lookup_dict = internal_name_lookups.get_graphic_set_lookups(dataset.game_version)
+        civ_gset_lookup_dict = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_graphic_set_lookups, dataset.game_version, 0)
 
         game_entity_name = name_lookup_dict[current_unit_id][0]
 
@@ -158,11 +160,7 @@ class AoCAbilitySubprocessor:
 
                 if civ_animation_id != ability_animation_id:
                     # Find the corresponding graphics set
-                    graphics_set_id = -1
-                    for set_id, items in gset_lookup_dict.items():
-                        if civ_id in items[0]:
-                            graphics_set_id = set_id
-                            break
+                    graphics_set_id = civ_gset_lookup_dict.get(civ_id, (-1,))[0]
 
                     # Check if the object for the animation has been created before
                     obj_exists = graphics_set_id in handled_graphics_set_ids
@@ -329,6 +327,8 @@ class AoCAbilitySubprocessor:
         name_lookup_dict = internal_name_lookups.get_entity_lookups(dataset.game_version)
         command_lookup_dict = internal_name_lookups.get_command_lookups(dataset.game_version)
         gset_lookup_dict = internal_name_lookups.get_graphic_set_lookups(dataset.game_version)
+        civ_gset_lookup_dict = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_graphic_set_lookups, dataset.game_version, 0)
 
         game_entity_name = name_lookup_dict[head_unit_id][0]
 
@@ -413,11 +413,7 @@ class AoCAbilitySubprocessor:
 
                 if civ_animation_id != ability_animation_id:
                     # Find the corresponding graphics set
-                    graphics_set_id = -1
-                    for set_id, items in gset_lookup_dict.items():
-                        if civ_id in items[0]:
-                            graphics_set_id = set_id
-                            break
+                    graphics_set_id = civ_gset_lookup_dict.get(civ_id, (-1,))[0]
 
                     # Check if the object for the animation has been created before
                     obj_exists = graphics_set_id in handled_graphics_set_ids
@@ -2155,6 +2151,8 @@ class AoCAbilitySubprocessor:
 
         name_lookup_dict = internal_name_lookups.get_entity_lookups(dataset.game_version)
         gset_lookup_dict = internal_name_lookups.get_graphic_set_lookups(dataset.game_version)
+        civ_gset_lookup_dict = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_graphic_set_lookups, dataset.game_version, 0)
 
         game_entity_name = name_lookup_dict[current_unit_id][0]
 
@@ -2211,11 +2209,7 @@ class AoCAbilitySubprocessor:
 
                 if civ_animation_id != ability_animation_id:
                     # Find the corresponding graphics set
-                    graphics_set_id = -1
-                    for set_id, items in gset_lookup_dict.items():
-                        if civ_id in items[0]:
-                            graphics_set_id = set_id
-                            break
+                    graphics_set_id = civ_gset_lookup_dict.get(civ_id, (-1,))[0]
 
                     # Check if the object for the animation has been created before
                     obj_exists = graphics_set_id in handled_graphics_set_ids
@@ -2550,6 +2544,8 @@ class AoCAbilitySubprocessor:
 
         name_lookup_dict = internal_name_lookups.get_entity_lookups(dataset.game_version)
         gset_lookup_dict = internal_name_lookups.get_graphic_set_lookups(dataset.game_version)
+        civ_gset_lookup_dict = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_graphic_set_lookups, dataset.game_version, 0)
 
         game_entity_name = name_lookup_dict[current_unit_id][0]
 
@@ -2616,11 +2612,7 @@ class AoCAbilitySubprocessor:
 
                 if civ_animation_id != ability_animation_id:
                     # Find the corresponding graphics set
-                    graphics_set_id = -1
-                    for set_id, items in gset_lookup_dict.items():
-                        if civ_id in items[0]:
-                            graphics_set_id = set_id
-                            break
+                    graphics_set_id = civ_gset_lookup_dict.get(civ_id, (-1,))[0]
 
                     # Check if the object for the animation has been created before
                     obj_exists = graphics_set_id in handled_graphics_set_ids
@@ -4049,6 +4041,8 @@ class AoCAbilitySubprocessor:
 
         name_lookup_dict = internal_name_lookups.get_entity_lookups(dataset.game_version)
         gset_lookup_dict = internal_name_lookups.get_graphic_set_lookups(dataset.game_version)
+        civ_gset_lookup_dict = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_graphic_set_lookups, dataset.game_version, 0)
 
         game_entity_name = name_lookup_dict[current_unit_id][0]
 
@@ -4106,14 +4100,11 @@ class AoCAbilitySubprocessor:
 
                 if civ_animation_id != ability_animation_id:
                     # Find the corresponding graphics set
-                    for set_id, items in gset_lookup_dict.items():
-                        if civ_id in items[0]:
-                            graphics_set_id = set_id
-                            break
-
-                    else:
+                    if civ_id not in civ_gset_lookup_dict:
                         raise Exception(f"No graphics set found for civ id {civ_id}")
 
+                    graphics_set_id = civ_gset_lookup_dict[civ_id][0]
+
                     # Check if the object for the animation has been created before
                     obj_exists = graphics_set_id in handled_graphics_set_ids
                     if not obj_exists:
@@ -4319,6 +4310,8 @@ class AoCAbilitySubprocessor:
 
         name_lookup_dict = internal_name_lookups.get_entity_lookups(dataset.game_version)
         gset_lookup_dict = internal_name_lookups.get_graphic_set_lookups(dataset.game_version)
+        civ_gset_lookup_dict = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_graphic_set_lookups, dataset.game_version, 0)
 
         game_entity_name = name_lookup_dict[current_unit_id][0]
 
@@ -4380,11 +4373,7 @@ class AoCAbilitySubprocessor:
 
                 if civ_animation_id != ability_animation_id:
                     # Find the corresponding graphics set
-                    graphics_set_id = -1
-                    for set_id, items in gset_lookup_dict.items():
-                        if civ_id in items[0]:
-                            graphics_set_id = set_id
-                            break
+                    graphics_set_id = civ_gset_lookup_dict.get(civ_id, (-1,))[0]
 
                     # Check if the object for the animation has been created before
                     obj_exists = graphics_set_id in handled_graphics_set_ids
@@ -6729,6 +6718,8 @@ class AoCAbilitySubprocessor:
         name_lookup_dict = internal_name_lookups.get_entity_lookups(dataset.game_version)
         terrain_type_lookup_dict = internal_name_lookups.get_terrain_type_lookups(
             dataset.game_version)
+        restriction_type_index = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_terrain_type_lookups, dataset.game_version, 1)
 
         game_entity_name = name_lookup_dict[current_unit_id][0]
 
@@ -6743,12 +6734,12 @@ class AoCAbilitySubprocessor:
         # Allowed types
         allowed_types = []
         terrain_restriction = current_unit["terrain_restriction"].value
-        for terrain_type in terrain_type_lookup_dict.values():
-            # Check if terrain type is covered by terrain restriction
-            if terrain_restriction in terrain_type[1]:
-                type_name = f"util.terrain_type.types.{terrain_type[2]}"
-                type_obj = dataset.pregen_nyan_objects[type_name].get_nyan_object()
-                allowed_types.append(type_obj)
+        # Terrain types covered by the terrain restriction
+        for terrain_type_id in restriction_type_index.get(terrain_restriction, ()):
+            terrain_type = terrain_type_lookup_dict[terrain_type_id]
+            type_name = f"util.terrain_type.types.{terrain_type[2]}"
+            type_obj = dataset.pregen_nyan_objects[type_name].get_nyan_object()
+            allowed_types.append(type_obj)
 
         ability_raw_api_object.add_raw_member("allowed_types",
                                               allowed_types,
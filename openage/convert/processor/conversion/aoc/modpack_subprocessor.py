@@ -11,6 +11,8 @@ import typing
 
 
 from .....nyan.import_tree import ImportTree
+from .....nyan.nyan_structs import ValidationMode, get_validation_mode,\
+    validate_nyan_objects
 from ....entity_object.conversion.modpack import Modpack
 from ....entity_object.export.formats.nyan_file import NyanFile
 from ....value_object.conversion.forward_ref import ForwardRef
@@ -108,6 +110,12 @@ class AoCModpackSubprocessor:
 
             nyan_file.add_nyan_object(raw_api_object.get_nyan_object())
 
+        if get_validation_mode() is ValidationMode.DEFERRED:
+            # Check all objects before they are exported
+            validate_nyan_objects(nyan_object
+                                  for nyan_file in created_nyan_files.values()
+                                  for nyan_object in nyan_file.nyan_objects)
+
         # Create an import tree from the files
         import_tree = ImportTree()
 
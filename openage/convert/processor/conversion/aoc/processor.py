@@ -8,6 +8,7 @@ Convert data from AoC to openage formats.
 from __future__ import annotations
 import typing
 
+import numpy
 
 from .....log import info
 from ....entity_object.conversion.aoc.genie_civ import GenieCivilizationGroup
@@ -40,6 +41,7 @@ from ....entity_object.conversion.aoc.genie_unit import GenieVariantGroup
 from ....service.debug_info import debug_converter_objects,\
     debug_converter_object_groups
 from ....service.read.nyan_api_loader import load_api
+from ....value_object.read.value_members import ContainerMember
 from ....value_object.conversion.aoc.internal_nyan_names import AMBIENT_GROUP_LOOKUPS,\
     VARIANT_GROUP_LOOKUPS
 from .media_subprocessor import AoCMediaSubprocessor
@@ -168,6 +170,7 @@ class AoCProcessor:
         cls.link_researchables(full_data_set)
         cls.link_civ_uniques(full_data_set)
         cls.link_gatherers_to_dropsites(full_data_set)
+        full_data_set.index_lines()
         cls.link_garrison(full_data_set)
         cls.link_trade_posts(full_data_set)
         cls.link_repairables(full_data_set)
@@ -212,13 +215,13 @@ class AoCProcessor:
         # Gaia also seems to have the most units, so we only read from Gaia
         #
         # call hierarchy: wrapper[0]->civs[0]->units
-        raw_units = gamespec[0]["civs"][0]["units"].value
+        raw_units = gamespec[0]["civs"][0]["units"]
+        unit_ids = raw_units.table.get_ids().tolist()
 
         # Unit headers store the things units can do
         raw_unit_headers = gamespec[0]["unit_headers"].value
 
-        for raw_unit in raw_units:
-            unit_id = raw_unit["id0"].value
+        for unit_id, raw_unit in zip(unit_ids, raw_units.value):
             unit_members = raw_unit.value
 
             # Turn attack and armor into containers to make diffing work
@@ -249,18 +252,15 @@ class AoCProcessor:
         # Techs are stored as "researches".
         #
         # call hierarchy: wrapper[0]->researches
-        raw_techs = gamespec[0]["researches"].value
+        raw_techs = gamespec[0]["researches"]
+        tech_ids = raw_techs.table.get_ids().tolist()
 
-        index = 0
-        for raw_tech in raw_techs:
-            tech_id = index
+        for tech_id, raw_tech in zip(tech_ids, raw_techs.value):
             tech_members = raw_tech.value
 
             tech = GenieTechObject(tech_id, full_data_set, members=tech_members)
             full_data_set.genie_techs.update({tech.get_id(): tech})
 
-            index += 1
-
     @staticmethod
     def extract_genie_effect_bundles(
         gamespec: ArrayMember,
@@ -327,7 +327,13 @@ class AoCProcessor:
 
             civ_members = raw_civ.value
             units_member = civ_members.pop("units")
-            units_member = units_member.get_container("id0")
+
+            # Use the unit ID index of the unit table for the container
+            raw_units = units_member.value
+            units_member = ContainerMember(units_member.name, {
+                unit_id: raw_units[row]
+                for unit_id, row in units_member.table.get_index().items()
+            })
 
             civ_members.update({"units": units_member})
 
@@ -427,19 +433,21 @@ class AoCProcessor:
         :type gamespec: class: ...dataformat.value_members.ArrayMember
         """
         # call hierarchy: wrapper[0]->graphics
-        raw_graphics = gamespec[0]["graphics"].value
+        raw_graphics = gamespec[0]["graphics"]
+        graphics_table = raw_graphics.table
 
-        for raw_graphic in raw_graphics:
-            # Can be ignored if there is no filename associated
-            filename = raw_graphic["filename"].value
-            if not filename:
-                continue
+        graphic_ids = graphics_table.column("graphic_id").tolist()
+        slp_ids = graphics_table.column("slp_id").tolist()
+
+        # Can be ignored if there is no filename associated
+        with_filename = numpy.flatnonzero(graphics_table.column("filename").astype(bool))
 
-            graphic_id = raw_graphic["graphic_id"].value
-            graphic_members = raw_graphic.value
+        for row in with_filename.tolist():
+            graphic_id = graphic_ids[row]
+            graphic_members = raw_graphics[row].value
 
             graphic = GenieGraphic(graphic_id, full_data_set, members=graphic_members)
-            slp_id = raw_graphic["slp_id"].value
+            slp_id = slp_ids[row]
             if str(slp_id) not in full_data_set.existing_graphics:
                 graphic.exists = False
 
@@ -1220,6 +1228,15 @@ class AoCProcessor:
         garrison_lines = {}
         garrison_lines.update(full_data_set.unit_lines)
         garrison_lines.update(full_data_set.building_lines)
+        garrison_positions = {id(line): position
+                              for position, line in enumerate(garrison_lines.values())}
+
+        # Lines that are checked for every unit because their garrison
+        # is not determined by the unit's commands
+        garrison_mode_lines = full_data_set.garrison_mode_lines
+        unconditional_lines = []
+        unconditional_lines.extend(garrison_mode_lines.get(GenieGarrisonMode.SELF_PRODUCED, []))
+        unconditional_lines.extend(garrison_mode_lines.get(GenieGarrisonMode.MONK, []))
 
         # Search through all units and look at their garrison commands
         for unit_line in garrisoned_lines.values():
@@ -1246,7 +1263,25 @@ class AoCProcessor:
                     if unit_id > -1:
                         garrison_units.append(unit_id)
 
-            for garrison_line in garrison_lines.values():
+            # Join the garrison commands with the class and head unit indexes
+            candidates = {}
+            for class_id in garrison_classes:
+                for garrison_line in full_data_set.class_lines.get(class_id, []):
+                    candidates[id(garrison_line)] = garrison_line
+
+            for unit_id in garrison_units:
+                for garrison_line in full_data_set.head_unit_ref.get(unit_id, []):
+                    candidates[id(garrison_line)] = garrison_line
+
+            for garrison_line in unconditional_lines:
+                candidates[id(garrison_line)] = garrison_line
+
+            # Keep the order of a search through all garrison lines
+            candidates = sorted((line for line in candidates.values()
+                                 if id(line) in garrison_positions),
+                                key=lambda line: garrison_positions[id(line)])
+
+            for garrison_line in candidates:
                 if not garrison_line.is_garrison():
                     continue
 
@@ -1325,10 +1360,10 @@ class AoCProcessor:
                               process.
         :type full_data_set: class: ...dataformat.aoc.genie_object_container.GenieObjectContainer
         """
-        unit_lines = full_data_set.unit_lines.values()
+        unit_line_ids = {id(unit_line) for unit_line in full_data_set.unit_lines.values()}
 
-        for unit_line in unit_lines:
-            if unit_line.has_command(111):
+        for unit_line in full_data_set.command_lines.get(111, []):
+            if id(unit_line) in unit_line_ids:
                 head_unit = unit_line.get_head_unit()
                 unit_commands = head_unit["unit_commands"].value
                 trade_post_id = -1
@@ -1357,10 +1392,6 @@ class AoCProcessor:
         """
         villager_groups = full_data_set.villager_groups
 
-        repair_lines = {}
-        repair_lines.update(full_data_set.unit_lines)
-        repair_lines.update(full_data_set.building_lines)
-
         repair_classes = []
         for villager in villager_groups.values():
             repair_unit = villager.get_units_with_command(106)[0]
@@ -1383,6 +1414,6 @@ class AoCProcessor:
                 else:
                     repair_classes.append(class_id)
 
-        for repair_line in repair_lines.values():
-            if repair_line.get_class_id() in repair_classes:
+        for class_id in set(repair_classes):
+            for repair_line in full_data_set.class_lines.get(class_id, []):
                 repair_line.repairable = True
@@ -142,6 +142,7 @@ class DE1Processor:
         AoCProcessor.link_creatables(full_data_set)
         AoCProcessor.link_researchables(full_data_set)
         AoCProcessor.link_gatherers_to_dropsites(full_data_set)
+        full_data_set.index_lines()
         RoRProcessor.link_garrison(full_data_set)
         AoCProcessor.link_trade_posts(full_data_set)
         RoRProcessor.link_repairables(full_data_set)
@@ -181,11 +182,14 @@ class DE1Processor:
         :type gamespec: class: ...dataformat.value_members.ArrayMember
         """
         # call hierarchy: wrapper[0]->graphics
-        raw_graphics = gamespec[0]["graphics"].value
+        raw_graphics = gamespec[0]["graphics"]
+        graphics_table = raw_graphics.table
 
-        for raw_graphic in raw_graphics:
+        graphic_ids = graphics_table.column("graphic_id").tolist()
+        filenames = graphics_table.column("filename").tolist()
+
+        for row, filename in enumerate(filenames):
             # Can be ignored if there is no filename associated
-            filename = raw_graphic["filename"].value
             if not filename:
                 continue
 
@@ -197,8 +201,8 @@ class DE1Processor:
             if filename.endswith("<x#>"):
                 filename = f"{filename[:-4]}x1"
 
-            graphic_id = raw_graphic["graphic_id"].value
-            graphic_members = raw_graphic.value
+            graphic_id = graphic_ids[row]
+            graphic_members = raw_graphics[row].value
 
             graphic = GenieGraphic(graphic_id, full_data_set, members=graphic_members)
             if filename not in full_data_set.existing_graphics:
@@ -7,6 +7,7 @@ Convert data from DE2 to openage formats.
 from __future__ import annotations
 import typing
 
+import numpy
 
 from openage.convert.value_object.read.value_members import ArrayMember, StorageType
 import openage.convert.value_object.conversion.aoc.internal_nyan_names as aoc_internal
@@ -148,6 +149,7 @@ class DE2Processor:
         AoCProcessor.link_researchables(full_data_set)
         AoCProcessor.link_civ_uniques(full_data_set)
         AoCProcessor.link_gatherers_to_dropsites(full_data_set)
+        full_data_set.index_lines()
         AoCProcessor.link_garrison(full_data_set)
         AoCProcessor.link_trade_posts(full_data_set)
         AoCProcessor.link_repairables(full_data_set)
@@ -191,13 +193,15 @@ class DE2Processor:
         # Gaia also seems to have the most units, so we only read from Gaia
         #
         # call hierarchy: wrapper[0]->civs[0]->units
-        raw_units = gamespec[0]["civs"][0]["units"].value
+        raw_units = gamespec[0]["civs"][0]["units"]
+        unit_ids = raw_units.table.get_ids().tolist()
+        unit_types = raw_units.table.column("unit_type").tolist()
 
         # Unit headers store the things units can do
         raw_unit_headers = gamespec[0]["unit_headers"].value
 
-        for raw_unit in raw_units:
-            unit_id = raw_unit["id0"].value
+        for row, raw_unit in enumerate(raw_units.value):
+            unit_id = unit_ids[row]
             unit_members = raw_unit.value
 
             # Turn attack and armor into containers to make diffing work
@@ -216,7 +220,7 @@ class DE2Processor:
             # Commands
             if "unit_commands" not in unit_members.keys():
                 # Only ActionUnits with type >= 40 should have commands
-                unit_type = raw_unit["unit_type"].value
+                unit_type = unit_types[row]
                 if unit_type >= 40:
                     unit_commands = raw_unit_headers[unit_id]["unit_commands"]
                     unit.add_member(unit_commands)
@@ -237,16 +241,20 @@ class DE2Processor:
         :type gamespec: class: ...dataformat.value_members.ArrayMember
         """
         # call hierarchy: wrapper[0]->graphics
-        raw_graphics = gamespec[0]["graphics"].value
+        raw_graphics = gamespec[0]["graphics"]
+        graphics_table = raw_graphics.table
 
-        for raw_graphic in raw_graphics:
-            # Can be ignored if there is no filename associated
-            filename = raw_graphic["filename"].value.lower()
-            if not filename:
-                continue
+        graphic_ids = graphics_table.column("graphic_id").tolist()
+        filenames = graphics_table.column("filename").tolist()
 
-            graphic_id = raw_graphic["graphic_id"].value
-            graphic_members = raw_graphic.value
+        # Can be ignored if there is no filename associated
+        with_filename = numpy.flatnonzero(graphics_table.column("filename").astype(bool))
+
+        for row in with_filename.tolist():
+            filename = filenames[row].lower()
+
+            graphic_id = graphic_ids[row]
+            graphic_members = raw_graphics[row].value
             graphic = GenieGraphic(graphic_id, full_data_set, members=graphic_members)
 
             if filename not in full_data_set.existing_graphics:
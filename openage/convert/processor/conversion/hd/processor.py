@@ -141,6 +141,7 @@ class HDProcessor:
         AoCProcessor.link_researchables(full_data_set)
         AoCProcessor.link_civ_uniques(full_data_set)
         AoCProcessor.link_gatherers_to_dropsites(full_data_set)
+        full_data_set.index_lines()
         AoCProcessor.link_garrison(full_data_set)
         AoCProcessor.link_trade_posts(full_data_set)
         AoCProcessor.link_repairables(full_data_set)
@@ -699,6 +699,8 @@ class RoRNyanSubprocessor:
         terrain_lookup_dict = internal_name_lookups.get_terrain_lookups(dataset.game_version)
         terrain_type_lookup_dict = internal_name_lookups.get_terrain_type_lookups(
             dataset.game_version)
+        terrain_type_index = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_terrain_type_lookups, dataset.game_version, 0)
 
         # Start with the Terrain object
         terrain_name = terrain_lookup_dict[terrain_index][1]
@@ -715,11 +717,11 @@ class RoRNyanSubprocessor:
         # =======================================================================
         terrain_types = []
 
-        for terrain_type in terrain_type_lookup_dict.values():
-            if terrain_index in terrain_type[0]:
-                type_name = f"util.terrain_type.types.{terrain_type[2]}"
-                type_obj = dataset.pregen_nyan_objects[type_name].get_nyan_object()
-                terrain_types.append(type_obj)
+        for terrain_type_id in terrain_type_index.get(terrain_index, ()):
+            terrain_type = terrain_type_lookup_dict[terrain_type_id]
+            type_name = f"util.terrain_type.types.{terrain_type[2]}"
+            type_obj = dataset.pregen_nyan_objects[type_name].get_nyan_object()
+            terrain_types.append(type_obj)
 
         raw_api_object.add_raw_member("types", terrain_types, "engine.util.terrain.Terrain")
 
@@ -147,6 +147,7 @@ class RoRProcessor:
         AoCProcessor.link_creatables(full_data_set)
         AoCProcessor.link_researchables(full_data_set)
         AoCProcessor.link_gatherers_to_dropsites(full_data_set)
+        full_data_set.index_lines()
         cls.link_garrison(full_data_set)
         AoCProcessor.link_trade_posts(full_data_set)
         cls.link_repairables(full_data_set)
@@ -189,18 +190,21 @@ class RoRProcessor:
         # In RoR the normal civs are not subsets of the Gaia civ, so we search units from
         # Gaia and one player civ (egyptiians).
         raw_units = []
+        unit_ids = []
 
         # Gaia units
         # call hierarchy: wrapper[0]->civs[0]->units
-        raw_units.extend(gamespec[0]["civs"][0]["units"].value)
+        gaia_units = gamespec[0]["civs"][0]["units"]
+        raw_units.extend(gaia_units.value)
+        unit_ids.extend(gaia_units.table.get_ids().tolist())
 
         # Egyptians
         # call hierarchy: wrapper[0]->civs[1]->units
-        raw_units.extend(gamespec[0]["civs"][1]["units"].value)
-
-        for raw_unit in raw_units:
-            unit_id = raw_unit["id0"].value
+        civ_units = gamespec[0]["civs"][1]["units"]
+        raw_units.extend(civ_units.value)
+        unit_ids.extend(civ_units.table.get_ids().tolist())
 
+        for unit_id, raw_unit in zip(unit_ids, raw_units):
             if unit_id in full_data_set.genie_units.keys():
                 continue
 
@@ -635,10 +639,6 @@ class RoRProcessor:
         """
         villager_groups = full_data_set.villager_groups
 
-        repair_lines = {}
-        repair_lines.update(full_data_set.unit_lines)
-        repair_lines.update(full_data_set.building_lines)
-
         repair_classes = []
         for villager in villager_groups.values():
             repair_unit = villager.get_units_with_command(106)[0]
@@ -658,6 +658,6 @@ class RoRProcessor:
                 else:
                     repair_classes.append(class_id)
 
-        for repair_line in repair_lines.values():
-            if repair_line.get_class_id() in repair_classes:
+        for class_id in set(repair_classes):
+            for repair_line in full_data_set.class_lines.get(class_id, []):
                 repair_line.repairable = True
@@ -104,6 +104,8 @@ class SWGBCCAbilitySubprocessor:
         name_lookup_dict = internal_name_lookups.get_entity_lookups(dataset.game_version)
         command_lookup_dict = internal_name_lookups.get_command_lookups(dataset.game_version)
         gset_lookup_dict = internal_name_lookups.get_graphic_set_lookups(dataset.game_version)
+        civ_gset_lookup_dict = internal_name_lookups.get_reverse_lookups(
+            internal_name_lookups.get_graphic_set_lookups, dataset.game_version, 0)
 
         game_entity_name = name_lookup_dict[head_unit_id][0]
 
@@ -183,11 +185,7 @@ class SWGBCCAbilitySubprocessor:
 
                 if civ_animation_id != ability_animation_id:
                     # Find the corresponding graphics set
-                    graphics_set_id = -1
-                    for set_id, items in gset_lookup_dict.items():
-                        if civ_id in items[0]:
-                            graphics_set_id = set_id
-                            break
+                    graphics_set_id = civ_gset_lookup_dict.get(civ_id, (-1,))[0]
 
                     # Check if the object for the animation has been created before
                     obj_exists = graphics_set_id in handled_graphics_set_ids
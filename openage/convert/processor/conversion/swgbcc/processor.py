@@ -160,6 +160,7 @@ class SWGBCCProcessor:
         AoCProcessor.link_researchables(full_data_set)
         AoCProcessor.link_civ_uniques(full_data_set)
         AoCProcessor.link_gatherers_to_dropsites(full_data_set)
+        full_data_set.index_lines()
         cls.link_garrison(full_data_set)
         AoCProcessor.link_trade_posts(full_data_set)
         cls.link_repairables(full_data_set)
@@ -793,6 +794,15 @@ class SWGBCCProcessor:
         garrison_lines = {}
         garrison_lines.update(full_data_set.unit_lines)
         garrison_lines.update(full_data_set.building_lines)
+        garrison_positions = {id(line): position
+                              for position, line in enumerate(garrison_lines.values())}
+
+        # Lines that are checked for every unit because their garrison
+        # is not determined by the unit's commands
+        garrison_mode_lines = full_data_set.garrison_mode_lines
+        unconditional_lines = []
+        unconditional_lines.extend(garrison_mode_lines.get(GenieGarrisonMode.SELF_PRODUCED, []))
+        unconditional_lines.extend(garrison_mode_lines.get(GenieGarrisonMode.MONK, []))
 
         # Search through all units and look at their garrison commands
         for unit_line in garrisoned_lines.values():
@@ -819,7 +829,25 @@ class SWGBCCProcessor:
                     if unit_id > -1:
                         garrison_units.append(unit_id)
 
-            for garrison_line in garrison_lines.values():
+            # Join the garrison commands with the class and head unit indexes
+            candidates = {}
+            for class_id in garrison_classes:
+                for garrison_line in full_data_set.class_lines.get(class_id, []):
+                    candidates[id(garrison_line)] = garrison_line
+
+            for unit_id in garrison_units:
+                for garrison_line in full_data_set.head_unit_ref.get(unit_id, []):
+                    candidates[id(garrison_line)] = garrison_line
+
+            for garrison_line in unconditional_lines:
+                candidates[id(garrison_line)] = garrison_line
+
+            # Keep the order of a search through all garrison lines
+            candidates = sorted((line for line in candidates.values()
+                                 if id(line) in garrison_positions),
+                                key=lambda line: garrison_positions[id(line)])
+
+            for garrison_line in candidates:
                 if not garrison_line.is_garrison():
                     continue
 
@@ -905,10 +933,6 @@ class SWGBCCProcessor:
         """
         villager_groups = full_data_set.villager_groups
 
-        repair_lines = {}
-        repair_lines.update(full_data_set.unit_lines)
-        repair_lines.update(full_data_set.building_lines)
-
         repair_classes = []
         for villager in villager_groups.values():
             repair_unit = villager.get_units_with_command(106)[0]
@@ -934,6 +958,6 @@ class SWGBCCProcessor:
                 else:
                     repair_classes.append(class_id)
 
-        for repair_line in repair_lines.values():
-            if repair_line.get_class_id() in repair_classes:
+        for class_id in set(repair_classes):
+            for repair_line in full_data_set.class_lines.get(class_id, []):
                 repair_line.repairable = True
@@ -8,32 +8,214 @@ Exports data formats from a modpack to files.
 from __future__ import annotations
 import typing
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO, TextIOWrapper
+import multiprocessing
+import os
+from queue import Queue
+from threading import Thread
+
+from ....log import dbg
 
 if typing.TYPE_CHECKING:
     from openage.util.fslike.directory import Directory
+    from openage.util.fslike.path import Path
     from openage.convert.entity_object.export.data_definition import DataDefinition
 
 
+# Minimum number of data files for which worker processes are used
+MIN_PARALLEL_FILES = 64
+
+# Maximum number of written files waiting for the writer thread
+WRITE_QUEUE_SIZE = 256
+
+# State inherited by the worker processes:
+#   data_files: data files that are dumped
+_WORKER_STATE: dict[str, typing.Any] = {}
+
+
+def _dump_files(start: int, end: int) -> list[bytes]:
+    """
+    Dump the data files in [start, end) in a worker process.
+    """
+    contents = []
+    for data_file in _WORKER_STATE["data_files"][start:end]:
+        stream = StringIO()
+        data_file.dump_to(stream)
+        contents.append(stream.getvalue().encode('utf-8'))
+
+    return contents
+
+
 class DataExporter:
     """
     Writes the contents of a created modpack into a targetdir.
     """
 
     @staticmethod
-    def export(data_files: list[DataDefinition], exportdir: Directory) -> None:
+    def export(
+        data_files: list[DataDefinition],
+        exportdir: Directory,
+        release: bool = False,
+        jobs: int = 1
+    ) -> None:
         """
         Exports data files.
 
         :param data_files: Data definitions for data files.
         :param exportdir: Directory the resulting file(s) will be exported to. Target subfolder
                           and target filename should be stored in the export request.
+        :param release: Free the content of each data file after it has been written.
+                        The files are dumped serially then, because the worker
+                        processes would keep copies of all data files.
+        :param jobs: Number of worker processes that dump the files (number of CPUs for None).
         :type exportdir: Directory
         :type data_files: list
+        :type release: bool
+        :type jobs: int
         """
+        if release:
+            # save memory instead of time
+            jobs = 1
+
+        elif jobs is None:
+            jobs = os.cpu_count() or 1
+
+        if jobs > 1 and len(data_files) >= MIN_PARALLEL_FILES and\
+                "fork" in multiprocessing.get_all_start_methods():
+            DataExporter._export_parallel(data_files, exportdir, release, jobs)
+            return
+
         for data_file in data_files:
             output_dir = exportdir.joinpath(data_file.targetdir)
-            output_content = data_file.dump()
 
             # generate human-readable file
             with output_dir[data_file.filename].open('wb') as outfile:
-                outfile.write(output_content.encode('utf-8'))
+                textfile = TextIOWrapper(outfile, encoding='utf-8', newline='\n')
+                data_file.dump_to(textfile)
+
+                # flush and keep outfile open for the with statement
+                textfile.detach()
+
+            if release:
+                data_file.release()
+
+    @staticmethod
+    def _export_parallel(
+        data_files: list[DataDefinition],
+        exportdir: Directory,
+        release: bool,
+        jobs: int
+    ) -> None:
+        """
+        Dump the data files in forked worker processes, which inherit
+        the data files, and write them in a separate thread.
+
+        The results are handed to the writer in the order of data_files,
+        so the files are always written in the same order.
+        """
+        chunks = DataExporter._get_chunks(len(data_files), jobs)
+
+        dbg("dumping %d data files with %d processes", len(data_files), jobs)
+
+        write_queue: Queue[tuple[Path, bytes]] = Queue(maxsize=WRITE_QUEUE_SIZE)
+        writer_errors = []
+        writer = Thread(target=DataExporter._write_files,
+                        args=(write_queue, writer_errors),
+                        name="data-writer")
+
+        _WORKER_STATE["data_files"] = data_files
+        try:
+            with ProcessPoolExecutor(max_workers=jobs,
+                                     mp_context=multiprocessing.get_context("fork")) as pool:
+                # at most two chunks per worker are pending, which limits
+                # the memory used by dumped files that wait for writing
+                pending = deque()
+                next_chunk = 0
+                while next_chunk < len(chunks) and len(pending) < jobs * 2:
+                    pending.append((chunks[next_chunk], pool.submit(_dump_files,
+                                                                    *chunks[next_chunk])))
+                    next_chunk += 1
+
+                # the workers are forked on the first submit, before the writer starts
+                writer.start()
+
+                try:
+                    while pending:
+                        (start, end), future = pending.popleft()
+                        contents = future.result()
+
+                        if next_chunk < len(chunks):
+                            pending.append((chunks[next_chunk], pool.submit(_dump_files,
+                                                                            *chunks[next_chunk])))
+                            next_chunk += 1
+
+                        DataExporter._queue_files(data_files[start:end], contents,
+                                                  exportdir, write_queue, release)
+
+                finally:
+                    write_queue.put(None)
+                    writer.join()
+
+        finally:
+            _WORKER_STATE.clear()
+
+        if writer_errors:
+            raise writer_errors[0]
+
+    @staticmethod
+    def _get_chunks(file_count: int, jobs: int) -> list[tuple[int, int]]:
+        """
+        Returns the (start, end) ranges of the data files that are
+        dumped by one worker call.
+        """
+        # several chunks per worker, so that large files are balanced
+        chunk_size = max(1, file_count // (jobs * 8))
+        return [(start, min(start + chunk_size, file_count))
+                for start in range(0, file_count, chunk_size)]
+
+    @staticmethod
+    def _queue_files(
+        data_files: list[DataDefinition],
+        contents: list[bytes],
+        exportdir: Directory,
+        write_queue: Queue[tuple[Path, bytes]],
+        release: bool
+    ) -> None:
+        """
+        Hand the dumped contents of data files to the writer thread.
+        """
+        for data_file, content in zip(data_files, contents):
+            output_dir = exportdir.joinpath(data_file.targetdir)
+            write_queue.put((output_dir[data_file.filename], content))
+
+            if release:
+                data_file.release()
+
+    @staticmethod
+    def _write_files(
+        write_queue: Queue[tuple[Path, bytes]],
+        errors: list[Exception]
+    ) -> None:
+        """
+        Write the files from the queue until None is received.
+
+        After an error, the remaining files are skipped, so that
+        the queue does not block the dumping thread.
+        """
+        while True:
+            item = write_queue.get()
+            if item is None:
+                return
+
+            if errors:
+                continue
+
+            path, content = item
+            try:
+                with path.open('wb') as outfile:
+                    outfile.write(content)
+
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
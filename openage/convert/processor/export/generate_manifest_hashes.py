@@ -10,6 +10,7 @@ import typing
 
 import os
 
+from openage.convert.service.export.media_ledger import MEDIA_LEDGER_FILENAME
 from openage.util.hash import hash_file
 
 if typing.TYPE_CHECKING:
@@ -70,6 +71,10 @@ def generate_hashes(
     # traverse the directory with breadth-first way and
     # generate hash values for the items encountered
     for file in bfs_directory(exportdir):
-        hash_val = hash_file(file, hash_algo=hash_algo, bufsize=bufsize)
         relative_path = os.path.relpath(str(file), str(exportdir))
+        if relative_path == MEDIA_LEDGER_FILENAME:
+            # the ledger is only used by the converter
+            continue
+
+        hash_val = hash_file(file, hash_algo=hash_algo, bufsize=bufsize)
         modpack.manifest.add_hash_value(hash_val, relative_path)
@@ -7,17 +7,20 @@ Converts media requested by export requests to files.
 from __future__ import annotations
 import typing
 
+import io
 import logging
 import os
-
+import time
 
 from openage.convert.entity_object.export.texture import Texture
+from openage.convert.processor.export.media_pipeline import MediaExportPipeline,\
+    MEMORY_BUDGET, LOW_MEMORY_BUDGET, record_stage
 from openage.convert.service import debug_info
 from openage.convert.service.export.load_media_cache import load_media_cache
+from openage.convert.service.export.media_ledger import MediaExportLedger, hash_palettes
 from openage.convert.value_object.read.media.blendomatic import Blendomatic
 from openage.convert.value_object.read.media_types import MediaType
 from openage.log import dbg, info, get_loglevel
-from openage.util.strings import format_progress
 
 if typing.TYPE_CHECKING:
     from argparse import Namespace
@@ -31,6 +34,18 @@ if typing.TYPE_CHECKING:
 class MediaExporter:
     """
     Provides functions for converting media files and writing them to a targetdir.
+
+    Every media type is exported in three steps, which are run by
+    a MediaExportPipeline:
+        - read: read the source file (reader thread)
+        - convert: decode, pack and compress the media (worker process)
+        - write: write the result and notify the observers of the request (main thread)
+
+    The files are written in the same order as in a serial export.
+
+    Files that were exported with the same source data and settings
+    before are taken from the media export ledger of the modpack. Their
+    metadata is replayed to the observers instead of converting them.
     """
 
     @staticmethod
@@ -59,40 +74,50 @@ class MediaExporter:
         if args.game_version.edition.media_cache:
             cache_info = load_media_cache(args.game_version.edition.media_cache)
 
+        jobs = args.jobs
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+
+        # CPUs that are not used by worker processes run PNG compression trials
+        png_threads = max(1, (os.cpu_count() or 1) // jobs)
+
+        memory_budget = MEMORY_BUDGET
+        if args.flag("low_memory"):
+            memory_budget = LOW_MEMORY_BUDGET
+
+        ledger = None
+        if not args.flag("no_media_ledger"):
+            ledger = MediaExportLedger(exportdir)
+
         for media_type in export_requests.keys():
             cur_export_requests = export_requests[media_type]
 
-            export_func = None
-            kwargs = {}
-            if media_type is MediaType.TERRAIN:
-                # Game version and palettes
-                kwargs["game_version"] = args.game_version
-                kwargs["palettes"] = args.palettes
-                kwargs["compression_level"] = args.compression_level
-                export_func = MediaExporter._export_terrain
-                info("-- Exporting terrain files...")
-
-            elif media_type is MediaType.GRAPHICS:
-                kwargs["palettes"] = args.palettes
-                kwargs["compression_level"] = args.compression_level
-                kwargs["cache_info"] = cache_info
-                export_func = MediaExporter._export_graphics
-                info("-- Exporting graphics files...")
+            steps, kwargs, settings = MediaExporter._get_export_steps(
+                media_type,
+                args,
+                cache_info,
+                png_threads
+            )
 
-            elif media_type is MediaType.SOUNDS:
-                export_func = MediaExporter._export_sound
-                info("-- Exporting sound files...")
+            media_ledger = ledger
+            if settings is None:
+                media_ledger = None
 
-            elif media_type is MediaType.BLEND:
-                kwargs["blend_mode_count"] = args.blend_mode_count
-                export_func = MediaExporter._export_blend
-                info("-- Exporting blend files...")
+            pipeline = MediaExportPipeline(
+                steps,
+                sourcedir,
+                exportdir,
+                kwargs,
+                jobs=jobs,
+                ledger=media_ledger,
+                settings=settings,
+                memory_budget=memory_budget
+            )
+            pipeline.run(cur_export_requests)
+            pipeline.log_stats()
 
-            total_count = len(cur_export_requests)
-            for count, request in enumerate(cur_export_requests, start = 1):
-                export_func(request, sourcedir, exportdir, **kwargs)
-                print(f"-- Files done: {format_progress(count, total_count)}",
-                      end = "\r", flush = True)
+        if ledger is not None:
+            ledger.save()
 
         if args.debug_info > 5:
             cachedata = {}
@@ -119,38 +144,139 @@ class MediaExporter:
             )
 
     @staticmethod
-    def _export_blend(
+    def _get_export_steps(
+        media_type: MediaType,
+        args: Namespace,
+        cache_info: dict,
+        png_threads: int
+    ) -> tuple[tuple, dict[str, typing.Any], typing.Union[str, None]]:
+        """
+        Returns the pipeline steps for a media type, the keyword arguments
+        of the read and convert steps and the export settings that are
+        not part of the source data (None if the files are always converted).
+
+        :param media_type: Media type of the exported files.
+        :param args: Converter arguments.
+        :param cache_info: Media cache information with compression parameters.
+        :param png_threads: Number of threads used for PNG compression.
+        :type media_type: MediaType
+        :type args: Namespace
+        :type cache_info: dict
+        :type png_threads: int
+        """
+        steps = None
+        kwargs = {}
+        settings = None
+        if media_type is MediaType.TERRAIN:
+            # Game version and palettes
+            kwargs["game_version"] = args.game_version
+            kwargs["palettes"] = args.palettes
+            kwargs["compression_level"] = args.compression_level
+            kwargs["png_threads"] = png_threads
+            steps = (MediaExporter._read_terrain,
+                     MediaExporter._convert_terrain,
+                     MediaExporter._write_png_result,
+                     None)
+            settings = "|".join((args.game_version.edition.game_id,
+                                 hash_palettes(args.palettes)))
+            info("-- Exporting terrain files...")
+
+        elif media_type is MediaType.GRAPHICS:
+            kwargs["palettes"] = args.palettes
+            kwargs["compression_level"] = args.compression_level
+            kwargs["cache_info"] = cache_info
+            kwargs["png_threads"] = png_threads
+            steps = (MediaExporter._read_graphics,
+                     MediaExporter._convert_graphics,
+                     MediaExporter._write_graphics,
+                     MediaExporter._notify_graphics)
+            settings = hash_palettes(args.palettes)
+            info("-- Exporting graphics files...")
+
+        elif media_type is MediaType.SOUNDS:
+            steps = (MediaExporter._read_sound,
+                     MediaExporter._convert_sound,
+                     MediaExporter._write_sound,
+                     None)
+            settings = ""
+            info("-- Exporting sound files...")
+
+        elif media_type is MediaType.BLEND:
+            kwargs["blend_mode_count"] = args.blend_mode_count
+            steps = (MediaExporter._read_blend,
+                     MediaExporter._convert_blend,
+                     MediaExporter._write_blend,
+                     None)
+            info("-- Exporting blend files...")
+
+        return steps, kwargs, settings
+
+    @staticmethod
+    def _read_blend(
         export_request: MediaExportRequest,
         sourcedir: Path,
-        exportdir: Path,
-        blend_mode_count: int = None
-    ) -> None:
+        _exportdir: Path,
+        **_kwargs
+    ) -> tuple[Path, tuple]:
         """
-        Convert and export a blending mode.
+        Read the source file of a blending mode.
 
         :param export_request: Export request for a blending mask.
         :param sourcedir: Directory where all media assets are mounted. Source subfolder and
                           source filename should be stored in the export request.
-        :param exportdir: Directory the resulting file(s) will be exported to. Target subfolder
-                          and target filename should be stored in the export request.
-        :param blend_mode_count: Number of blending modes extracted from the source file.
+        :param _exportdir: Unused, the file is written by the write step.
         :type export_request: MediaExportRequest
         :type sourcedir: Path
-        :type exportdir: Path
-        :type blend_mode_count: int
         """
         source_file = sourcedir.joinpath(export_request.source_filename)
 
-        media_file = source_file.open("rb")
-        blend_data = Blendomatic(media_file, blend_mode_count)
+        with source_file.open("rb") as media_file:
+            return source_file, (media_file.read(),)
 
-        from .texture_merge import merge_frames
+    @staticmethod
+    def _convert_blend(
+        source_data: tuple,
+        blend_mode_count: int = None,
+        **_kwargs
+    ) -> list[bytes]:
+        """
+        Convert the blending modes to PNG files.
 
+        :param source_data: Data of the source file.
+        :param blend_mode_count: Number of blending modes extracted from the source file.
+        :type source_data: tuple
+        :type blend_mode_count: int
+        """
+        start = time.perf_counter()
+        blend_data = Blendomatic(io.BytesIO(source_data[0]), blend_mode_count)
         textures = blend_data.get_textures()
-        for idx, texture in enumerate(textures):
+        start = record_stage("decode", start)
+
+        from .texture_merge import merge_frames
+
+        png_files = []
+        for texture in textures:
             merge_frames(texture)
-            MediaExporter.save_png(
-                texture,
+            start = record_stage("pack", start)
+
+            png_files.append(MediaExporter.create_png(texture))
+            start = record_stage("compress", start)
+
+        return png_files
+
+    @staticmethod
+    def _write_blend(
+        export_request: MediaExportRequest,
+        exportdir: Path,
+        source_file: Path,
+        png_files: list[bytes]
+    ) -> None:
+        """
+        Write the PNG files of the blending modes.
+        """
+        for idx, png_data in enumerate(png_files):
+            MediaExporter.write_png(
+                png_data,
                 exportdir[export_request.targetdir],
                 f"{export_request.target_filename}{idx}.png"
             )
@@ -163,29 +289,26 @@ class MediaExporter:
                 )
 
     @staticmethod
-    def _export_graphics(
+    def _read_graphics(
         export_request: MediaExportRequest,
         sourcedir: Path,
-        exportdir: Path,
-        palettes: dict[int, ColorTable],
+        _exportdir: Path,
         compression_level: int,
-        cache_info: dict = None
-    ) -> None:
+        cache_info: dict = None,
+        **_kwargs
+    ) -> tuple[Path, tuple]:
         """
-        Convert and export a graphics file.
+        Read the source file of a graphics file and look up its
+        compression parameters.
 
         :param export_request: Export request for a graphics file.
         :param sourcedir: Directory where all media assets are mounted. Source subfolder and
                           source filename should be stored in the export request.
-        :param exportdir: Directory the resulting file(s) will be exported to. Target subfolder
-                          and target filename should be stored in the export request.
-        :param palettes: Palettes used by the game.
+        :param _exportdir: Unused, the file is written by the write step.
         :param compression_level: PNG compression level for the resulting image file.
         :param cache_info: Media cache information with compression parameters from a previous run.
         :type export_request: MediaExportRequest
         :type sourcedir: Path
-        :type exportdir: Path
-        :type palettes: dict
         :type compression_level: int
         :type cache_info: tuple
         """
@@ -209,21 +332,8 @@ class MediaExporter:
 
             media_file = source_file.open("rb")
 
-        if source_file.suffix.lower() == ".slp":
-            from ...value_object.read.media.slp import SLP
-            image = SLP(media_file.read())
-
-        elif source_file.suffix.lower() == ".smp":
-            from ...value_object.read.media.smp import SMP
-            image = SMP(media_file.read())
-
-        elif source_file.suffix.lower() == ".smx":
-            from ...value_object.read.media.smx import SMX
-            image = SMX(media_file.read())
-
-        elif source_file.suffix.lower() == ".sld":
-            from ...value_object.read.media.sld import SLD
-            image = SLD(media_file.read())
+        with media_file:
+            media_data = media_file.read()
 
         packer_cache = None
         compr_cache = None
@@ -235,21 +345,93 @@ class MediaExporter:
                 compression_level = cache_params["compr_settings"][0]
                 compr_cache = cache_params["compr_settings"][1:]
 
+        return source_file, (
+            source_file.suffix.lower(),
+            media_data,
+            compression_level,
+            packer_cache,
+            compr_cache
+        )
+
+    @staticmethod
+    def _convert_graphics(
+        source_data: tuple,
+        palettes: dict[int, ColorTable],
+        png_threads: int = 1,
+        **_kwargs
+    ) -> tuple[bytes, list[dict[str, int]]]:
+        """
+        Convert a graphics file to a PNG file and its sprite metadata.
+
+        :param source_data: Suffix and data of the source file, compression level,
+                            packer and compression parameters from the cache.
+        :param palettes: Palettes used by the game.
+        :param png_threads: Number of threads used for PNG compression.
+        :type source_data: tuple
+        :type palettes: dict
+        :type png_threads: int
+        """
+        suffix, media_data, compression_level, packer_cache, compr_cache = source_data
+
+        start = time.perf_counter()
+        if suffix == ".slp":
+            from ...value_object.read.media.slp import SLP
+            image = SLP(media_data)
+
+        elif suffix == ".smp":
+            from ...value_object.read.media.smp import SMP
+            image = SMP(media_data)
+
+        elif suffix == ".smx":
+            from ...value_object.read.media.smx import SMX
+            image = SMX(media_data)
+
+        elif suffix == ".sld":
+            from ...value_object.read.media.sld import SLD
+            image = SLD(media_data)
+
+        else:
+            raise Exception(f"Cannot convert graphics with extension {suffix}")
+
         from .texture_merge import merge_frames
 
         texture = Texture(image, palettes)
+        start = record_stage("decode", start)
+
         merge_frames(texture, cache=packer_cache)
-        MediaExporter.save_png(
+        start = record_stage("pack", start)
+
+        png_data = MediaExporter.create_png(
             texture,
-            exportdir[export_request.targetdir],
-            export_request.target_filename,
             compression_level=compression_level,
-            cache=compr_cache
+            cache=compr_cache,
+            threads=png_threads
         )
-        metadata = {export_request.target_filename: texture.get_metadata()}
-        export_request.set_changed()
-        export_request.notify_observers(metadata)
-        export_request.clear_changed()
+        record_stage("compress", start)
+
+        return png_data, texture.get_metadata()
+
+    @staticmethod
+    def _write_graphics(
+        export_request: MediaExportRequest,
+        exportdir: Path,
+        source_file: Path,
+        result: tuple[bytes, list[dict[str, int]]]
+    ) -> list[dict[str, int]]:
+        """
+        Write the PNG file of a graphics file and pass the sprite
+        metadata to the observers of the export request.
+
+        Returns the sprite metadata.
+        """
+        png_data, image_metadata = result
+
+        MediaExporter.write_png(
+            png_data,
+            exportdir[export_request.targetdir],
+            export_request.target_filename
+        )
+        MediaExporter._notify_graphics(export_request, image_metadata)
 
         if get_loglevel() <= logging.DEBUG:
             MediaExporter.log_fileinfo(
@@ -257,6 +439,22 @@ class MediaExporter:
                 exportdir[export_request.targetdir, export_request.target_filename]
             )
 
+        return image_metadata
+
+    @staticmethod
+    def _notify_graphics(
+        export_request: MediaExportRequest,
+        image_metadata: list[dict[str, int]]
+    ) -> None:
+        """
+        Pass the sprite metadata of a graphics file to the
+        observers of the export request.
+        """
+        metadata = {export_request.target_filename: image_metadata}
+        export_request.set_changed()
+        export_request.notify_observers(metadata)
+        export_request.clear_changed()
+
     @staticmethod
     def _export_interface(
         export_request: MediaExportRequest,
@@ -280,22 +478,21 @@ class MediaExporter:
         # TODO: Implement
 
     @staticmethod
-    def _export_sound(
+    def _read_sound(
         export_request: MediaExportRequest,
         sourcedir: Path,
-        exportdir: Path,
-    ) -> None:
+        _exportdir: Path,
+        **_kwargs
+    ) -> typing.Union[tuple[Path, tuple], None]:
         """
-        Convert and export a sound file.
+        Read the source file of a sound file.
 
         :param export_request: Export request for a sound file.
         :param sourcedir: Directory where all media assets are mounted. Source subfolder and
                           source filename should be stored in the export request.
-        :param exportdir: Directory the resulting file(s) will be exported to. Target subfolder
-                          and target filename should be stored in the export request.
+        :param _exportdir: Unused, the file is written by the write step.
         :type export_request: MediaExportRequest
         :type sourcedir: Path
-        :type exportdir: Path
         """
         source_file = sourcedir[
             export_request.get_type().value,
@@ -308,15 +505,39 @@ class MediaExporter:
 
         else:
             # TODO: Filter files that do not exist out sooner
-            return
+            return None
 
+        return source_file, (media_file,)
+
+    @staticmethod
+    def _convert_sound(source_data: tuple, **_kwargs) -> bytes:
+        """
+        Encode a sound file with opus.
+
+        :param source_data: Data of the source file.
+        :type source_data: tuple
+        """
         from ...service.export.opus.opusenc import encode
 
-        soundata = encode(media_file)
+        start = time.perf_counter()
+        soundata = encode(source_data[0])
+        record_stage("compress", start)
 
         if isinstance(soundata, (str, int)):
             raise Exception(f"opusenc failed: {soundata}")
 
+        return soundata
+
+    @staticmethod
+    def _write_sound(
+        export_request: MediaExportRequest,
+        exportdir: Path,
+        source_file: Path,
+        soundata: bytes
+    ) -> None:
+        """
+        Write an encoded sound file.
+        """
         export_file = exportdir[
             export_request.targetdir,
             export_request.target_filename
@@ -332,30 +553,26 @@ class MediaExporter:
             )
 
     @staticmethod
-    def _export_terrain(
+    def _read_terrain(
         export_request: MediaExportRequest,
         sourcedir: Path,
         exportdir: Path,
-        palettes: dict[int, ColorTable],
-        game_version: GameVersion,
-        compression_level: int
-    ) -> None:
+        compression_level: int,
+        **_kwargs
+    ) -> typing.Union[tuple[Path, tuple], None]:
         """
-        Convert and export a terrain graphics file.
+        Read the source file of a terrain graphics file. PNG files
+        are copied to the export directory directly.
 
         :param export_request: Export request for a terrain graphics file.
         :param sourcedir: Directory where all media assets are mounted. Source subfolder and
                           source filename should be stored in the export request.
         :param exportdir: Directory the resulting file(s) will be exported to. Target subfolder
                           and target filename should be stored in the export request.
-        :param game_version: Game edition and expansion info.
-        :param palettes: Palettes used by the game.
         :param compression_level: PNG compression level for the resulting image file.
         :type export_request: MediaExportRequest
         :type sourcedir: Directory
         :type exportdir: Directory
-        :type palettes: dict
-        :type game_version: GameVersion
         :type compression_level: int
         """
         source_file = sourcedir[
@@ -364,13 +581,12 @@ class MediaExporter:
         ]
 
         if source_file.suffix.lower() == ".slp":
-            from ...value_object.read.media.slp import SLP
-            media_file = source_file.open("rb")
-            image = SLP(media_file.read())
+            with source_file.open("rb") as media_file:
+                media_data = media_file.read()
 
         elif source_file.suffix.lower() == ".dds":
             # TODO: Implement
-            pass
+            media_data = None
 
         elif source_file.suffix.lower() == ".png":
             from shutil import copyfileobj
@@ -378,27 +594,78 @@ class MediaExporter:
             dst_path = exportdir[export_request.targetdir,
                                  export_request.target_filename].open('wb')
             copyfileobj(src_path, dst_path)
-            return
+            return None
 
         else:
             raise Exception(f"Source file {source_file.name} has an unrecognized extension: "
                             f"{source_file.suffix.lower()}")
 
+        return source_file, (source_file.suffix.lower(), media_data, compression_level)
+
+    @staticmethod
+    def _convert_terrain(
+        source_data: tuple,
+        palettes: dict[int, ColorTable],
+        game_version: GameVersion,
+        png_threads: int = 1,
+        **_kwargs
+    ) -> bytes:
+        """
+        Convert a terrain graphics file to a PNG file.
+
+        :param source_data: Suffix and data of the source file and the compression level.
+        :param palettes: Palettes used by the game.
+        :param game_version: Game edition and expansion info.
+        :param png_threads: Number of threads used for PNG compression.
+        :type source_data: tuple
+        :type palettes: dict
+        :type game_version: GameVersion
+        :type png_threads: int
+        """
+        suffix, media_data, compression_level = source_data
+
+        start = time.perf_counter()
+        if suffix == ".slp":
+            from ...value_object.read.media.slp import SLP
+            image = SLP(media_data)
+
+        else:
+            # TODO: Implement DDS
+            raise Exception(f"Cannot convert terrain graphics with extension {suffix}")
+
+        texture = Texture(image, palettes)
+        start = record_stage("decode", start)
+
         if game_version.edition.game_id in ("AOC", "SWGB"):
             from .terrain_merge import merge_terrain
-            texture = Texture(image, palettes)
             merge_terrain(texture)
 
         else:
             from .texture_merge import merge_frames
-            texture = Texture(image, palettes)
             merge_frames(texture)
 
-        MediaExporter.save_png(
-            texture,
+        start = record_stage("pack", start)
+
+        png_data = MediaExporter.create_png(texture, compression_level,
+                                            threads=png_threads)
+        record_stage("compress", start)
+
+        return png_data
+
+    @staticmethod
+    def _write_png_result(
+        export_request: MediaExportRequest,
+        exportdir: Path,
+        source_file: Path,
+        png_data: bytes
+    ) -> None:
+        """
+        Write the PNG file of a converted image.
+        """
+        MediaExporter.write_png(
+            png_data,
             exportdir[export_request.targetdir],
-            export_request.target_filename,
-            compression_level,
+            export_request.target_filename
         )
 
         if get_loglevel() <= logging.DEBUG:
@@ -462,6 +729,9 @@ class MediaExporter:
             from ...value_object.read.media.smx import SMX
             image = SMX(media_file.read())
 
+        else:
+            raise Exception(f"Cannot convert graphics with extension {source_file.suffix}")
+
         from .texture_merge import merge_frames
         texture = Texture(image, palettes)
         merge_frames(texture)
@@ -500,6 +770,34 @@ class MediaExporter:
         :type compression_level: int
         :type dry_run: bool
         """
+        if not dry_run:
+            MediaExporter.check_png_filename(filename)
+
+        png_data = MediaExporter.create_png(texture, compression_level, cache)
+
+        if not dry_run:
+            MediaExporter.write_png(png_data, targetdir, filename)
+
+    @staticmethod
+    def create_png(
+        texture: Texture,
+        compression_level: int = 1,
+        cache: dict = None,
+        threads: int = 1
+    ) -> bytes:
+        """
+        Create a PNG file from the image data of a texture. The used
+        compression parameters are stored in the texture.
+
+        :param texture: Texture with an image atlas.
+        :param compression_level: PNG compression level used for the resulting image file.
+        :param cache: Compression parameters from a previous run.
+        :param threads: Number of threads that run compression trials.
+        :type texture: Texture
+        :type compression_level: int
+        :type cache: tuple
+        :type threads: int
+        """
         from ...service.export.png import png_create
 
         compression_levels = {
@@ -510,14 +808,6 @@ class MediaExporter:
             4: png_create.CompressionMethod.COMPR_AGGRESSIVE,
         }
 
-        if not dry_run:
-            _, ext = os.path.splitext(filename)
-
-            # only allow png
-            if ext != ".png":
-                raise ValueError("Filename invalid, a texture must be saved"
-                                 f"as '*.png', not '*.{ext}'")
-
         compression_method = compression_levels.get(
             compression_level,
             png_create.CompressionMethod.COMPR_DEFAULT
@@ -525,16 +815,48 @@ class MediaExporter:
         png_data, compr_params = png_create.save(
             texture.image_data.data,
             compression_method,
-            cache
+            cache,
+            threads
         )
 
-        if not dry_run:
-            with targetdir[filename].open("wb") as imagefile:
-                imagefile.write(png_data)
-
         if compr_params:
             texture.best_compr = (compression_level, *compr_params)
 
+        return png_data
+
+    @staticmethod
+    def write_png(
+        png_data: bytes,
+        targetdir: Path,
+        filename: str
+    ) -> None:
+        """
+        Write a PNG file into the target directory path.
+
+        :param png_data: Data of the PNG file.
+        :param targetdir: Directory where the image file is created.
+        :param filename: Name of the resulting image file.
+        :type png_data: bytes
+        :type targetdir: Directory
+        :type filename: str
+        """
+        MediaExporter.check_png_filename(filename)
+
+        with targetdir[filename].open("wb") as imagefile:
+            imagefile.write(png_data)
+
+    @staticmethod
+    def check_png_filename(filename: str) -> None:
+        """
+        Raise an error if the filename does not belong to a PNG file.
+        """
+        _, ext = os.path.splitext(filename)
+
+        # only allow png
+        if ext != ".png":
+            raise ValueError("Filename invalid, a texture must be saved"
+                             f"as '*.png', not '*.{ext}'")
+
     @staticmethod
     def log_fileinfo(
         source_file: Path,
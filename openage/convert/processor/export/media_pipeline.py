@@ -0,0 +1,539 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+#
+# pylint: disable=too-many-arguments,too-many-instance-attributes
+"""
+Pipeline that runs the stages of the media export.
+
+Source files are read by a reader thread, converted (decoded, packed
+and compressed) in forked worker processes and written by the main
+thread in the order of the requests. The stages are connected by
+bounded queues and the source data waiting in the pipeline is limited
+by a memory budget.
+
+Only the number of worker processes is configurable (--jobs). There
+is always one reader thread, and the main thread is the only writer,
+so that the files are written in a fixed order.
+"""
+from __future__ import annotations
+import typing
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from queue import Queue
+from threading import Condition, Thread
+import time
+
+from ....log import dbg
+from ....util.strings import format_progress
+
+if typing.TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from openage.convert.entity_object.export.media_export_request import MediaExportRequest
+    from openage.convert.service.export.media_ledger import MediaExportLedger
+    from openage.util.fslike.path import Path
+
+
+# Stages of the pipeline in processing order
+STAGES = ("read", "decode", "pack", "compress", "write")
+
+# Minimum number of export requests of a media type for which
+# worker processes are used
+MIN_PARALLEL_REQUESTS = 16
+
+# Maximum size of the source data waiting in the pipeline in bytes.
+# Converted results are not counted, their number is limited by
+# WRITE_QUEUE_DEPTH instead.
+MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Memory budget in low memory mode
+LOW_MEMORY_BUDGET = 32 * 1024 * 1024
+
+# Read source files that may wait for conversion per worker process
+READ_QUEUE_DEPTH = 4
+
+# Converted files that may wait for writing per worker process
+WRITE_QUEUE_DEPTH = 2
+
+# State inherited by the worker processes:
+#   kwargs: export arguments for the convert function
+_WORKER_STATE: dict[str, typing.Any] = {}
+
+# Time spent in the conversion stages by the current process
+_stage_times: dict[str, float] = {}
+
+
+def record_stage(stage: str, start: float) -> float:
+    """
+    Add the time since start to a conversion stage of the current process.
+    Returns the current time, which is the start of the next stage.
+    """
+    now = time.perf_counter()
+    _stage_times[stage] = _stage_times.get(stage, 0.0) + now - start
+
+    return now
+
+
+def _run_convert(
+    convert_func: typing.Callable,
+    source_data: tuple,
+    kwargs: dict[str, typing.Any]
+) -> tuple[typing.Any, dict[str, float]]:
+    """
+    Convert source data and return the result with the times
+    spent in the conversion stages.
+    """
+    _stage_times.clear()
+    result = convert_func(source_data, **kwargs)
+
+    return result, dict(_stage_times)
+
+
+def _convert_media(convert_func: typing.Callable, source_data: tuple) -> tuple:
+    """
+    Convert the data of a source file in a worker process.
+    """
+    return _run_convert(convert_func, source_data, _WORKER_STATE["kwargs"])
+
+
+def _can_write(pending: deque[tuple[tuple, Future]], max_pending: int) -> bool:
+    """
+    Returns True if the first pending file is converted or does not need
+    conversion, or if the workers have enough files to convert.
+    """
+    if len(pending) >= max_pending:
+        return True
+
+    future = pending[0][1]
+    return future is None or future.done()
+
+
+def _get_data_size(source_data: tuple) -> int:
+    """
+    Returns the size of the binary data in the source data of a request.
+    """
+    return sum(len(item) for item in source_data if isinstance(item, bytes))
+
+
+class MemoryBudget:
+    """
+    Number of bytes that may be held by the pipeline at once.
+
+    Only the source data of the requests is counted. The converted
+    results that wait for writing are not, because their size is only
+    known when they are received; their number is bounded by the
+    write queue depth.
+
+    A request that exceeds the budget on its own is still let
+    through when nothing else is held, so the pipeline cannot stall.
+    """
+
+    __slots__ = ("budget", "used", "max_used", "aborted", "condition")
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.used = 0
+        self.max_used = 0
+        self.aborted = False
+        self.condition = Condition()
+
+    def acquire(self, size: int) -> bool:
+        """
+        Wait until size bytes are available and take them from the budget.
+        Returns False if the pipeline was aborted.
+        """
+        with self.condition:
+            while self.used > 0 and self.used + size > self.budget and not self.aborted:
+                self.condition.wait()
+
+            if self.aborted:
+                return False
+
+            self.used += size
+            self.max_used = max(self.max_used, self.used)
+
+        return True
+
+    def release(self, size: int) -> None:
+        """
+        Return size bytes to the budget.
+        """
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+    def abort(self) -> None:
+        """
+        Wake up all waiting threads and refuse further requests.
+        """
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+
+
+class StageStats:
+    """
+    Counters of a pipeline stage and the queue in front of it.
+    """
+
+    __slots__ = ("workers", "items", "busy_time",
+                 "queue_capacity", "queue_samples", "queue_depth_sum", "queue_depth_max")
+
+    def __init__(self, workers: int, queue_capacity: int = None):
+        self.workers = workers
+        self.items = 0
+        self.busy_time = 0.0
+
+        self.queue_capacity = queue_capacity
+        self.queue_samples = 0
+        self.queue_depth_sum = 0
+        self.queue_depth_max = 0
+
+    def add_time(self, seconds: float, items: int = 1) -> None:
+        """
+        Add the time spent on items.
+        """
+        self.items += items
+        self.busy_time += seconds
+
+    def sample_queue(self, depth: int) -> None:
+        """
+        Record the current depth of the input queue.
+        """
+        self.queue_samples += 1
+        self.queue_depth_sum += depth
+        self.queue_depth_max = max(self.queue_depth_max, depth)
+
+    def get_stats(self, wall_time: float) -> dict[str, typing.Any]:
+        """
+        Returns the counters and the utilization of the stage workers
+        during wall_time.
+        """
+        stats = {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_time": self.busy_time,
+            "utilization": self.busy_time / (wall_time * self.workers) if wall_time else 0.0,
+        }
+
+        if self.queue_capacity is not None:
+            stats["queue_capacity"] = self.queue_capacity
+            stats["queue_depth_max"] = self.queue_depth_max
+            stats["queue_depth_avg"] = (self.queue_depth_sum / self.queue_samples
+                                        if self.queue_samples else 0.0)
+
+        return stats
+
+    def __repr__(self) -> str:
+        return f"StageStats<{self.items} items, {self.busy_time:.2f}s>"
+
+
+class MediaExportPipeline:
+    """
+    Exports the requests of one media type with the read, convert,
+    write and replay functions of the media type.
+    """
+
+    def __init__(
+        self,
+        steps: tuple[typing.Callable, ...],
+        sourcedir: Path,
+        exportdir: Path,
+        kwargs: dict[str, typing.Any],
+        *,
+        jobs: int = 1,
+        ledger: MediaExportLedger = None,
+        settings: str = None,
+        memory_budget: int = MEMORY_BUDGET
+    ):
+        """
+        Create a pipeline for a media type.
+
+        :param steps: Read, convert, write and replay functions for the media type.
+        :param sourcedir: Directory where all media assets are mounted.
+        :param exportdir: Directory the resulting files are exported to.
+        :param kwargs: Additional arguments for the read and convert functions.
+        :param jobs: Number of worker processes for the conversion.
+        :param ledger: Ledger of previously exported files.
+        :param settings: Export settings of the media type for the ledger keys.
+        :param memory_budget: Maximum size of the source data in the pipeline.
+        """
+        self.read_func, self.convert_func, self.write_func, self.replay_func = steps
+        self.sourcedir = sourcedir
+        self.exportdir = exportdir
+        self.kwargs = kwargs
+        self.jobs = jobs
+        self.ledger = ledger
+        self.settings = settings
+        self.memory = MemoryBudget(memory_budget)
+
+        self.stats: dict[str, StageStats] = {}
+        self.wall_time = 0.0
+
+    def run(self, export_requests: list[MediaExportRequest]) -> None:
+        """
+        Export the files of the requests.
+        """
+        can_fork = "fork" in multiprocessing.get_all_start_methods()
+        parallel = self.jobs > 1 and len(export_requests) >= MIN_PARALLEL_REQUESTS and can_fork
+        workers = self.jobs if parallel else 1
+
+        self.stats = {
+            "read": StageStats(1),
+            "decode": StageStats(workers, workers * READ_QUEUE_DEPTH if parallel else None),
+            "pack": StageStats(workers),
+            "compress": StageStats(workers),
+            "write": StageStats(1, workers * WRITE_QUEUE_DEPTH if parallel else None),
+        }
+
+        start = time.perf_counter()
+        if parallel:
+            self._run_parallel(export_requests)
+
+        else:
+            self._run_serial(export_requests)
+
+        self.wall_time = time.perf_counter() - start
+
+    def get_stats(self) -> dict[str, dict[str, typing.Any]]:
+        """
+        Returns the counters of the stages from the last run.
+        """
+        return {stage: self.stats[stage].get_stats(self.wall_time) for stage in STAGES}
+
+    def log_stats(self) -> None:
+        """
+        Log the utilization and queue depths of the stages.
+        """
+        dbg("media export pipeline: %.2fs, max. %d bytes of source data held",
+            self.wall_time, self.memory.max_used)
+
+        for stage, stats in self.get_stats().items():
+            queue_info = ""
+            if "queue_capacity" in stats:
+                queue_info = (f", queue avg {stats['queue_depth_avg']:.1f}"
+                              f" max {stats['queue_depth_max']}/{stats['queue_capacity']}")
+
+            dbg("  %-8s %d workers, %d items, %.2fs busy, %.0f%% utilization%s",
+                stage, stats["workers"], stats["items"], stats["busy_time"],
+                stats["utilization"] * 100, queue_info)
+
+    def _run_serial(self, export_requests: list[MediaExportRequest]) -> None:
+        """
+        Run all stages for one request after another.
+        """
+        total_count = len(export_requests)
+        for count, request in enumerate(export_requests, start = 1):
+            self._finish(self._read(request))
+
+            print(f"-- Files done: {format_progress(count, total_count)}",
+                  end = "\r", flush = True)
+
+    def _run_parallel(self, export_requests: list[MediaExportRequest]) -> None:
+        """
+        Read the source files in a thread, convert them in forked worker
+        processes and write the results in the order of the requests.
+        Observers are therefore notified in the same order as in a
+        serial export.
+
+        The number of reader and writer threads is fixed to one each.
+        """
+        dbg("converting %d media files with %d processes", len(export_requests), self.jobs)
+
+        read_queue: Queue[tuple] = Queue(maxsize=self.jobs * READ_QUEUE_DEPTH)
+        reader_errors = []
+        reader = Thread(target=self._read_sources,
+                        args=(export_requests, read_queue, reader_errors),
+                        name="media-reader")
+        reader_done = False
+
+        max_pending = self.jobs * WRITE_QUEUE_DEPTH
+
+        _WORKER_STATE["kwargs"] = self.kwargs
+        try:
+            with ProcessPoolExecutor(max_workers=self.jobs,
+                                     mp_context=multiprocessing.get_context("fork")) as pool:
+                # fork the workers before the reader thread starts
+                pool.submit(int).result()
+                reader.start()
+
+                try:
+                    pending: deque[tuple[tuple, Future]] = deque()
+                    total_count = len(export_requests)
+                    count = 0
+
+                    while True:
+                        if pending and read_queue.empty():
+                            # the reader may wait for memory held by pending files
+                            self.stats["write"].sample_queue(len(pending))
+                            self._finish(*pending.popleft())
+                            count += 1
+                            print(f"-- Files done: {format_progress(count, total_count)}",
+                                  end = "\r", flush = True)
+                            continue
+
+                        self.stats["decode"].sample_queue(read_queue.qsize())
+                        item = read_queue.get()
+                        if item is None:
+                            reader_done = True
+                            break
+
+                        _, source, key, _ = item
+                        future = None
+                        # files in the ledger are only converted if
+                        # they turn out to be changed when they are written
+                        if source is not None and (key is None or not self.ledger.has_entry(key)):
+                            future = pool.submit(_convert_media, self.convert_func, source[1])
+
+                        pending.append((item, future))
+
+                        # write finished files, but keep the workers busy
+                        while pending and _can_write(pending, max_pending):
+                            self.stats["write"].sample_queue(len(pending))
+                            self._finish(*pending.popleft())
+                            count += 1
+                            print(f"-- Files done: {format_progress(count, total_count)}",
+                                  end = "\r", flush = True)
+
+                    while pending:
+                        self.stats["write"].sample_queue(len(pending))
+                        self._finish(*pending.popleft())
+                        count += 1
+                        print(f"-- Files done: {format_progress(count, total_count)}",
+                              end = "\r", flush = True)
+
+                finally:
+                    if not reader_done:
+                        # unblock the reader and wait for it
+                        self.memory.abort()
+                        while read_queue.get() is not None:
+                            pass
+
+                    reader.join()
+
+        finally:
+            _WORKER_STATE.clear()
+
+        if reader_errors:
+            raise reader_errors[0]
+
+    def _read_sources(
+        self,
+        export_requests: list[MediaExportRequest],
+        read_queue: Queue[tuple],
+        errors: list[Exception]
+    ) -> None:
+        """
+        Read the source files of the requests into the queue until
+        all requests are read or the pipeline is aborted.
+        None is put into the queue at the end.
+        """
+        try:
+            for request in export_requests:
+                item = self._read(request)
+                read_queue.put(item)
+
+                if self.memory.aborted:
+                    break
+
+        except Exception as exc:  # pylint: disable=broad-except
+            errors.append(exc)
+
+        finally:
+            read_queue.put(None)
+
+    def _read(self, request: MediaExportRequest) -> tuple:
+        """
+        Take the size of the source file of a request from the memory
+        budget and read the file. If the size of the file is unknown
+        before it is read, the size of the read data is taken instead.
+
+        Returns the request, its source, its key in the ledger and
+        the number of bytes taken from the budget.
+        """
+        size = self._get_source_size(request)
+        if not self.memory.acquire(size):
+            return request, None, None, 0
+
+        try:
+            start = time.perf_counter()
+
+            source = self.read_func(request, self.sourcedir, self.exportdir, **self.kwargs)
+
+            key = None
+            if source is not None and self.ledger is not None:
+                key = self.ledger.get_key(request.get_type(), source[1], self.settings)
+
+            self.stats["read"].add_time(time.perf_counter() - start)
+
+        except BaseException:
+            self.memory.release(size)
+            raise
+
+        if source is None:
+            self.memory.release(size)
+            return request, None, None, 0
+
+        if size == 0:
+            size = _get_data_size(source[1])
+            self.memory.acquire(size)
+
+        return request, source, key, size
+
+    def _get_source_size(self, request: MediaExportRequest) -> int:
+        """
+        Returns the size of the source file of a request without
+        reading it, or 0 if the size is unknown.
+        """
+        source_file = self.sourcedir[request.get_type().value, request.source_filename]
+
+        try:
+            return source_file.filesize or 0
+
+        except OSError:
+            # the read step may look up the file under another name
+            return 0
+
+    def _finish(self, item: tuple, future: Future = None) -> None:
+        """
+        Reuse the file of a request from the ledger or write its converted
+        result. The source data is converted here if there is no future
+        with the result of a worker process.
+        """
+        request, source, key = item[:3]
+        if source is None:
+            return
+
+        source_file, source_data = source
+        try:
+            start = time.perf_counter()
+            if key is not None:
+                entry = self.ledger.reuse(key, request.targetdir, request.target_filename)
+                if entry is not None:
+                    if self.replay_func:
+                        self.replay_func(request, entry[2])
+
+                    self.stats["write"].add_time(time.perf_counter() - start)
+                    return
+
+            if future is not None:
+                result, stage_times = future.result()
+
+            else:
+                result, stage_times = _run_convert(self.convert_func, source_data, self.kwargs)
+
+            for stage, stage_time in stage_times.items():
+                self.stats[stage].add_time(stage_time)
+
+            start = time.perf_counter()
+            metadata = self.write_func(request, self.exportdir, source_file, result)
+
+            if key is not None:
+                self.ledger.add(key, request.targetdir, request.target_filename, metadata)
+
+            self.stats["write"].add_time(time.perf_counter() - start)
+
+        finally:
+            # bytes taken from the budget by _read()
+            self.memory.release(item[3])
@@ -48,7 +48,11 @@ class ModpackExporter:
         info("Dumping data files...")
 
         # Data files
-        DataExporter.export(modpack.get_data_files(), modpack_dir)
+        # in low memory mode, the content of each file is freed after
+        # it was written, so the nyan objects don't stay in memory
+        # during the media export
+        release = args.flag("low_memory")
+        DataExporter.export(modpack.get_data_files(), modpack_dir, release, args.jobs)
 
         if args.flag("no_media"):
             info("Skipping media file export...")
@@ -62,7 +66,7 @@ class ModpackExporter:
         info("Dumping metadata files...")
 
         # Metadata files
-        DataExporter.export(modpack.get_metadata_files(), modpack_dir)
+        DataExporter.export(modpack.get_metadata_files(), modpack_dir, release, args.jobs)
 
         # Manifest file
         generate_hashes(modpack, modpack_dir)
@@ -3,10 +3,16 @@
 """
 Provides functions that retrieve name lookup dicts for internal nyan object
 names or filenames.
+
+The lookup dicts are merged once per game version and returned as
+read-only mappings, so they must not be modified by the caller.
 """
 from __future__ import annotations
 import typing
 
+import functools
+from types import MappingProxyType
+
 import openage.convert.value_object.conversion.aoc.internal_nyan_names as aoc_internal
 import openage.convert.value_object.conversion.de1.internal_nyan_names as de1_internal
 import openage.convert.value_object.conversion.de2.internal_nyan_names as de2_internal
@@ -20,6 +26,101 @@ if typing.TYPE_CHECKING:
     from openage.convert.value_object.init.game_version import GameVersion
 
 
+# (lookup function name, game version) -> lookup dict
+_LOOKUP_TABLES: dict[tuple[str, GameVersion], typing.Mapping] = {}
+
+# (lookup function name, position, game version) -> reverse lookup dict
+_REVERSE_LOOKUP_TABLES: dict[tuple[str, int, GameVersion], typing.Mapping] = {}
+
+# lookup function name -> number of served lookups
+_LOOKUP_COUNTS: dict[str, int] = {}
+
+
+def _memoize_lookups(
+    build_func: typing.Callable[[GameVersion], dict]
+) -> typing.Callable[[GameVersion], typing.Mapping]:
+    """
+    Decorator for the lookup functions that builds the lookup dict only
+    once per game version and returns it as a read-only mapping.
+    """
+    name = build_func.__name__
+
+    @functools.wraps(build_func)
+    def get_lookups(game_version: GameVersion) -> typing.Mapping:
+        _LOOKUP_COUNTS[name] = _LOOKUP_COUNTS.get(name, 0) + 1
+
+        key = (name, game_version)
+        if key in _LOOKUP_TABLES:
+            return _LOOKUP_TABLES[key]
+
+        lookup_dict = build_func(game_version)
+        if lookup_dict is not None:
+            lookup_dict = MappingProxyType(dict(lookup_dict))
+
+        _LOOKUP_TABLES[key] = lookup_dict
+
+        return lookup_dict
+
+    return get_lookups
+
+
+def get_reverse_lookups(
+    lookup_func: typing.Callable[[GameVersion], typing.Mapping],
+    game_version: GameVersion,
+    position: int = None
+) -> typing.Mapping[typing.Any, tuple[int, ...]]:
+    """
+    Return a reverse index for the lookup dicts of a lookup function,
+    e.g. the IDs of the game entities with a given name or the IDs of
+    the graphic sets that include a civ.
+
+    The values of the lookup dict (or the items at position if the values
+    are tuples) are mapped to the IDs of the lookup dict entries that
+    contain them. Items that are tuples themselves are mapped element-wise.
+    The IDs are ordered like the entries of the lookup dict.
+
+    :param lookup_func: Lookup function, e.g. get_entity_lookups.
+    :type lookup_func: Callable
+    :param game_version: Game edition and expansions for which the lookups should be.
+    :type game_version: GameVersion
+    :param position: Position of the indexed item in the lookup dict values.
+    :type position: int
+    """
+    name = lookup_func.__name__
+    counter_name = f"{name} (reverse)"
+    _LOOKUP_COUNTS[counter_name] = _LOOKUP_COUNTS.get(counter_name, 0) + 1
+
+    key = (name, position, game_version)
+    if key in _REVERSE_LOOKUP_TABLES:
+        return _REVERSE_LOOKUP_TABLES[key]
+
+    reverse_dict = {}
+    lookup_dict = lookup_func(game_version) or {}
+    for lookup_id, value in lookup_dict.items():
+        item = value if position is None else value[position]
+
+        if isinstance(item, tuple):
+            for element in item:
+                reverse_dict.setdefault(element, []).append(lookup_id)
+
+        else:
+            reverse_dict.setdefault(item, []).append(lookup_id)
+
+    reverse_dict = MappingProxyType({item: tuple(lookup_ids)
+                                     for item, lookup_ids in reverse_dict.items()})
+    _REVERSE_LOOKUP_TABLES[key] = reverse_dict
+
+    return reverse_dict
+
+
+def get_lookup_stats() -> dict[str, int]:
+    """
+    Returns the number of lookups served by each lookup function.
+    """
+    return dict(sorted(_LOOKUP_COUNTS.items()))
+
+
+@_memoize_lookups
 def get_armor_class_lookups(game_version: GameVersion) -> dict[int, str]:
     """
     Return the name lookup dicts for armor classes.
@@ -67,6 +168,7 @@ def get_armor_class_lookups(game_version: GameVersion) -> dict[int, str]:
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_civ_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     """
     Return the name lookup dicts for civs.
@@ -110,6 +212,7 @@ def get_civ_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_class_lookups(game_version: GameVersion) -> dict[int, str]:
     """
     Return the name lookup dicts for unit classes.
@@ -132,6 +235,7 @@ def get_class_lookups(game_version: GameVersion) -> dict[int, str]:
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_command_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     """
     Return the name lookup dicts for unit commands.
@@ -154,6 +258,7 @@ def get_command_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_entity_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     """
     Return the name lookup dicts for game entities.
@@ -239,6 +344,7 @@ def get_entity_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_gather_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     """
     Return the name lookup dicts for gather tasks.
@@ -261,6 +367,7 @@ def get_gather_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_graphic_set_lookups(
     game_version: GameVersion
 ) -> dict[int, tuple[tuple[int, ...], str, str]]:
@@ -306,6 +413,7 @@ def get_graphic_set_lookups(
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_restock_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     """
     Return the name lookup dicts for restock targets.
@@ -332,6 +440,7 @@ def get_restock_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_tech_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     """
     Return the name lookup dicts for tech groups.
@@ -375,6 +484,7 @@ def get_tech_lookups(game_version: GameVersion) -> dict[int, tuple[str, str]]:
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_terrain_lookups(
     game_version: GameVersion
 ) -> dict[int, tuple[tuple[int, ...], str, str]]:
@@ -420,6 +530,7 @@ def get_terrain_lookups(
     raise Exception(f"No lookup dict found for game version {game_edition.edition_name}")
 
 
+@_memoize_lookups
 def get_terrain_type_lookups(game_version: GameVersion) -> dict[int, tuple]:
     """
     Return the name lookup dicts for terrain types.
@@ -0,0 +1,274 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+"""
+Ledger of the media files exported into a modpack.
+
+The ledger maps the key of an export request (hash of the source file
+content and the export settings) to the exported file and its metadata.
+Requests with a known key are not converted again: the existing file is
+kept or linked to the new target.
+"""
+from __future__ import annotations
+import typing
+
+import hashlib
+import marshal
+import os
+from shutil import copyfileobj
+
+from ....log import dbg, warn
+from ..init.changelog import ASSET_VERSION
+
+if typing.TYPE_CHECKING:
+    from openage.convert.value_object.read.media.colortable import ColorTable
+    from openage.convert.value_object.read.media_types import MediaType
+    from openage.util.fslike.path import Path
+
+
+# Version of the ledger format and the media converters.
+# Increment this whenever the media conversion creates different files
+# for the same input, so that old entries are ignored.
+MEDIA_LEDGER_VERSION = 2
+
+# Filename of the ledger in the modpack directory
+MEDIA_LEDGER_FILENAME = "media_ledger"
+
+
+def hash_palettes(palettes: dict[int, ColorTable]) -> str:
+    """
+    Get the hash value of a set of palettes.
+    """
+    hashfunc = hashlib.sha3_256()
+    for palette_id, palette in sorted(palettes.items()):
+        hashfunc.update(f"{palette_id}:{palette.palette!r};".encode())
+
+    return hashfunc.hexdigest()
+
+
+class MediaExportLedger:
+    """
+    Export ledger of a modpack directory.
+
+    Files that are exported, kept or linked in the current run are
+    recorded with their key. Only these files are stored in the
+    ledger again, so it never references files that were overwritten.
+    """
+
+    __slots__ = ("exportdir", "previous", "current", "written", "reused_count")
+
+    def __init__(self, exportdir: Path):
+        """
+        Load the ledger of a modpack directory.
+
+        :param exportdir: Modpack directory the media files are exported to.
+        :type exportdir: Path
+        """
+        self.exportdir = exportdir
+
+        # key -> ((targetdir, filename), filesize, metadata)
+        self.previous: dict[str, tuple] = self._load()
+        self.current: dict[str, tuple] = {}
+
+        # (targetdir, filename) -> key of the exported file
+        self.written: dict[tuple[str, str], str] = {}
+
+        self.reused_count = 0
+
+    def _load(self) -> dict[str, tuple]:
+        """
+        Read the stored ledger. Returns an empty ledger if there is
+        no usable file.
+        """
+        path = self.exportdir[MEDIA_LEDGER_FILENAME]
+
+        try:
+            with path.open("rb") as ledger_file:
+                version, entries = marshal.loads(ledger_file.read())
+
+        except FileNotFoundError:
+            return {}
+
+        except (OSError, EOFError, ValueError, TypeError):
+            warn("could not use media export ledger: %s", path)
+            return {}
+
+        if version != MEDIA_LEDGER_VERSION:
+            return {}
+
+        return entries
+
+    @staticmethod
+    def get_key(
+        media_type: MediaType,
+        source_data: tuple,
+        settings: str
+    ) -> str:
+        """
+        Create the key of an export request.
+
+        :param media_type: Media type of the request.
+        :param source_data: Data of the source file and its export parameters.
+        :param settings: Export settings that are the same for all requests
+                         of the media type.
+        :type media_type: MediaType
+        :type source_data: tuple
+        :type settings: str
+        """
+        hashfunc = hashlib.sha3_256()
+        hashfunc.update("|".join((
+            str(MEDIA_LEDGER_VERSION),
+            str(ASSET_VERSION),
+            media_type.value,
+            settings,
+        )).encode())
+
+        for item in source_data:
+            if isinstance(item, bytes):
+                hashfunc.update(hashlib.sha3_256(item).digest())
+
+            else:
+                hashfunc.update(repr(item).encode())
+
+            hashfunc.update(b"|")
+
+        return hashfunc.hexdigest()
+
+    def has_entry(self, key: str) -> bool:
+        """
+        Check if a file was exported for key.
+        """
+        return key in self.current or key in self.previous
+
+    def reuse(
+        self,
+        key: str,
+        targetdir: str,
+        filename: str
+    ) -> typing.Union[tuple, None]:
+        """
+        Reuse the file exported for key as targetdir/filename. If the
+        file was exported to another location, it is linked or copied.
+
+        Returns the ledger entry of the file or None if it
+        has to be converted again.
+        """
+        target = (targetdir, filename)
+        target_file = self._get_path(target)
+
+        entry = self.current.get(key) or self.previous.get(key)
+        if entry is None or not self._is_unchanged(key, entry):
+            # the converted file must not change other links of the target
+            self._unlink_shared(target_file)
+            return None
+
+        location, filesize, metadata = entry
+        if location != target:
+            self._link(self._get_path(location), target_file)
+
+        self.add(key, targetdir, filename, metadata)
+        self.reused_count += 1
+
+        return target, filesize, metadata
+
+    def add(
+        self,
+        key: str,
+        targetdir: str,
+        filename: str,
+        metadata: typing.Any = None
+    ) -> None:
+        """
+        Record an exported file.
+
+        :param key: Key of the export request.
+        :param targetdir: Directory of the file in the modpack.
+        :param filename: Name of the file.
+        :param metadata: Metadata of the file that is passed to the
+                         observers of the request when it is reused.
+        """
+        target = (targetdir, filename)
+        old_key = self.written.get(target)
+        if old_key is not None and old_key != key:
+            self.current.pop(old_key, None)
+
+        self.current[key] = (target, self._get_path(target).filesize, metadata)
+        self.written[target] = key
+
+    def save(self) -> None:
+        """
+        Write the ledger of the files exported in this run.
+        """
+        entries = {key: entry for key, entry in self.current.items()
+                   if self.written.get(entry[0]) == key}
+
+        path = self.exportdir[MEDIA_LEDGER_FILENAME]
+        try:
+            with path.open("wb") as ledger_file:
+                ledger_file.write(marshal.dumps((MEDIA_LEDGER_VERSION, entries)))
+
+        except OSError as exc:
+            warn("could not write media export ledger %s: %s", path, exc)
+            return
+
+        dbg("media export ledger: %d files, %d reused", len(entries), self.reused_count)
+
+    def _is_unchanged(self, key: str, entry: tuple) -> bool:
+        """
+        Check if the file of a ledger entry still exists and was
+        not overwritten by another file in this run.
+        """
+        location, filesize, _ = entry
+        if self.written.get(location, key) != key:
+            return False
+
+        existing_file = self._get_path(location)
+
+        return existing_file.is_file() and existing_file.filesize == filesize
+
+    def _get_path(self, location: tuple[str, str]) -> Path:
+        """
+        Returns the path of a file in the modpack directory.
+        """
+        targetdir, filename = location
+        return self.exportdir.joinpath(targetdir).joinpath(filename)
+
+    @staticmethod
+    def _link(source: Path, target: Path) -> None:
+        """
+        Create a hardlink from target to source or copy the file if the
+        paths are not native or the filesystem does not support links.
+        """
+        source_path = source.resolve_native_path()
+        target_path = target.resolve_native_path_w()
+
+        if source_path and target_path:
+            try:
+                if os.path.lexists(target_path):
+                    os.remove(target_path)
+
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                os.link(source_path, target_path)
+                return
+
+            except OSError:
+                pass
+
+        with source.open("rb") as infile, target.open("wb") as outfile:
+            copyfileobj(infile, outfile)
+
+    @staticmethod
+    def _unlink_shared(path: Path) -> None:
+        """
+        Remove a file that is hardlinked to other files, so that
+        it can be written without changing them.
+        """
+        native_path = path.resolve_native_path_w()
+        if not native_path:
+            return
+
+        try:
+            if os.stat(native_path).st_nlink > 1:
+                os.remove(native_path)
+
+        except FileNotFoundError:
+            pass
@@ -1,4 +1,4 @@
-# Copyright 2020-2021 the openage authors. See copying.md for legal info.
+# Copyright 2020-2022 the openage authors. See copying.md for legal info.
 #
 # cython: infer_types=True
 
@@ -6,13 +6,15 @@
 Creates valid PNG files as bytearrays by utilizing libpng.
 """
 
-from libc.stdint cimport uint8_t
-from libc.stdlib cimport malloc, free
+from libc.math cimport log2
+from libc.stdint cimport int8_t, uint8_t, uint32_t
+from libc.stdlib cimport abs, malloc, free
 from libc.string cimport memcpy, memset
+from libcpp.unordered_map cimport unordered_map
 
 from ..opus.bytearray cimport PyByteArray_AS_STRING
 from . cimport libpng
-from . cimport png_tmp_file
+from . cimport png_search
 from enum import Enum
 
 cimport cython
@@ -40,6 +42,10 @@ cdef struct process:
     uint8_t best_compr_strat
     uint8_t best_filters
 
+# Number of settings tried by the greedy search
+cdef enum:
+    GREEDY_TRIAL_COUNT = 8
+
 # Running OptiPNG with optimization level 2 (-o2 flag)
 cdef int GREEDY_COMPR_LVL_MIN = 9
 cdef int GREEDY_COMPR_LVL_MAX = 9
@@ -50,11 +56,21 @@ cdef int GREEDY_COMPR_STRAT_MAX = 3
 cdef int GREEDY_FILTER_0 = libpng.PNG_FILTER_NONE
 cdef int GREEDY_FILTER_5 = libpng.PNG_ALL_FILTERS
 
+# Prediction of the greedy search result from image statistics
+cdef int    PREDICT_SAMPLE_ROWS = 64        # maximum number of rows in the subsample
+cdef size_t PREDICT_MIN_PIXELS = 256        # minimum number of visible pixels in the subsample
+cdef size_t PREDICT_PALETTE_SIZE = 256      # maximum number of colors of palette images
+cdef double PREDICT_SMOOTH_RATIO = 2.0      # color entropy / row delta entropy for filtering
+cdef double PREDICT_FLAT_RATIO = 1.1        # color entropy / row delta entropy for no filtering
+cdef double PREDICT_DETAIL_DENSITY = 0.15   # colors per pixel for filtering
+cdef double PREDICT_FLAT_DENSITY = 0.07     # colors per pixel for no filtering
+
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def save(numpy.ndarray[numpy.uint8_t, ndim=3, mode="c"] imagedata not None,
-         compr_method=CompressionMethod.COMPR_DEFAULT, compr_settings=None):
+         compr_method=CompressionMethod.COMPR_DEFAULT, compr_settings=None,
+         unsigned int threads=1, predict=True):
     """
     Convert an image matrix with RGBA colors to a PNG. The PNG is returned
     as a bytearray or bytes object.
@@ -70,6 +86,13 @@ def save(numpy.ndarray[numpy.uint8_t, ndim=3, mode="c"] imagedata not None,
                            memory level, strategy and filter method (in that
                            order) used for encoding the PNG.
     :type compr_settings: tuple
+    :param threads: Number of threads that run the compression trials
+                    of COMPR_GREEDY.
+    :type threads: int
+    :param predict: Predict the settings of COMPR_GREEDY from statistics
+                    of the image if no settings are passed. The compression
+                    trials only run if the prediction is uncertain.
+    :type predict: bool
     :returns: A bytearray containing the generated PNG file as well as the
               settings that generate the smallest PNG, if the compression
               method COMPR_GREEDY was chosen.
@@ -99,7 +122,11 @@ def save(numpy.ndarray[numpy.uint8_t, ndim=3, mode="c"] imagedata not None,
             cache.strat = 0xFF
             cache.filters = 0xFF
 
-        outdata, used_settings = optimize_greedy(mview, width, height, cache)
+            if predict:
+                # Keeps the invalid values if the prediction is uncertain
+                predict_greedy(mview, width, height, &cache)
+
+        outdata, used_settings = optimize_greedy(mview, width, height, cache, threads)
         best_settings = (used_settings["compr_lvl"], used_settings["mem_lvl"],
                          used_settings["strat"], used_settings["filters"])
 
@@ -181,7 +208,156 @@ cdef bytearray optimize_default(numpy.uint8_t[:,:,::1] imagedata, int width, int
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cdef optimize_greedy(numpy.uint8_t[:,:,::1] imagedata, int width, int height, greedy_cache_param cache):
+@cython.cdivision(True)
+cdef void predict_greedy(numpy.uint8_t[:,:,::1] imagedata, int width, int height,
+                         greedy_cache_param *cache):
+    """
+    Predict the compression settings that the greedy search would choose
+    from statistics of a subsample of the image rows. Only the filters are
+    predicted, since the default compression strategy almost always wins.
+
+    The statistics skip fully transparent pixels, because transparent
+    areas compress equally well with all settings. Images with few colors
+    (e.g. from palettes) compress best without filtering, unless the row
+    deltas are much easier to compress than the colors themselves (smooth
+    gradients). Images with many colors per pixel compress best with
+    adaptive filtering.
+
+    :param imagedata: A memory view of a 3-dimensional array with RGBA color
+                      values for pixels. The array is expected to be C-aligned.
+    :type imagedata: uint8_t[:,:,::1]
+    :param width: Width of the image in pixels.
+    :type width: int
+    :param height: Height of the image in pixels.
+    :type height: int
+    :param cache: Struct that receives the predicted settings. It is not
+                  changed if the prediction is uncertain.
+    :type cache: greedy_cache_param*
+    """
+    cdef unordered_map[uint32_t, size_t] colors
+    cdef size_t delta_counts[256]
+    cdef size_t pixel_count = 0
+    cdef size_t raw_cost, sub_cost, up_cost
+    cdef int row_step = max(1, height // PREDICT_SAMPLE_ROWS)
+    cdef int first_row = min(1, height - 1)
+    cdef int sample_count = (height - first_row + row_step - 1) // row_step
+    cdef int sample_idx, row_idx, col_idx, channel, delta_idx
+    cdef uint8_t delta
+    cdef uint8_t filter_type
+    cdef uint32_t color
+    cdef const uint8_t *row
+    cdef const uint8_t *prev_row
+    cdef const uint8_t *pixel
+
+    cdef double color_entropy = 0
+    cdef double delta_entropy = 0
+    cdef double entropy_ratio
+    cdef double color_density
+    cdef double probability
+    cdef int filters
+
+    memset(delta_counts, 0, sizeof(delta_counts))
+
+    with nogil:
+        # start at the second row, so that the first sampled row has a predecessor
+        for sample_idx in range(sample_count):
+            row_idx = first_row + sample_idx * row_step
+            row = &imagedata[row_idx, 0, 0]
+            prev_row = NULL
+            if row_idx > 0:
+                prev_row = &imagedata[row_idx - 1, 0, 0]
+
+            # Choose the row filter like the libpng heuristic for
+            # adaptive filtering: smallest sum of absolute signed deltas
+            raw_cost = 0
+            sub_cost = 0
+            up_cost = 0
+            for col_idx in range(width * 4):
+                raw_cost += abs(<int8_t>row[col_idx])
+                sub_cost += abs(<int8_t>(row[col_idx] - (row[col_idx - 4] if col_idx >= 4 else 0)))
+                up_cost += abs(<int8_t>(row[col_idx] - (prev_row[col_idx] if prev_row else 0)))
+
+            filter_type = 0
+            if sub_cost < raw_cost:
+                filter_type = 1
+
+            if up_cost < min(raw_cost, sub_cost):
+                filter_type = 2
+
+            for col_idx in range(width):
+                pixel = row + col_idx * 4
+                if pixel[3] == 0:
+                    continue
+
+                color = (pixel[0] | (pixel[1] << 8) | (pixel[2] << 16) | (<uint32_t>pixel[3] << 24))
+                colors[color] += 1
+                pixel_count += 1
+
+                for channel in range(col_idx * 4, col_idx * 4 + 4):
+                    delta = row[channel]
+                    if filter_type == 1 and channel >= 4:
+                        delta = row[channel] - row[channel - 4]
+
+                    elif filter_type == 2 and prev_row:
+                        delta = row[channel] - prev_row[channel]
+
+                    delta_counts[delta] += 1
+
+    if pixel_count == 0:
+        # Fully transparent images are equally small with all settings
+        filters = GREEDY_FILTER_0
+
+    elif pixel_count < PREDICT_MIN_PIXELS:
+        # Not enough data for a prediction
+        return
+
+    else:
+        for item in colors:
+            probability = <double>item.second / pixel_count
+            color_entropy -= probability * log2(probability)
+
+        for delta_idx in range(256):
+            if delta_counts[delta_idx] > 0:
+                probability = <double>delta_counts[delta_idx] / (pixel_count * 4)
+                delta_entropy -= probability * log2(probability)
+
+        # bits per pixel for the colors compared to the (filtered) row deltas
+        if delta_entropy > 0:
+            entropy_ratio = color_entropy / (delta_entropy * 4)
+
+        elif color_entropy > 0:
+            entropy_ratio = PREDICT_SMOOTH_RATIO
+
+        else:
+            entropy_ratio = 0
+
+        color_density = <double>colors.size() / pixel_count
+
+        if entropy_ratio >= PREDICT_SMOOTH_RATIO:
+            filters = GREEDY_FILTER_5
+
+        elif entropy_ratio < PREDICT_FLAT_RATIO and colors.size() <= PREDICT_PALETTE_SIZE:
+            filters = GREEDY_FILTER_0
+
+        elif color_density >= PREDICT_DETAIL_DENSITY:
+            filters = GREEDY_FILTER_5
+
+        elif entropy_ratio < PREDICT_FLAT_RATIO and color_density < PREDICT_FLAT_DENSITY:
+            filters = GREEDY_FILTER_0
+
+        else:
+            # Uncertain
+            return
+
+    cache.compr_lvl = GREEDY_COMPR_LVL_MAX
+    cache.mem_lvl = GREEDY_COMPR_MEM_LVL_MAX
+    cache.strat = GREEDY_COMPR_STRAT_MIN
+    cache.filters = filters
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef optimize_greedy(numpy.uint8_t[:,:,::1] imagedata, int width, int height,
+                     greedy_cache_param cache, unsigned int threads=1):
     """
     Create an in-memory PNG by greedily searching for the result with the
     smallest file size and copying it to a bytes object.
@@ -200,32 +376,46 @@ cdef optimize_greedy(numpy.uint8_t[:,:,::1] imagedata, int width, int height, gr
     :param cache: A struct containing compression parameters for the PNG generation. Pass
                    a struct with all values intialized to 0xFF to run the greedy search.
     :type cache: greedy_cache_param
+    :param threads: Number of threads that run the compression trials.
+    :type threads: int
     :returns: A bytearray containing the generated PNG file as well as the
               settings that generate the smallest PNG.
     :rtype: tuple
     """
+    cdef png_search.png_search_buffer bufstate
+    cdef png_search.png_search_params params
+    cdef const uint8_t *data = &imagedata[0,0,0]
+    cdef bint success
+
     if cache.compr_lvl == 0xFF:
-        cache = optimize_greedy_iterate(imagedata, width, height)
+        # the search keeps the smallest PNG, so it is not encoded again
+        cache = optimize_greedy_iterate(imagedata, width, height, &bufstate, threads)
+        success = cache.compr_lvl != 0xFF
+
+    else:
+        params.compr_lvl = cache.compr_lvl
+        params.mem_lvl = cache.mem_lvl
+        params.strat = cache.strat
+        params.filters = cache.filters
 
-    cdef png_tmp_file.tmp_file_buffer_state bufstate
-    bufstate.buffer = NULL
-    bufstate.size = 0
+        with nogil:
+            png_search.png_search_init_buffer(&bufstate)
+            success = png_search.png_search_encode(data, width, height, params, &bufstate)
 
-    write_to_buffer(imagedata,
-                    &bufstate,
-                    cache.compr_lvl,
-                    cache.mem_lvl,
-                    cache.strat,
-                    cache.filters,
-                    width, height)
+    if not success:
+        raise MemoryError("Write to buffer failed for PNG conversion.")
 
     outbuffer = <bytes>bufstate.buffer[:bufstate.size]
+    png_search.png_search_free_buffer(&bufstate)
 
     return outbuffer, cache
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cdef greedy_cache_param optimize_greedy_iterate(numpy.uint8_t[:,:,::1] imagedata, int width, int height):
+cdef greedy_cache_param optimize_greedy_iterate(numpy.uint8_t[:,:,::1] imagedata,
+                                                int width, int height,
+                                                png_search.png_search_buffer *best,
+                                                unsigned int threads):
     """
     Try several different compression settings and choose the settings
     that generate the smallest PNG. The function tries 8 different
@@ -236,6 +426,12 @@ cdef greedy_cache_param optimize_greedy_iterate(numpy.uint8_t[:,:,::1] imagedata
 
     optipng -nx -o2 <filename>.png
 
+    The trials run on up to threads native threads without the GIL.
+    Trials are stopped as soon as their PNG gets larger than the smallest
+    PNG found so far. Settings with adaptive filtering usually create
+    the smallest PNGs, so they are tried first. For PNGs of equal size,
+    the settings are chosen in the order of the OptiPNG trials.
+
     :param imagedata: A memory view of a 3-dimensional array with RGBA color
                       values for pixels. The array is expected to be C-aligned.
     :type imagedata: uint8_t[:,:,::1]
@@ -243,20 +439,23 @@ cdef greedy_cache_param optimize_greedy_iterate(numpy.uint8_t[:,:,::1] imagedata
     :type width: int
     :param height: Height of the image in pixels.
     :type height: int
+    :param best: Buffer that receives the smallest PNG.
+    :type best: png_search_buffer*
+    :param threads: Number of threads that run the trials.
+    :type threads: int
     :returns: Settings that generate the smallest PNG.
     :rtype: greedy_cache_param
     """
-    cdef int     best_filesize = 0x7fffffff
-    cdef int     current_filesize = 0x7fffffff
-    cdef uint8_t best_compr_lvl = 0xFF
-    cdef uint8_t best_compr_mem_lvl = 0xFF
-    cdef uint8_t best_compr_strat = 0xFF
-    cdef uint8_t best_filters = 0xFF
+    cdef png_search.png_search_params trials[GREEDY_TRIAL_COUNT]
+    cdef int trial_order[GREEDY_TRIAL_COUNT]
+    cdef int trial_count = 0
+    cdef int adaptive_count = 0
+    cdef int best_index
+    cdef unsigned int thread_count = max(threads, 1)
+    cdef const uint8_t *data = &imagedata[0,0,0]
 
     cdef greedy_cache_param result
 
-    cdef png_tmp_file.tmp_file_buffer_state bufstate
-
     for filters in range(GREEDY_FILTER_0, GREEDY_FILTER_5 + 1):
         if filters != GREEDY_FILTER_0 and filters != GREEDY_FILTER_5:
             continue
@@ -264,34 +463,39 @@ cdef greedy_cache_param optimize_greedy_iterate(numpy.uint8_t[:,:,::1] imagedata
         for strategy in range(GREEDY_COMPR_STRAT_MIN, GREEDY_COMPR_STRAT_MAX + 1):
             for compr_lvl in range(GREEDY_COMPR_LVL_MIN, GREEDY_COMPR_LVL_MAX + 1):
                 for mem_lvl in range(GREEDY_COMPR_MEM_LVL_MIN, GREEDY_COMPR_MEM_LVL_MAX + 1):
-                    bufstate.buffer = NULL
-                    bufstate.size = 0
-
-                    write_to_buffer(
-                        imagedata,
-                        &bufstate,
-                        compr_lvl,
-                        mem_lvl,
-                        strategy,
-                        filters,
-                        width,
-                        height
-                    )
-
-                    current_filesize = bufstate.size
-
-                    if current_filesize < best_filesize:
-                        # Save the settings if we found a better result
-                        best_compr_lvl = compr_lvl
-                        best_compr_mem_lvl = mem_lvl
-                        best_compr_strat = strategy
-                        best_filters = filters
-                        best_filesize = current_filesize
-
-    result.compr_lvl = best_compr_lvl
-    result.mem_lvl = best_compr_mem_lvl
-    result.strat = best_compr_strat
-    result.filters = best_filters
+                    trials[trial_count].compr_lvl = compr_lvl
+                    trials[trial_count].mem_lvl = mem_lvl
+                    trials[trial_count].strat = strategy
+                    trials[trial_count].filters = filters
+
+                    if filters == GREEDY_FILTER_5:
+                        adaptive_count += 1
+
+                    trial_count += 1
+
+    # adaptive filtering first, then the other trials in their order
+    for idx in range(adaptive_count):
+        trial_order[idx] = trial_count - adaptive_count + idx
+
+    for idx in range(trial_count - adaptive_count):
+        trial_order[adaptive_count + idx] = idx
+
+    with nogil:
+        best_index = png_search.png_search_greedy(data, width, height,
+                                                  trials, trial_order, trial_count,
+                                                  thread_count, best)
+
+    if best_index < 0:
+        result.compr_lvl = 0xFF
+        result.mem_lvl = 0xFF
+        result.strat = 0xFF
+        result.filters = 0xFF
+
+    else:
+        result.compr_lvl = trials[best_index].compr_lvl
+        result.mem_lvl = trials[best_index].mem_lvl
+        result.strat = trials[best_index].strat
+        result.filters = trials[best_index].filters
 
     return result
 
@@ -357,69 +561,3 @@ cdef void write_to_file(numpy.uint8_t[:,:,::1] imagedata,
 
     # Destroy the write struct
     libpng.png_destroy_write_struct(&write_ptr, &write_info_ptr)
-
-
-@cython.boundscheck(False)
-@cython.wraparound(False)
-cdef void write_to_buffer(numpy.uint8_t[:,:,::1] imagedata,
-                          png_tmp_file.tmp_file_buffer_state *bufstate,
-                          int compression_level, int memory_level,
-                          int compression_strategy, int filters,
-                          int width, int height):
-    """
-    Write an image matrix with RGBA color values to a given buffer.
-
-    :param imagedata: A memory view of a 3-dimensional array with RGBA color
-                      values for pixels. The array is expected to be C-aligned.
-    :type imagedata: uint8_t[:,:,::1]
-    :param bufstate: Struct containing the pointer to and the size of a buffer.
-    :type bufstate: png_tmp_file.tmp_file_buffer_state*
-    :param compression_level: libpng compression level setting. (allowed: 1-9)
-    :type compression_level: int
-    :param memory_level: libpng compression memory level setting. (allowed: 1-9)
-    :type memory_level: int
-    :param compression_strategy: libpng compression strategy setting.  (allowed: 0-3)
-    :type compression_strategy: int
-    :param filters: libpng filter flags bitfield. (allowed: 0x08, 0x10, 0x20, 0x40, 0x80, 0xF8)
-    :type filters: int
-    :param width: Width of the image in pixels.
-    :type width: int
-    :param height: Height of the image in pixels.
-    :type height: int
-    """
-    write_ptr = libpng.png_create_write_struct(libpng.PNG_LIBPNG_VER_STRING,
-                                               NULL,
-                                               NULL,
-                                               NULL)
-    write_info_ptr = libpng.png_create_info_struct(write_ptr)
-
-    # Configure write settings
-    libpng.png_set_compression_level(write_ptr, compression_level)
-    libpng.png_set_compression_mem_level(write_ptr, memory_level)
-    libpng.png_set_compression_strategy(write_ptr, compression_strategy)
-    libpng.png_set_filter(write_ptr, libpng.PNG_FILTER_TYPE_DEFAULT, filters)
-
-    libpng.png_set_IHDR(write_ptr, write_info_ptr,
-                        width, height,
-                        8,
-                        libpng.PNG_COLOR_TYPE_RGBA,
-                        libpng.PNG_INTERLACE_NONE,
-                        libpng.PNG_COMPRESSION_TYPE_DEFAULT,
-                        libpng.PNG_FILTER_TYPE_DEFAULT)
-
-    # Set ur write function for writing to buffer
-    libpng.png_set_write_fn(write_ptr,
-                            bufstate,
-                            &png_tmp_file.tmp_file_png_write_fn,
-                            &png_tmp_file.tmp_file_flush_fn)
-
-    # Write the data
-    libpng.png_write_info(write_ptr, write_info_ptr)
-
-    for row_idx in range(height):
-        libpng.png_write_row(write_ptr, &imagedata[row_idx,0,0])
-
-    libpng.png_write_end(write_ptr, write_info_ptr)
-
-    # Destroy the write struct
-    libpng.png_destroy_write_struct(&write_ptr, &write_info_ptr)
@@ -0,0 +1,249 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+from . cimport libpng
+from libc.stdint cimport uint8_t, uint32_t
+
+cdef extern from * nogil:
+    """
+    // Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+    #include "png.h"
+
+    #include <algorithm>
+    #include <atomic>
+    #include <csetjmp>
+    #include <cstdint>
+    #include <cstdio>
+    #include <cstdlib>
+    #include <cstring>
+    #include <mutex>
+    #include <system_error>
+    #include <thread>
+    #include <vector>
+
+    struct png_search_params {
+        uint8_t compr_lvl;
+        uint8_t mem_lvl;
+        uint8_t strat;
+        uint8_t filters;
+    };
+
+    struct png_search_buffer {
+        png_bytep buffer;
+        size_t size;
+        size_t capacity;
+
+        // encoding is stopped when the PNG grows larger than this size (optional)
+        const std::atomic<size_t> *limit;
+        bool limit_exceeded;
+    };
+
+    void png_search_init_buffer(png_search_buffer *state) {
+        state->buffer = nullptr;
+        state->size = 0;
+        state->capacity = 0;
+        state->limit = nullptr;
+        state->limit_exceeded = false;
+    }
+
+    void png_search_free_buffer(png_search_buffer *state) {
+        free(state->buffer);
+        png_search_init_buffer(state);
+    }
+
+    void png_search_write_fn(png_structp png_ptr, png_bytep data, png_size_t length) {
+        png_search_buffer *state = (png_search_buffer *)png_get_io_ptr(png_ptr);
+        size_t new_size = state->size + length;
+
+        if (state->limit and new_size > state->limit->load(std::memory_order_relaxed)) {
+            // the PNG can't be smaller than the limit anymore
+            state->limit_exceeded = true;
+            png_error(png_ptr, "PNG exceeds the size limit");
+        }
+
+        // Grow the buffer geometrically to fit the new data
+        if (new_size > state->capacity) {
+            size_t new_capacity = std::max(new_size, state->capacity * 2);
+            png_bytep new_buffer = (png_bytep)realloc(state->buffer, new_capacity);
+
+            if (not new_buffer) {
+                png_error(png_ptr, "Error allocating memory for in-memory PNG.");
+            }
+
+            state->buffer = new_buffer;
+            state->capacity = new_capacity;
+        }
+
+        memcpy(state->buffer + state->size, data, length);
+        state->size = new_size;
+    }
+
+    void png_search_flush_fn(png_structp png_ptr) {
+        // Do nothing, since changes don't need to be written to disk
+    }
+
+    void png_search_error_fn(png_structp png_ptr, png_const_charp message) {
+        png_search_buffer *state = (png_search_buffer *)png_get_error_ptr(png_ptr);
+
+        if (not state->limit_exceeded) {
+            fprintf(stderr, "libpng error: %s\\n", message);
+        }
+
+        png_longjmp(png_ptr, 1);
+    }
+
+    /**
+     * Encode an image with RGBA color values as PNG into the buffer of state.
+     *
+     * Returns false if the PNG exceeded the size limit of state or could not
+     * be created. The buffer is freed in this case.
+     */
+    bool png_search_encode(const uint8_t *data, uint32_t width, uint32_t height,
+                           png_search_params params, png_search_buffer *state) {
+        png_structp write_ptr = png_create_write_struct(PNG_LIBPNG_VER_STRING,
+                                                        state,
+                                                        png_search_error_fn,
+                                                        nullptr);
+        if (not write_ptr) {
+            return false;
+        }
+
+        png_infop write_info_ptr = png_create_info_struct(write_ptr);
+        if (not write_info_ptr) {
+            png_destroy_write_struct(&write_ptr, nullptr);
+            return false;
+        }
+
+        // png_error() jumps back here
+        if (setjmp(png_jmpbuf(write_ptr))) {
+            png_destroy_write_struct(&write_ptr, &write_info_ptr);
+            free(state->buffer);
+            state->buffer = nullptr;
+            state->size = 0;
+            state->capacity = 0;
+            return false;
+        }
+
+        // Configure write settings
+        png_set_compression_level(write_ptr, params.compr_lvl);
+        png_set_compression_mem_level(write_ptr, params.mem_lvl);
+        png_set_compression_strategy(write_ptr, params.strat);
+        png_set_filter(write_ptr, PNG_FILTER_TYPE_DEFAULT, params.filters);
+
+        png_set_IHDR(write_ptr, write_info_ptr,
+                     width, height,
+                     8,
+                     PNG_COLOR_TYPE_RGBA,
+                     PNG_INTERLACE_NONE,
+                     PNG_COMPRESSION_TYPE_DEFAULT,
+                     PNG_FILTER_TYPE_DEFAULT);
+
+        png_set_write_fn(write_ptr, state, png_search_write_fn, png_search_flush_fn);
+
+        // Write the data
+        png_write_info(write_ptr, write_info_ptr);
+
+        size_t row_size = (size_t)width * 4;
+        for (uint32_t row_idx = 0; row_idx < height; row_idx++) {
+            png_write_row(write_ptr, data + row_idx * row_size);
+        }
+
+        png_write_end(write_ptr, write_info_ptr);
+        png_destroy_write_struct(&write_ptr, &write_info_ptr);
+
+        return true;
+    }
+
+    /**
+     * Encode an image with every parameter set on up to thread_count threads
+     * and move the smallest PNG to best. For PNGs of equal size, the first
+     * parameter set wins, so the result does not depend on the thread count.
+     *
+     * Encodings are stopped as soon as they grow larger than the smallest
+     * PNG found so far. The parameter sets are tried in the order of the
+     * indices in trial_order (optional), so that the sets which usually
+     * create small PNGs can be tried first.
+     *
+     * Returns the index of the best parameter set or -1 if no PNG
+     * could be created.
+     */
+    int png_search_greedy(const uint8_t *data, uint32_t width, uint32_t height,
+                          const png_search_params *params, const int *trial_order,
+                          int count, unsigned int thread_count, png_search_buffer *best) {
+        std::atomic<size_t> best_size{SIZE_MAX};
+        std::atomic<int> next_trial{0};
+        std::mutex best_mutex;
+        int best_index = -1;
+
+        png_search_init_buffer(best);
+
+        auto run_trials = [&]() {
+            while (true) {
+                int trial_idx = next_trial.fetch_add(1);
+                if (trial_idx >= count) {
+                    return;
+                }
+
+                int index = trial_order ? trial_order[trial_idx] : trial_idx;
+
+                png_search_buffer trial;
+                png_search_init_buffer(&trial);
+                trial.limit = &best_size;
+
+                if (not png_search_encode(data, width, height, params[index], &trial)) {
+                    continue;
+                }
+
+                std::lock_guard<std::mutex> lock{best_mutex};
+                if (best_index < 0 or trial.size < best->size or
+                    (trial.size == best->size and index < best_index)) {
+                    free(best->buffer);
+                    *best = trial;
+                    best->limit = nullptr;
+                    best_index = index;
+                    best_size.store(trial.size, std::memory_order_relaxed);
+                }
+                else {
+                    free(trial.buffer);
+                }
+            }
+        };
+
+        std::vector<std::thread> threads;
+        try {
+            for (unsigned int i = 1; i < thread_count and i < (unsigned int)count; i++) {
+                threads.emplace_back(run_trials);
+            }
+        }
+        catch (const std::system_error &) {
+            // the remaining trials are run by the started threads
+        }
+
+        run_trials();
+
+        for (auto &thread : threads) {
+            thread.join();
+        }
+
+        return best_index;
+    }
+    """
+    ctypedef struct png_search_params:
+        uint8_t compr_lvl
+        uint8_t mem_lvl
+        uint8_t strat
+        uint8_t filters
+
+    ctypedef struct png_search_buffer:
+        libpng.png_bytep buffer
+        size_t size
+
+    void png_search_init_buffer(png_search_buffer *state)
+    void png_search_free_buffer(png_search_buffer *state)
+
+    bint png_search_encode(const uint8_t *data, uint32_t width, uint32_t height,
+                           png_search_params params, png_search_buffer *state)
+
+    int png_search_greedy(const uint8_t *data, uint32_t width, uint32_t height,
+                          const png_search_params *params, const int *trial_order,
+                          int count, unsigned int thread_count, png_search_buffer *best)
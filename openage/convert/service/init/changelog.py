@@ -17,6 +17,9 @@ ASSET_VERSION_FILENAME = "asset_version"
 # filename where to store the gamespec version hash
 GAMESPEC_VERSION_FILENAME = "gamespec_version"
 
+# filename where to store the fingerprint of the converted source files
+SOURCE_FINGERPRINT_FILENAME = "source_fingerprint"
+
 # available components for reconversion
 COMPONENTS = {
     "graphics",
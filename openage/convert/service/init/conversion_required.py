@@ -6,6 +6,9 @@ Test whether there already are converted modpacks present.
 from __future__ import annotations
 import typing
 
+import hashlib
+import os
+
 from . import changelog
 from ....log import info, dbg
 
@@ -15,13 +18,20 @@ if typing.TYPE_CHECKING:
     from openage.util.fslike.directory import Directory
 
 
-def conversion_required(asset_dir: Directory, args: Namespace) -> bool:
+def conversion_required(
+    asset_dir: Directory,
+    args: Namespace,
+    source_dir_path: typing.Union[str, bytes] = None
+) -> bool:
     """
     Returns true if an asset conversion is required to run the game.
 
     Sets options in args according to what sorts of conversion are required.
 
-    TODO: Reimplement change detection for new converter.
+    If the path of the source directory is given, the assets are also
+    converted again when the source files changed since the last conversion,
+    e.g. after a game patch. Unchanged media files are then reused from
+    the media export ledger of the modpacks.
     """
     version_path = asset_dir / 'converted' / changelog.ASSET_VERSION_FILENAME
     # determine the version of assets
@@ -43,6 +53,10 @@ def conversion_required(asset_dir: Directory, args: Namespace) -> bool:
 
     changes = changelog.changes(asset_version,)
 
+    if source_dir_path and source_changed(asset_dir, source_dir_path):
+        info("Source files have changed since the last conversion")
+        changes = set(changelog.COMPONENTS)
+
     if not changes:
         dbg("Converted assets are up to date")
         return False
@@ -69,3 +83,75 @@ def conversion_required(asset_dir: Directory, args: Namespace) -> bool:
         args.no_pickle_cache = True
 
     return True
+
+
+def source_changed(
+    asset_dir: Directory,
+    source_dir_path: typing.Union[str, bytes]
+) -> bool:
+    """
+    Returns true if the files in the source directory differ from
+    the ones that the converted assets were created from.
+
+    Assets without a stored fingerprint are treated as unchanged.
+    """
+    fingerprint_path = asset_dir / 'converted' / changelog.SOURCE_FINGERPRINT_FILENAME
+    try:
+        with fingerprint_path.open() as fileobj:
+            stored_fingerprint = fileobj.read().strip()
+
+    except FileNotFoundError:
+        dbg("No fingerprint of the source files has been found")
+        return False
+
+    if not os.path.isdir(source_dir_path):
+        dbg("Source directory of the converted assets does not exist anymore")
+        return False
+
+    return stored_fingerprint != get_source_fingerprint(source_dir_path)
+
+
+def store_source_fingerprint(
+    converted_dir: Directory,
+    source_dir_path: typing.Union[str, bytes]
+) -> None:
+    """
+    Store the fingerprint of the source files that the assets
+    in converted_dir were created from.
+    """
+    fingerprint = get_source_fingerprint(source_dir_path)
+
+    with (converted_dir / changelog.SOURCE_FINGERPRINT_FILENAME).open("w") as fileobj:
+        fileobj.write(fingerprint)
+
+
+def get_source_fingerprint(source_dir_path: typing.Union[str, bytes]) -> str:
+    """
+    Returns a fingerprint of all files in a source directory.
+
+    The fingerprint hashes the relative path, size and modification time
+    of every file, so changed files are detected without reading them.
+    """
+    if isinstance(source_dir_path, str):
+        source_dir_path = source_dir_path.encode()
+
+    hashfunc = hashlib.sha3_256()
+
+    for dirpath, dirnames, filenames in os.walk(source_dir_path):
+        # walk in a stable order
+        dirnames.sort()
+
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+
+            try:
+                stat = os.stat(path)
+
+            except OSError:
+                # broken links
+                continue
+
+            hashfunc.update(os.path.relpath(path, source_dir_path))
+            hashfunc.update(b"\0%d\0%d\n" % (stat.st_size, stat.st_mtime_ns))
+
+    return hashfunc.hexdigest()
@@ -1,4 +1,6 @@
 # Copyright 2020-2022 the openage authors. See copying.md for legal info.
+#
+# pylint: disable=too-many-arguments
 
 """
 Module for reading .dat files.
@@ -7,24 +9,75 @@ from __future__ import annotations
 import typing
 
 import os
-import pickle
-from tempfile import gettempdir
 from zlib import decompress
 
-from ....log import spam, dbg, info, warn
-from ...value_object.read.media.datfile.empiresdat import EmpiresDatWrapper
+from ....log import spam, dbg
+from ...value_object.read.media.datfile.empiresdat import EmpiresDat,\
+    EmpiresDatWrapper
 from ...value_object.read.media_types import MediaType
+from ...value_object.read.offset_index import OffsetIndex
+from .gamespec_cache import GamespecCache
+from .parallel_read import ParallelReader
 
 if typing.TYPE_CHECKING:
     from openage.convert.value_object.init.game_version import GameVersion
     from openage.convert.value_object.read.read_members import ArrayMember
+    from openage.convert.value_object.read.value_members import ContainerMember
     from openage.util.fslike.directory import Directory
     from openage.util.fslike.wrapper import GuardedFile
 
 
-def get_gamespec(srcdir: Directory, game_version: GameVersion, pickle_cache: bool) -> ArrayMember:
+# Sections of the dat file that are used by the conversion processors.
+# The members of the other sections are not created.
+CONVERTED_DAT_SECTIONS = frozenset((
+    "blend_mode_count_swgb",
+    "sounds",
+    "graphics",
+    "terrains",
+    "effect_bundles",
+    "unit_headers",
+    "civs",
+    "researches",
+    "age_connections",
+    "building_connections",
+    "unit_connections",
+    "tech_connections",
+))
+
+
+def get_dat_projection() -> dict[type, frozenset[str]]:
+    """
+    Returns the projection of the dat file members that are
+    needed for conversion.
+
+    The sound and graphics tables are also needed when --no-sounds or
+    --no-graphics are set, because the nyan objects reference the
+    converted files anyway.
+    """
+    return {
+        EmpiresDat: CONVERTED_DAT_SECTIONS,
+    }
+
+
+def get_gamespec(
+    srcdir: Directory,
+    game_version: GameVersion,
+    pickle_cache: bool,
+    *,
+    jobs: int = 1,
+    dynamic_load: bool = False,
+    projection: dict[type, frozenset[str]] = None
+) -> ArrayMember:
     """
     Reads empires.dat file.
+
+    If pickle_cache is True, the result is looked up in and stored
+    to the persistent gamespec cache. jobs is the number of processes
+    used for reading the civ data (number of CPUs for None). The civs
+    are read serially by default.
+    If dynamic_load is True, the members of large records are
+    only parsed when they are accessed. If a projection is given,
+    only the listed members of the structs in it are created.
     """
     if game_version.edition.game_id in ("ROR", "AOE1DE", "AOC", "HDEDITION", "AOE2DE"):
         filepath = srcdir.joinpath(game_version.edition.media_paths[MediaType.DATFILE][0])
@@ -40,14 +93,17 @@ def get_gamespec(srcdir: Directory, game_version: GameVersion, pickle_cache: boo
         raise Exception("No service found for reading data file of "
                         f"version {game_version.edition.game_id}")
 
-    cache_file = os.path.join(
-        gettempdir(), f"{game_version.edition.game_id}_{filepath.name}.pickle")
+    cache = None
+    if pickle_cache:
+        cache = GamespecCache()
 
     with filepath.open('rb') as empiresdat_file:
         gamespec = load_gamespec(empiresdat_file,
                                  game_version,
-                                 cache_file,
-                                 pickle_cache)
+                                 cache,
+                                 dynamic_load=dynamic_load,
+                                 jobs=jobs,
+                                 projection=projection)
 
     return gamespec
 
@@ -55,59 +111,168 @@ def get_gamespec(srcdir: Directory, game_version: GameVersion, pickle_cache: boo
 def load_gamespec(
     fileobj: GuardedFile,
     game_version: GameVersion,
-    cachefile_name: str = None,
-    pickle_cache: bool = False,
-    dynamic_load = False
+    cache: GamespecCache = None,
+    *,
+    dynamic_load = False,
+    jobs: int = 1,
+    projection: dict[type, frozenset[str]] = None
 ) -> ArrayMember:
     """
     Helper method that loads the contents of a 'empires.dat' gzipped wrapper
     file.
 
-    If cachefile_name is given, this file is consulted before performing the
-    load.
+    If cache is given, it is consulted before performing the load and
+    updated afterwards. Dynamically loaded gamespecs are never cached.
+    The offset index of the records is stored alongside the cached gamespec.
+    Because the offsets do not depend on the projection, the index is
+    stored under the key without projection.
     """
+    dbg("reading dat file")
+    compressed_data = fileobj.read()
+    fileobj.close()
+
     # try to use the cached result from a previous run
-    if cachefile_name:
-        try:
-            with open(cachefile_name, "rb") as cachefile:
-                # pickle.load() can fail in many ways, we need to catch all.
-                # pylint: disable=broad-except
-                try:
-                    gamespec = pickle.load(cachefile)
-                    info("using cached wrapper: %s", cachefile_name)
-                    return gamespec
-                except Exception:
-                    warn("could not use cached wrapper:")
-                    import traceback
-                    traceback.print_exc()
-                    warn("we will just skip the cache, no worries.")
-
-        except FileNotFoundError:
-            pass
+    cache_key = None
+    if cache and not dynamic_load:
+        cache_key = cache.get_key(compressed_data, game_version, projection)
+        gamespec = cache.load(cache_key)
+
+        if gamespec is not None:
+            return gamespec
 
     # read the file ourselves
 
-    dbg("reading dat file")
+    file_data = decompress_dat(compressed_data)
+
+    offset_index = None
+    stored_index = None
+    if cache_key:
+        index_key = cache.get_key(compressed_data, game_version)
+        stored_index = cache.load_offset_index(index_key)
+
+        if stored_index is None:
+            offset_index = OffsetIndex()
+
+    gamespec = read_dat(file_data, game_version,
+                        dynamic_load=dynamic_load,
+                        offset_index=offset_index,
+                        jobs=jobs,
+                        projection=projection,
+                        stored_index=stored_index)
+
+    if cache_key:
+        cache.store(cache_key, gamespec)
+
+        if offset_index is not None:
+            cache.store_offset_index(index_key, offset_index)
+
+    return gamespec
+
+
+def load_dat_record(
+    fileobj: GuardedFile,
+    game_version: GameVersion,
+    section: str,
+    record_id: typing.Union[int, tuple[int, ...]],
+    cache: GamespecCache = None
+) -> ContainerMember:
+    """
+    Read a single record (e.g. a unit, tech or civ) from a 'empires.dat' file.
+
+    The record is looked up in the offset index stored in the cache. If there
+    is no index yet, the whole file is scanned once to create it.
+
+    :param section: Section path of the record, e.g. 'researches' or 'civs.units'.
+    :type section: str
+    :param record_id: Index of the record in the section. For nested sections,
+                      a tuple with one index per path element.
+    :type record_id: int, tuple
+    """
     compressed_data = fileobj.read()
     fileobj.close()
 
+    offset_index = None
+    cache_key = None
+    if cache:
+        # same key as the index stored by load_gamespec()
+        cache_key = cache.get_key(compressed_data, game_version)
+        offset_index = cache.load_offset_index(cache_key)
+
+    file_data = decompress_dat(compressed_data)
+    del compressed_data
+
+    if offset_index is None:
+        # Only record the offsets, no members are created
+        offset_index = OffsetIndex()
+        read_dat(file_data, game_version, offset_index=offset_index,
+                 projection={EmpiresDat: frozenset()})
+
+        if cache_key:
+            cache.store_offset_index(cache_key, offset_index)
+
+    return offset_index.read_record(file_data, game_version, EmpiresDat,
+                                    section, record_id)
+
+
+def decompress_dat(compressed_data: bytes) -> bytes:
+    """
+    Decompress the content of a 'empires.dat' file.
+    """
     dbg("decompressing dat file")
     # -15: there's no header, window size is 15.
     file_data = decompress(compressed_data, -15)
-    del compressed_data
 
     spam("length of decompressed data: %d", len(file_data))
 
+    return file_data
+
+
+def read_dat(
+    file_data: bytes,
+    game_version: GameVersion,
+    *,
+    dynamic_load = False,
+    offset_index: OffsetIndex = None,
+    jobs: int = 1,
+    projection: dict[type, frozenset[str]] = None,
+    stored_index: OffsetIndex = None
+) -> ArrayMember:
+    """
+    Read the decompressed content of a 'empires.dat' file.
+
+    If offset_index is given, the offsets of the records are
+    recorded in it. If jobs is not 1, the civ data is read by a
+    pool of jobs worker processes (number of CPUs for None).
+    The parallel reader takes the end of each civ from stored_index
+    (an index of the same data from a previous read) if it is given,
+    so the civs don't have to be scanned before they are read.
+    """
+    cursor = None
+    if offset_index is not None:
+        cursor = offset_index.create_cursor()
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    parallel_reader = None
+    if jobs > 1 and not dynamic_load:
+        parallel_reader = ParallelReader(file_data, game_version, jobs, projection,
+                                         stored_index)
+
     wrapper = EmpiresDatWrapper()
-    _, gamespec = wrapper.read(file_data, 0, game_version, dynamic_load=dynamic_load)
+    try:
+        _, gamespec = wrapper.read(file_data, 0, game_version,
+                                   dynamic_load=dynamic_load,
+                                   offset_index=cursor,
+                                   parallel_reader=parallel_reader,
+                                   projection=projection)
 
-    # Remove the list sorrounding the converted data
-    gamespec = gamespec[0]
-    del wrapper
+        if parallel_reader:
+            parallel_reader.finish()
 
-    if cachefile_name and pickle_cache:
-        dbg("dumping dat file contents to cache file: %s", cachefile_name)
-        with open(cachefile_name, "wb") as cachefile:
-            pickle.dump(gamespec, cachefile)
+    finally:
+        if parallel_reader:
+            parallel_reader.close()
 
-    return gamespec
+    # Remove the list sorrounding the converted data
+    return gamespec[0]
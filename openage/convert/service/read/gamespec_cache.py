@@ -0,0 +1,443 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+"""
+Persistent, content-addressed cache for the gamespec read from .dat files.
+
+Cache entries are keyed by the hash of the (compressed) .dat file, the
+version of the dat reader and the game version. The ValueMember tree is
+stored as plain nested tuples with marshal, which loads much faster than
+pickling the member objects themselves.
+
+Next to each entry, an offset index of the records in the decompressed
+.dat file can be stored. It allows reading single records without
+parsing the whole file.
+"""
+from __future__ import annotations
+import typing
+
+import hashlib
+import marshal
+import os
+import sys
+from tempfile import gettempdir, NamedTemporaryFile
+
+import numpy
+
+from ....default_dirs import get_dir
+from ....log import dbg, info, warn
+from ...value_object.read.value_members import IntMember, FloatMember,\
+    BooleanMember, IDMember, BitfieldMember, StringMember, ContainerMember,\
+    ArrayMember, PrimitiveArrayMember, StorageType
+from ...value_object.read.columnar_table import ColumnarArrayMember, ColumnarTable,\
+    STRING_COLUMN_TYPE
+from ...value_object.read.offset_index import OffsetIndex
+from ..init.changelog import ASSET_VERSION
+
+if typing.TYPE_CHECKING:
+    from openage.convert.value_object.init.game_version import GameVersion
+    from openage.convert.value_object.read.value_members import ValueMember
+
+
+# Version of the dat reader and the cache format.
+# Increment this whenever the dat file structure definitions
+# or the serialization below change, so that old entries are ignored.
+GAMESPEC_CACHE_VERSION = 4
+
+# Default size limit for all cache entries in bytes
+MAX_CACHE_SIZE = 512 * 1024 * 1024
+
+# File suffix of cache entries
+CACHE_FILE_SUFFIX = ".gamespec"
+
+# File suffix of the offset indices stored next to the entries
+OFFSET_INDEX_SUFFIX = ".offsets"
+
+# Member types that are stored as (type_index, name, value)
+_SCALAR_TYPES = (
+    IntMember,
+    FloatMember,
+    BooleanMember,
+    IDMember,
+    BitfieldMember,
+    StringMember,
+)
+
+_SCALAR_TYPE_INDEX = {member_type: index for index, member_type in enumerate(_SCALAR_TYPES)}
+
+_CONTAINER_TYPE_INDEX = len(_SCALAR_TYPES)
+_ARRAY_TYPE_INDEX = len(_SCALAR_TYPES) + 1
+_PRIMITIVE_ARRAY_TYPE_INDEX = len(_SCALAR_TYPES) + 2
+_COLUMNAR_ARRAY_TYPE_INDEX = len(_SCALAR_TYPES) + 3
+
+
+def get_cache_dir() -> str:
+    """
+    Returns the default directory for gamespec cache entries.
+    """
+    try:
+        cache_home = get_dir("cache_home")
+
+    except Exception:  # pylint: disable=broad-except
+        # platform has no cache dir definition
+        return os.path.join(gettempdir(), "openage-gamespec")
+
+    return os.path.join(cache_home, "openage", "gamespec")
+
+
+def encode_member(member: ValueMember) -> tuple:
+    """
+    Convert a ValueMember tree into nested tuples of builtin types.
+    """
+    member_type = type(member)
+
+    if member_type is ContainerMember:
+        return (
+            _CONTAINER_TYPE_INDEX,
+            member.name,
+            tuple(encode_member(submember) for submember in member.value.values())
+        )
+
+    if member_type is ArrayMember:
+        allowed_member_type = member._allowed_member_type  # pylint: disable=protected-access
+        if allowed_member_type is not None:
+            allowed_member_type = allowed_member_type.value
+
+        return (
+            _ARRAY_TYPE_INDEX,
+            member.name,
+            allowed_member_type,
+            tuple(encode_member(submember) for submember in member.value)
+        )
+
+    if member_type is ColumnarArrayMember:
+        return (
+            _COLUMNAR_ARRAY_TYPE_INDEX,
+            member.name,
+            member._allowed_member_type.value,  # pylint: disable=protected-access
+            tuple(encode_member(submember) for submember in member.value),
+            encode_table(member.table)
+        )
+
+    if member_type is PrimitiveArrayMember:
+        array = member.array
+        return (
+            _PRIMITIVE_ARRAY_TYPE_INDEX,
+            member.name,
+            member._allowed_member_type.value,  # pylint: disable=protected-access
+            array.dtype.str,
+            array.tobytes()
+        )
+
+    try:
+        return (_SCALAR_TYPE_INDEX[member_type], member.name, member.value)
+
+    except KeyError:
+        raise TypeError(f"cannot encode member {member} for gamespec cache") from None
+
+
+def decode_member(data: tuple) -> ValueMember:
+    """
+    Restore a ValueMember tree from the output of encode_member().
+
+    Members are created without calling their constructors because
+    the stored values are already validated.
+    """
+    type_index = data[0]
+
+    if type_index == _CONTAINER_TYPE_INDEX:
+        submembers = {}
+        for subdata in data[2]:
+            submember = decode_member(subdata)
+            submembers[submember.name] = submember
+
+        return ContainerMember(data[1], submembers)
+
+    if type_index == _ARRAY_TYPE_INDEX:
+        member = ArrayMember.__new__(ArrayMember)
+        member._name = data[1]  # pylint: disable=protected-access
+        member._value = [decode_member(subdata) for subdata in data[3]]  # pylint: disable=protected-access
+        member._hash = None  # pylint: disable=protected-access
+
+        allowed_member_type = data[2]
+        if allowed_member_type is not None:
+            allowed_member_type = StorageType(allowed_member_type)
+
+        member._allowed_member_type = allowed_member_type  # pylint: disable=protected-access
+        return member
+
+    if type_index == _COLUMNAR_ARRAY_TYPE_INDEX:
+        member = ColumnarArrayMember.__new__(ColumnarArrayMember)
+        member._name = data[1]  # pylint: disable=protected-access
+        member._allowed_member_type = StorageType(data[2])  # pylint: disable=protected-access
+        member._value = [decode_member(subdata) for subdata in data[3]]  # pylint: disable=protected-access
+        member._hash = None  # pylint: disable=protected-access
+        member._table = decode_table(data[4])  # pylint: disable=protected-access
+        return member
+
+    if type_index == _PRIMITIVE_ARRAY_TYPE_INDEX:
+        return PrimitiveArrayMember(data[1],
+                                    StorageType(data[2]),
+                                    numpy.frombuffer(data[4], dtype=data[3]))
+
+    member_type = _SCALAR_TYPES[type_index]
+    member = member_type.__new__(member_type)
+    member._name = data[1]  # pylint: disable=protected-access
+    member._value = data[2]  # pylint: disable=protected-access
+
+    return member
+
+
+def encode_table(table: ColumnarTable) -> tuple:
+    """
+    Convert a columnar table into nested tuples of builtin types.
+    """
+    columns = []
+    for name in table.get_column_names():
+        column = table.column(name)
+        if column.dtype == STRING_COLUMN_TYPE:
+            values = column.tolist()
+
+        else:
+            values = column.tobytes()
+
+        columns.append((name, column.dtype.str, values, table.mask(name).tobytes()))
+
+    return (table.name, table.id_member_name, len(table), tuple(columns))
+
+
+def decode_table(data: tuple) -> ColumnarTable:
+    """
+    Restore a columnar table from the output of encode_table().
+    """
+    name, id_member_name, row_count, column_data = data
+
+    columns = {}
+    masks = {}
+    for column_name, dtype, values, mask in column_data:
+        if numpy.dtype(dtype) == STRING_COLUMN_TYPE:
+            column = numpy.empty(row_count, dtype=STRING_COLUMN_TYPE)
+            column[:] = values
+
+        else:
+            column = numpy.frombuffer(values, dtype=dtype)
+
+        columns[column_name] = column
+        masks[column_name] = numpy.frombuffer(mask, dtype=numpy.bool_)
+
+    return ColumnarTable(name, row_count, columns, masks, id_member_name)
+
+
+class GamespecCache:
+    """
+    Directory of content-addressed gamespec cache entries.
+    """
+
+    def __init__(self, cache_dir: str = None, max_size: int = MAX_CACHE_SIZE):
+        """
+        :param cache_dir: Directory where the cache entries are stored.
+                          Uses the user's cache directory by default.
+        :type cache_dir: str
+        :param max_size: Maximum combined size of all entries in bytes.
+        :type max_size: int
+        """
+        if cache_dir is None:
+            cache_dir = get_cache_dir()
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(
+        dat_data: bytes,
+        game_version: GameVersion,
+        projection: dict[type, frozenset[str]] = None
+    ) -> str:
+        """
+        Create the cache key for the given .dat file content, game version
+        and projection of the read members.
+        """
+        projection_info = ""
+        if projection:
+            projection_info = ";".join(
+                f"{cls.__module__}.{cls.__qualname__}:{','.join(sorted(members))}"
+                for cls, members in sorted(projection.items(),
+                                           key=lambda item: item[0].__qualname__)
+            )
+
+        version_info = "|".join((
+            str(GAMESPEC_CACHE_VERSION),
+            str(ASSET_VERSION),
+            str(marshal.version),
+            sys.implementation.cache_tag or "",
+            game_version.edition.game_id,
+            ",".join(expansion.game_id for expansion in game_version.expansions),
+            projection_info,
+        ))
+
+        hashfunc = hashlib.sha3_256(dat_data)
+        hashfunc.update(version_info.encode())
+
+        return f"{game_version.edition.game_id}-{hashfunc.hexdigest()}"
+
+    def get_path(self, key: str) -> str:
+        """
+        Returns the path of the cache entry for a key.
+        """
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def get_offset_index_path(self, key: str) -> str:
+        """
+        Returns the path of the offset index stored for a key.
+        """
+        return os.path.join(self.cache_dir, key + OFFSET_INDEX_SUFFIX)
+
+    def load(self, key: str) -> typing.Union[ValueMember, None]:
+        """
+        Load the gamespec stored for key. Returns None if there is
+        no usable entry.
+        """
+        path = self.get_path(key)
+
+        try:
+            with open(path, "rb") as cachefile:
+                stored_key, data = marshal.load(cachefile)
+
+        except FileNotFoundError:
+            return None
+
+        except (OSError, EOFError, ValueError, TypeError):
+            warn("could not use cached gamespec: %s", path)
+            return None
+
+        if stored_key != key:
+            warn("cached gamespec does not match its key: %s", path)
+            return None
+
+        # mark as recently used for eviction
+        try:
+            os.utime(path)
+
+        except OSError:
+            pass
+
+        info("using cached gamespec: %s", path)
+
+        return decode_member(data)
+
+    def store(self, key: str, gamespec: ValueMember) -> None:
+        """
+        Atomically write the gamespec to the cache entry for key
+        and evict old entries afterwards.
+        """
+        path = self.get_path(key)
+        dbg("dumping dat file contents to cache file: %s", path)
+
+        data = encode_member(gamespec)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            with NamedTemporaryFile("wb", dir=self.cache_dir,
+                                    suffix=".tmp", delete=False) as tmpfile:
+                try:
+                    marshal.dump((key, data), tmpfile)
+
+                except BaseException:
+                    tmpfile.close()
+                    os.remove(tmpfile.name)
+                    raise
+
+            os.replace(tmpfile.name, path)
+
+        except OSError as exc:
+            warn("could not write gamespec cache file %s: %s", path, exc)
+            return
+
+        self.evict(keep=key)
+
+    def load_offset_index(self, key: str) -> typing.Union[OffsetIndex, None]:
+        """
+        Load the offset index stored for key. Returns None if there is
+        no usable index.
+        """
+        path = self.get_offset_index_path(key)
+
+        try:
+            index = OffsetIndex.load(path)
+
+        except FileNotFoundError:
+            return None
+
+        except (OSError, EOFError, ValueError, TypeError):
+            warn("could not use cached offset index: %s", path)
+            return None
+
+        try:
+            os.utime(path)
+
+        except OSError:
+            pass
+
+        return index
+
+    def store_offset_index(self, key: str, index: OffsetIndex) -> None:
+        """
+        Atomically write the offset index for key.
+        """
+        path = self.get_offset_index_path(key)
+        dbg("storing dat file offset index: %s", path)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            index.save(path)
+
+        except OSError as exc:
+            warn("could not write offset index %s: %s", path, exc)
+            return
+
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None) -> None:
+        """
+        Remove the least recently used files until the combined size
+        of the cache is below the size limit.
+
+        :param keep: Key whose files must not be removed.
+        :type keep: str
+        """
+        entries = []
+        total_size = 0
+
+        keep_paths = ()
+        if keep:
+            keep_paths = (self.get_path(keep), self.get_offset_index_path(keep))
+
+        try:
+            with os.scandir(self.cache_dir) as dir_entries:
+                for entry in dir_entries:
+                    if not entry.name.endswith((CACHE_FILE_SUFFIX, OFFSET_INDEX_SUFFIX)):
+                        continue
+
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+
+        except OSError:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+
+            if path in keep_paths:
+                continue
+
+            try:
+                os.remove(path)
+                dbg("evicted gamespec cache file: %s", path)
+
+            except OSError:
+                continue
+
+            total_size -= size
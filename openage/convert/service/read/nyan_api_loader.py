@@ -4,14 +4,22 @@
 """
 Loads the API into the converter.
 
+The objects are created by the hardcoded definitions below. Tools that
+only access a few objects can load them from a snapshot instead
+(see nyan_api_snapshot).
+
 TODO: Implement a parser instead of hardcoded
 object creation.
 """
 from __future__ import annotations
 
+import hashlib
+
+from ....log import warn
 from ....nyan.nyan_structs import NyanMemberType
 from ....nyan.nyan_structs import NyanObject, NyanMember, MemberType, MemberSpecialValue,\
     MemberOperator
+from .nyan_api_snapshot import load_snapshot, store_snapshot
 
 # Common primitive types
 # We can use these so we don't have to create them every single time
@@ -22,19 +30,57 @@ N_FILE = NyanMemberType("file")
 N_BOOL = NyanMemberType("bool")
 
 
-def load_api() -> dict[str, NyanObject]:
+def load_api(use_snapshot: bool = False) -> dict[str, NyanObject]:
     """
     Returns a dict with the API object's fqon as keys
     and the API objects as values.
+
+    If use_snapshot is True, the objects are loaded lazily from the
+    snapshot of the current API version in the user's cache directory.
+    If there is no snapshot yet, the objects are created and the snapshot
+    is stored. Loading all objects from the snapshot is slower than
+    creating them, so this only pays off if few objects are accessed.
     """
+    api_version = None
+    if use_snapshot:
+        try:
+            api_version = get_api_version()
+
+        except OSError:
+            # source is not available, e.g. in frozen builds
+            use_snapshot = False
+
+    if use_snapshot:
+        api_objects = load_snapshot(api_version)
+
+        if api_objects is not None:
+            return api_objects
+
     api_objects = {}
 
     api_objects = _create_objects(api_objects)
     _insert_members(api_objects)
 
+    if use_snapshot:
+        try:
+            store_snapshot(api_version, api_objects)
+
+        except Exception as exc:  # pylint: disable=broad-except
+            warn("could not create nyan API snapshot: %s", exc)
+
     return api_objects
 
 
+def get_api_version() -> str:
+    """
+    Returns the version of the API objects defined in this module.
+
+    The version changes whenever the definitions are edited.
+    """
+    with open(__file__, "rb") as source:
+        return hashlib.sha3_256(source.read()).hexdigest()
+
+
 def _create_objects(api_objects) -> None:
     """
     Creates the API objects.
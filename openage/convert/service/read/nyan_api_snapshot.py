@@ -0,0 +1,448 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+"""
+Persistent snapshot of the nyan API objects.
+
+The snapshot stores the final state of every API object (members,
+inherited members with values and the times which order the inheritance)
+as nested tuples of builtin types with marshal. Objects are only created
+when they are accessed by their fqon, so tools that need a few objects
+don't have to run the hardcoded construction in nyan_api_loader.
+"""
+from __future__ import annotations
+import typing
+
+import hashlib
+import marshal
+import os
+from tempfile import gettempdir, NamedTemporaryFile, TemporaryDirectory
+
+from ....default_dirs import get_dir
+from ....log import dbg, warn
+from ....testing.testing import assert_value
+from ....nyan.nyan_structs import NyanObject, NyanMember, InheritedNyanMember,\
+    NyanMemberType, MemberType, MemberSpecialValue, MemberOperator,\
+    advance_inheritance_time
+from ....util.ordered_set import OrderedSet
+
+
+# Version of the snapshot format.
+# Increment this whenever the encoding below changes.
+API_SNAPSHOT_VERSION = 2
+
+# File suffix of snapshots
+SNAPSHOT_FILE_SUFFIX = ".nyanapi"
+
+
+def get_snapshot_dir() -> str:
+    """
+    Returns the default directory for API snapshots.
+    """
+    try:
+        cache_home = get_dir("cache_home")
+
+    except Exception:  # pylint: disable=broad-except
+        # platform has no cache dir definition
+        return os.path.join(gettempdir(), "openage-nyan-api")
+
+    return os.path.join(cache_home, "openage", "nyan_api")
+
+
+def get_snapshot_key(api_version: str) -> str:
+    """
+    Create the key of the snapshot for an API version.
+    """
+    version_info = "|".join((
+        str(API_SNAPSHOT_VERSION),
+        str(marshal.version),
+        api_version,
+    ))
+
+    return hashlib.sha3_256(version_info.encode()).hexdigest()
+
+
+def encode_api(api_objects: dict[str, NyanObject]) -> tuple:
+    """
+    Convert the API objects into nested tuples of builtin types.
+
+    Objects are referenced by their key in api_objects.
+    """
+    keys = {id(nyan_object): fqon for fqon, nyan_object in api_objects.items()}
+
+    def encode_ref(nyan_object: NyanObject) -> str:
+        try:
+            return keys[id(nyan_object)]
+
+        except KeyError:
+            raise Exception(f"{nyan_object} is referenced by the API, "
+                            "but not part of it") from None
+
+    def encode_type(member_type: NyanMemberType) -> tuple:
+        if member_type.is_object():
+            type_ref = (encode_ref(member_type.get_type()),)
+
+        else:
+            type_ref = member_type.get_type().value
+
+        element_types = member_type.get_element_types()
+        if element_types is not None:
+            element_types = tuple(encode_type(element_type) for element_type in element_types)
+
+        return (type_ref, element_types)
+
+    def encode_value(value) -> tuple:
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return ("v", value)
+
+        if isinstance(value, MemberSpecialValue):
+            return ("s", value.value)
+
+        if isinstance(value, NyanObject):
+            return ("o", encode_ref(value))
+
+        if isinstance(value, OrderedSet):
+            return ("os", tuple(encode_value(elem) for elem in value))
+
+        if isinstance(value, set):
+            return ("set", tuple(encode_value(elem) for elem in value))
+
+        if isinstance(value, dict):
+            return ("d", tuple((encode_value(key), encode_value(elem))
+                               for key, elem in value.items()))
+
+        raise Exception(f"cannot encode API member value {value!r}")
+
+    def encode_member(member: NyanMember) -> tuple:
+        operator = member.get_operator()
+        if operator is not None:
+            operator = operator.value
+
+        data = (
+            member.get_name(),
+            encode_type(member.get_member_type()),
+            encode_value(member.get_value()),
+            operator,
+            member.get_override_depth(),
+        )
+
+        if member.is_inherited():
+            data += (encode_ref(member.get_parent()), encode_ref(member.get_origin()))
+
+        return data
+
+    # pylint: disable=protected-access
+    records = []
+    for fqon, nyan_object in api_objects.items():
+        # subclasses are excluded on purpose, because the records
+        # are always restored as plain NyanObjects
+        # pylint: disable=unidiomatic-typecheck
+        if type(nyan_object) is not NyanObject or nyan_object.get_nested_objects():
+            raise Exception(f"cannot encode API object {nyan_object}")
+
+        records.append((
+            fqon,
+            nyan_object.get_name(),
+            nyan_object.get_fqon(),
+            tuple(encode_ref(parent) for parent in nyan_object.get_parents()),
+            tuple(encode_member(member) for member in nyan_object._members),
+            tuple(encode_member(member)
+                  for member in nyan_object._inherited_members.values()),
+            nyan_object._inheritance_time,
+            tuple(nyan_object._member_times[member] for member in nyan_object._members),
+        ))
+
+    return tuple(records)
+
+
+class LazyAPIObjects(dict):
+    """
+    Dict of API objects by fqon which creates the objects from
+    their snapshot records on first access.
+
+    Iterating over the values or items creates all objects.
+    """
+
+    def __init__(self, records: tuple):
+        super().__init__()
+
+        # fqon -> record (None for objects that were set directly)
+        self._records: dict[str, tuple] = {record[0]: record for record in records}
+
+        # objects created from now on must be newer than the stored ones
+        advance_inheritance_time(max((max((record[6], *record[7])) for record in records),
+                                     default=0))
+
+    def __getitem__(self, fqon: str) -> NyanObject:
+        try:
+            return super().__getitem__(fqon)
+
+        except KeyError:
+            record = self._records[fqon]
+
+        return self._create_object(record)
+
+    def __setitem__(self, fqon: str, nyan_object: NyanObject) -> None:
+        self._records.setdefault(fqon, None)
+        super().__setitem__(fqon, nyan_object)
+
+    def __contains__(self, fqon) -> bool:
+        return fqon in self._records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, fqon: str, default: NyanObject = None) -> NyanObject:
+        if fqon in self._records:
+            return self[fqon]
+
+        return default
+
+    def keys(self):
+        return self._records.keys()
+
+    def values(self) -> list[NyanObject]:
+        return [self[fqon] for fqon in self._records]
+
+    def items(self) -> list[tuple[str, NyanObject]]:
+        return [(fqon, self[fqon]) for fqon in self._records]
+
+    def update(self, *args, **kwargs) -> None:
+        for fqon, nyan_object in dict(*args, **kwargs).items():
+            self[fqon] = nyan_object
+
+    def get_created_count(self) -> int:
+        """
+        Returns the number of objects that have been created.
+        """
+        return super().__len__()
+
+    def _create_object(self, record: tuple) -> NyanObject:
+        """
+        Create an API object from its record.
+
+        The object is stored before its members are created, so that
+        members can reference objects which reference this object again.
+        Objects only know the children that have been created, because
+        the children are only used to pass on members added later.
+        """
+        (fqon, name, object_fqon, parent_refs, member_records, inherited_records,
+         inheritance_time, member_times) = record
+
+        # pylint: disable=protected-access
+        nyan_object = NyanObject.__new__(NyanObject)
+        nyan_object.name = name
+        nyan_object._fqon = object_fqon
+        nyan_object._nested_objects = OrderedSet()
+        nyan_object._children = OrderedSet()
+        nyan_object._inheritance_time = inheritance_time
+        nyan_object._inheritance = None
+        super().__setitem__(fqon, nyan_object)
+
+        nyan_object._parents = OrderedSet()
+        for parent_ref in parent_refs:
+            parent = self[parent_ref]
+            nyan_object._parents.add(parent)
+            parent._children.add(nyan_object)
+
+        self._create_members(nyan_object, member_records, inherited_records, member_times)
+
+        return nyan_object
+
+    def _create_members(
+        self,
+        nyan_object: NyanObject,
+        member_records: tuple,
+        inherited_records: tuple,
+        member_times: tuple
+    ) -> None:
+        """
+        Create the members and inherited members of an API object
+        from their records.
+        """
+        # pylint: disable=protected-access
+        nyan_object._members = OrderedSet()
+        nyan_object._member_times = {}
+        for member_record, member_time in zip(member_records, member_times):
+            member = self._create_member(member_record)
+            nyan_object._members.add(member)
+            nyan_object._member_times[member] = member_time
+
+        nyan_object._inherited_members = {}
+        for member_record in inherited_records:
+            member = self._create_member(member_record)
+            nyan_object._inherited_members[(member.name, member._origin)] = member
+
+    def _create_member(self, record: tuple) -> NyanMember:
+        """
+        Create a member or inherited member from its record.
+        """
+        # pylint: disable=protected-access
+        if len(record) > 5:
+            member = InheritedNyanMember.__new__(InheritedNyanMember)
+            member._parent = self[record[5]]
+            member._origin = self[record[6]]
+
+        else:
+            member = NyanMember.__new__(NyanMember)
+
+        member.name = record[0]
+        member._member_type = self._create_type(record[1])
+        member.value = self._create_value(record[2])
+        member._operator = None if record[3] is None else MemberOperator(record[3])
+        member._override_depth = record[4]
+
+        return member
+
+    def _create_type(self, record: tuple) -> NyanMemberType:
+        """
+        Create a member type from its record.
+        """
+        # pylint: disable=protected-access
+        type_ref, element_records = record
+
+        member_type = NyanMemberType.__new__(NyanMemberType)
+        if isinstance(type_ref, tuple):
+            member_type._member_type = self[type_ref[0]]
+
+        else:
+            member_type._member_type = MemberType(type_ref)
+
+        member_type._element_types = None
+        if element_records is not None:
+            member_type._element_types = tuple(self._create_type(element_record)
+                                               for element_record in element_records)
+
+        return member_type
+
+    def _create_value(self, record: tuple):
+        """
+        Create a member value from its record.
+        """
+        value_type, data = record[0], record[1]
+
+        if value_type == "v":
+            return data
+
+        if value_type == "s":
+            return MemberSpecialValue(data)
+
+        if value_type == "o":
+            return self[data]
+
+        if value_type == "os":
+            return OrderedSet(self._create_value(elem) for elem in data)
+
+        if value_type == "set":
+            return {self._create_value(elem) for elem in data}
+
+        if value_type == "d":
+            return {self._create_value(key): self._create_value(elem) for key, elem in data}
+
+        raise Exception(f"unknown API member value type {value_type}")
+
+
+def load_snapshot(
+    api_version: str,
+    snapshot_dir: str = None
+) -> typing.Union[LazyAPIObjects, None]:
+    """
+    Load the API snapshot stored for api_version. Returns None if there
+    is no usable snapshot.
+    """
+    if snapshot_dir is None:
+        snapshot_dir = get_snapshot_dir()
+
+    key = get_snapshot_key(api_version)
+    path = os.path.join(snapshot_dir, key + SNAPSHOT_FILE_SUFFIX)
+
+    try:
+        with open(path, "rb") as snapshot_file:
+            stored_key, records = marshal.load(snapshot_file)
+
+    except FileNotFoundError:
+        return None
+
+    except (OSError, EOFError, ValueError, TypeError):
+        warn("could not use nyan API snapshot: %s", path)
+        return None
+
+    if stored_key != key:
+        warn("nyan API snapshot does not match its key: %s", path)
+        return None
+
+    dbg("using nyan API snapshot: %s", path)
+
+    return LazyAPIObjects(records)
+
+
+def store_snapshot(
+    api_version: str,
+    api_objects: dict[str, NyanObject],
+    snapshot_dir: str = None
+) -> None:
+    """
+    Atomically write the snapshot of the API objects for api_version.
+    Snapshots of other API versions are removed.
+    """
+    if snapshot_dir is None:
+        snapshot_dir = get_snapshot_dir()
+
+    key = get_snapshot_key(api_version)
+    path = os.path.join(snapshot_dir, key + SNAPSHOT_FILE_SUFFIX)
+
+    records = encode_api(api_objects)
+
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+        with NamedTemporaryFile("wb", dir=snapshot_dir,
+                                suffix=".tmp", delete=False) as tmpfile:
+            try:
+                marshal.dump((key, records), tmpfile)
+
+            except BaseException:
+                tmpfile.close()
+                os.remove(tmpfile.name)
+                raise
+
+        os.replace(tmpfile.name, path)
+
+    except OSError as exc:
+        warn("could not write nyan API snapshot %s: %s", path, exc)
+        return
+
+    dbg("stored nyan API snapshot: %s", path)
+
+    # only one API version is used at a time
+    try:
+        with os.scandir(snapshot_dir) as dir_entries:
+            for entry in dir_entries:
+                if entry.name.endswith(SNAPSHOT_FILE_SUFFIX) and entry.path != path:
+                    os.remove(entry.path)
+
+    except OSError:
+        pass
+
+
+def test() -> None:
+    """
+    The objects loaded from a snapshot must be identical to the
+    objects created by the API loader.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from .nyan_api_loader import load_api
+
+    api_objects = load_api(use_snapshot=False)
+
+    with TemporaryDirectory() as snapshot_dir:
+        store_snapshot("test", api_objects, snapshot_dir)
+        snapshot_objects = load_snapshot("test", snapshot_dir)
+
+    assert_value(snapshot_objects is not None, True)
+    assert_value(list(snapshot_objects.keys()), list(api_objects.keys()))
+
+    for fqon, nyan_object in api_objects.items():
+        assert_value(snapshot_objects[fqon].dump(), nyan_object.dump())
@@ -0,0 +1,183 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+"""
+Parallel generation of the members of large dat file sections.
+
+The reader walks over the entries of these sections without creating
+members, which is enough to find where each entry starts and ends.
+If an offset index from a previous read is available, the ends are
+taken from the index instead and the walk is skipped. The entries are
+then read by a pool of worker processes which share the decompressed
+data through a memory-mapped file. The results are merged back into
+the containers that the reader created for them, so the gamespec has
+the same layout as a sequential read.
+"""
+from __future__ import annotations
+import typing
+
+from concurrent.futures import ProcessPoolExecutor
+import marshal
+import mmap
+import os
+from tempfile import NamedTemporaryFile
+
+from ....log import dbg
+from .gamespec_cache import encode_member, decode_member
+
+if typing.TYPE_CHECKING:
+    from concurrent.futures import Future
+    from openage.convert.value_object.init.game_version import GameVersion
+    from openage.convert.value_object.read.genie_structure import GenieStructure
+    from openage.convert.value_object.read.offset_index import OffsetIndex
+    from openage.convert.value_object.read.value_members import ValueMember
+
+
+# Data shared with the worker processes, set by _init_worker()
+# keys: data, game_version, projection
+_WORKER_STATE: dict[str, typing.Any] = {}
+
+
+def _init_worker(
+    path: str,
+    game_version: GameVersion,
+    projection: dict[type, frozenset[str]]
+) -> None:
+    """
+    Map the decompressed data into a worker process.
+    """
+    with open(path, "rb") as datafile:
+        _WORKER_STATE["data"] = mmap.mmap(datafile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    _WORKER_STATE["game_version"] = game_version
+    _WORKER_STATE["projection"] = projection
+
+
+def _read_entry(
+    data_class: type[GenieStructure],
+    offset: int,
+    varargs: dict[str, typing.Any]
+) -> bytes:
+    """
+    Read a single entry in a worker process.
+
+    The members are returned in the gamespec cache encoding, which is
+    much cheaper to transfer than pickled member objects.
+    """
+    new_data = data_class(**varargs)
+    _, members = new_data.read(_WORKER_STATE["data"], offset,
+                               _WORKER_STATE["game_version"], data_class,
+                               projection=_WORKER_STATE["projection"])
+
+    return marshal.dumps(tuple(encode_member(member) for member in members))
+
+
+class ParallelReader:
+    """
+    Generates the members of dat file entries in a process pool.
+    """
+
+    def __init__(
+        self,
+        raw: bytes,
+        game_version: GameVersion,
+        jobs: int = None,
+        projection: dict[type, frozenset[str]] = None,
+        offset_index: OffsetIndex = None
+    ):
+        """
+        Start the worker pool.
+
+        :param raw: Decompressed data that is read.
+        :type raw: bytes
+        :param jobs: Number of worker processes. Uses the number of CPUs by default.
+        :type jobs: int
+        :param projection: Members that are created for each struct class.
+        :type projection: dict
+        :param offset_index: Offset index stored for the data by a previous read.
+        :type offset_index: OffsetIndex
+        """
+        self.offset_index = offset_index
+
+        # the data is shared with the workers through a memory-mapped file
+        with NamedTemporaryFile("wb", suffix=".dat", delete=False) as datafile:
+            datafile.write(raw)
+
+        self.data_path = datafile.name
+
+        self.pool = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(self.data_path, game_version, projection)
+        )
+
+        # (members of an entry, pending result)
+        self.pending: list[tuple[dict[str, ValueMember], Future]] = []
+
+    def get_entry_end(
+        self,
+        var_name: str,
+        entry_id: int,
+        offset: int
+    ) -> typing.Union[int, None]:
+        """
+        Returns the offset after an entry of a top-level section if the
+        stored offset index knows it, otherwise None.
+
+        :param var_name: Member name of the section.
+        :type var_name: str
+        :param entry_id: Index of the entry in the section.
+        :type entry_id: int
+        :param offset: Offset of the entry, which is checked against the index.
+        :type offset: int
+        """
+        if self.offset_index is None:
+            return None
+
+        return self.offset_index.get_record_end(var_name, entry_id, offset)
+
+    def submit(
+        self,
+        data_class: type[GenieStructure],
+        offset: int,
+        varargs: dict[str, typing.Any] = None
+    ) -> dict[str, ValueMember]:
+        """
+        Queue the entry at offset for reading.
+
+        Returns the dict which is filled with the members of the entry
+        when finish() is called.
+        """
+        future = self.pool.submit(_read_entry, data_class, offset, varargs or {})
+
+        members = {}
+        self.pending.append((members, future))
+
+        return members
+
+    def finish(self) -> None:
+        """
+        Wait for all queued entries and fill in their members.
+        """
+        try:
+            for members, future in self.pending:
+                for data in marshal.loads(future.result()):
+                    member = decode_member(data)
+                    members[member.name] = member
+
+            dbg("read %d entries in parallel", len(self.pending))
+
+        finally:
+            self.pending.clear()
+            self.close()
+
+    def close(self) -> None:
+        """
+        Stop the workers and remove the shared data.
+        """
+        self.pool.shutdown(cancel_futures=True)
+
+        try:
+            os.remove(self.data_path)
+
+        except FileNotFoundError:
+            pass
@@ -9,15 +9,19 @@ import typing
 
 
 from ...log import info, dbg
+from ...nyan.nyan_structs import get_validation_mode, set_validation_mode
 from ..processor.export.modpack_exporter import ModpackExporter
 from ..service.debug_info import debug_gamedata_format
 from ..service.debug_info import debug_string_resources,\
     debug_registered_graphics, debug_modpack
-from ..service.init.changelog import (ASSET_VERSION)
-from ..service.read.gamedata import get_gamespec
+from ..service.conversion.internal_name_lookups import get_lookup_stats
+from ..service.init.changelog import ASSET_VERSION, ASSET_VERSION_FILENAME
+from ..service.read.gamedata import get_gamespec, get_dat_projection
 from ..service.read.palette import get_palettes
 from ..service.read.register_media import get_existing_graphics
 from ..service.read.string_resource import get_string_resources
+from ..value_object.read.dynamic_loader import RECORD_CACHE
+from ..value_object.read.value_members import DIFF_CACHE
 
 if typing.TYPE_CHECKING:
     from argparse import Namespace
@@ -25,6 +29,10 @@ if typing.TYPE_CHECKING:
     from openage.convert.value_object.init.game_version import GameVersion
 
 
+# Memory budget for parsed dat records in low memory mode
+LOW_MEMORY_CACHE_BUDGET = 16 * 1024 * 1024
+
+
 def convert(args: Namespace) -> typing.Generator[str, None, None]:
     """
     args must hold srcdir and targetdir (FS-like objects),
@@ -39,6 +47,10 @@ def convert(args: Namespace) -> typing.Generator[str, None, None]:
     # with args.targetdir[GAMESPEC_VERSION_FILENAME].open('w') as fil:
     #     fil.write(EmpiresDat.get_hash(args.game_version))
 
+    # mark the converted assets as up to date
+    with args.targetdir[ASSET_VERSION_FILENAME].open('w') as fil:
+        fil.write(str(ASSET_VERSION))
+
     # clean args (set by convert_metadata for convert_media)
     del args.palettes
 
@@ -72,7 +84,18 @@ def convert_metadata(args: Namespace) -> typing.Generator[str, None, None]:
     # Read .dat
     yield "empires.dat"
     debug_gamedata_format(args.debugdir, args.debug_info, args.game_version)
-    gamespec = get_gamespec(args.srcdir, args.game_version, not args.flag("no_pickle_cache"))
+    low_memory = args.flag("low_memory")
+    if low_memory:
+        RECORD_CACHE.set_budget(LOW_MEMORY_CACHE_BUDGET)
+
+    # the civs are only read in parallel if requested
+    read_jobs = args.jobs if args.flag("parallel_read") else 1
+
+    gamespec = get_gamespec(args.srcdir, args.game_version,
+                            not args.flag("no_pickle_cache"),
+                            jobs=read_jobs,
+                            dynamic_load=low_memory,
+                            projection=get_dat_projection())
 
     # Blending mode count
     if args.game_version.edition.game_id == "SWGB":
@@ -90,14 +113,36 @@ def convert_metadata(args: Namespace) -> typing.Generator[str, None, None]:
     debug_registered_graphics(args.debugdir, args.debug_info, existing_graphics)
 
     # Convert
-    modpacks = args.converter.convert(gamespec,
-                                      args,
-                                      string_resources,
-                                      existing_graphics)
-
-    for modpack in modpacks:
+    # the validation mode is only changed for this conversion
+    prev_validation_mode = get_validation_mode()
+    set_validation_mode(args.nyan_validation)
+    try:
+        modpacks = args.converter.convert(gamespec,
+                                          args,
+                                          string_resources,
+                                          existing_graphics)
+
+    finally:
+        set_validation_mode(prev_validation_mode)
+
+    dbg("internal name lookups: %s", get_lookup_stats())
+
+    # the cached diffs reference the game data
+    dbg("member diff cache: %s", DIFF_CACHE.get_stats())
+    DIFF_CACHE.clear()
+
+    if low_memory:
+        # the game data is not needed for exporting
+        del gamespec
+        RECORD_CACHE.clear()
+        dbg("dat record cache: %s", RECORD_CACHE.get_stats())
+
+    while modpacks:
+        # exported modpacks are released immediately
+        modpack = modpacks.pop(0)
         ModpackExporter.export(modpack, args)
         debug_modpack(args.debugdir, args.debug_info, modpack)
+        del modpack
 
     yield "player color palette"
     # player_palette = PlayerColorTable(palette)
@@ -0,0 +1,457 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+"""
+Columnar (struct-of-arrays) tables for the records of dat file sections.
+
+Large sections like units, graphics or techs are read as ArrayMembers that
+contain one ContainerMember per record. Filtering the records or looking
+up a record by ID then requires a member lookup per record. The reader
+additionally stores the scalar members of these records in a
+ColumnarTable with one NumPy array per member while the records are read.
+The columns are taken from the attributes that the compiled read plan
+sets on the struct of each record, so no members are created for them.
+The table is stored in the ColumnarArrayMember of the section.
+"""
+from __future__ import annotations
+import typing
+
+from operator import attrgetter
+
+import numpy
+
+from ....testing.testing import assert_value
+from .read_members import IncludeMembers
+from .read_plan import ReadStepKind, NUMPY_TYPE_LOOKUP
+from .value_members import ArrayMember
+
+if typing.TYPE_CHECKING:
+    from openage.convert.value_object.init.game_version import GameVersion
+    from openage.convert.value_object.read.genie_structure import GenieStructure
+    from openage.convert.value_object.read.value_members import ContainerMember,\
+        StorageType, ValueMember
+
+
+# column formats of the struct classes, keyed by (struct class, game version)
+_COLUMN_FORMAT_CACHE: dict[tuple[type, GameVersion], tuple[tuple[str, numpy.dtype], ...]] = {}
+
+# dtype of columns that store strings
+STRING_COLUMN_TYPE = numpy.dtype(object)
+
+
+def get_column_format(
+    struct_class: type[GenieStructure],
+    game_version: GameVersion
+) -> tuple[tuple[str, numpy.dtype], ...]:
+    """
+    Returns the names and dtypes of the scalar members of a struct class
+    from its compiled read plan. Members of included structs are part of
+    the format, arrays, subdata and members with a custom read type are not.
+    """
+    key = (struct_class, game_version)
+    try:
+        return _COLUMN_FORMAT_CACHE[key]
+
+    except KeyError:
+        pass
+
+    column_format = []
+    for step in struct_class.get_read_plan(game_version):
+        if step.kind is ReadStepKind.STRUCT_RUN:
+            for _, var_name, _, symbol, _, _, _, is_array in step.items:
+                if symbol == "s":
+                    column_format.append((var_name, STRING_COLUMN_TYPE))
+
+                elif not is_array:
+                    column_format.append((var_name, NUMPY_TYPE_LOOKUP[symbol]))
+
+        elif step.kind is ReadStepKind.PRIMITIVE:
+            # only strings have a dynamic length and are stored as a single value
+            if step.symbol == "s" and not step.is_custom:
+                column_format.append((step.var_name, STRING_COLUMN_TYPE))
+
+        elif step.kind is ReadStepKind.GROUP:
+            if isinstance(step.var_type, IncludeMembers):
+                column_format.extend(get_column_format(step.var_type.cls, game_version))
+
+    result = tuple(column_format)
+    _COLUMN_FORMAT_CACHE[key] = result
+
+    return result
+
+
+class ColumnarTable:
+    """
+    Stores the scalar members of the records of a dat file section
+    with one NumPy array per member.
+
+    Records without a member have a fill value (0 or "") in the column
+    of the member and are marked as absent in the mask of the column.
+    """
+
+    __slots__ = ('name', 'id_member_name', '_row_count', '_columns', '_masks', '_index')
+
+    def __init__(
+        self,
+        name: str,
+        row_count: int,
+        columns: dict[str, numpy.ndarray],
+        masks: dict[str, numpy.ndarray],
+        id_member_name: str = None
+    ):
+        """
+        Create a new columnar table.
+
+        :param name: Name of the table.
+        :type name: str
+        :param row_count: Number of records in the table.
+        :type row_count: int
+        :param columns: Values of the members of all records.
+        :type columns: dict
+        :param masks: Marks the records which have a member.
+        :type masks: dict
+        :param id_member_name: Member that stores the ID of a record. If this
+                               is None, the row index is used as the ID.
+        :type id_member_name: str
+        """
+        self.name = name
+        self.id_member_name = id_member_name
+
+        self._row_count = row_count
+        self._columns = columns
+        self._masks = masks
+
+        # record ID -> row index
+        self._index: dict[int, int] = None
+
+    def column(self, member_name: str) -> numpy.ndarray:
+        """
+        Returns the values of a member for all records.
+
+        :param member_name: Name of the member.
+        :type member_name: str
+        """
+        try:
+            return self._columns[member_name]
+
+        except KeyError:
+            raise KeyError(f"{self} has no column {member_name}") from None
+
+    def mask(self, member_name: str) -> numpy.ndarray:
+        """
+        Returns a boolean array that marks the records which have the member.
+
+        :param member_name: Name of the member.
+        :type member_name: str
+        """
+        try:
+            return self._masks[member_name]
+
+        except KeyError:
+            raise KeyError(f"{self} has no column {member_name}") from None
+
+    def has_column(self, member_name: str) -> bool:
+        """
+        Returns True if at least one record has the member.
+        """
+        return member_name in self._columns
+
+    def get_column_names(self) -> list[str]:
+        """
+        Returns the names of all columns.
+        """
+        return list(self._columns.keys())
+
+    def get_ids(self) -> numpy.ndarray:
+        """
+        Returns the IDs of all records in row order.
+        """
+        if self.id_member_name is None:
+            return numpy.arange(self._row_count, dtype=numpy.int64)
+
+        return self.column(self.id_member_name)
+
+    def get_index(self) -> dict[int, int]:
+        """
+        Returns the mapping of record IDs to row indices.
+        """
+        if self._index is None:
+            self._create_index()
+
+        return self._index
+
+    def get_row_index(self, record_id: int) -> int:
+        """
+        Returns the row index of the record with the given ID.
+        """
+        return self.get_index()[record_id]
+
+    def select(self, member_name: str, value: typing.Any) -> numpy.ndarray:
+        """
+        Returns the row indices of all records where the member
+        has the given value.
+        """
+        return numpy.flatnonzero((self.column(member_name) == value) & self.mask(member_name))
+
+    def _create_index(self) -> None:
+        """
+        Create the mapping of record IDs to row indices.
+        """
+        if self.id_member_name is None:
+            self._index = {row_index: row_index for row_index in range(self._row_count)}
+            return
+
+        index = {}
+        ids = self.column(self.id_member_name).tolist()
+        for row_index, present in enumerate(self.mask(self.id_member_name).tolist()):
+            if not present:
+                continue
+
+            record_id = ids[row_index]
+            if record_id in index:
+                raise Exception(f"{self}: Duplicate ID {record_id} in "
+                                f"member {self.id_member_name}")
+
+            index[record_id] = row_index
+
+        self._index = index
+
+    def __len__(self):
+        return self._row_count
+
+    def __repr__(self):
+        return f"ColumnarTable<{self.name}>"
+
+
+class ColumnarTableBuilder:
+    """
+    Collects the values of the records of a section while it is read
+    and creates a ColumnarTable from them.
+    """
+
+    __slots__ = ('name', 'game_version', 'id_member_name', '_row_count', '_groups')
+
+    def __init__(
+        self,
+        name: str,
+        game_version: GameVersion,
+        id_member_name: str = None
+    ):
+        """
+        :param name: Name of the table.
+        :type name: str
+        :param game_version: Game version the records are read for.
+        :type game_version: GameVersion
+        :param id_member_name: Member that stores the ID of a record.
+        :type id_member_name: str
+        """
+        self.name = name
+        self.game_version = game_version
+        self.id_member_name = id_member_name
+
+        self._row_count = 0
+
+        # rows of the records with the same struct class and subtype members
+        # key: (struct class, subtype member names)
+        # value: (column format, attribute names, attribute getter, row indices, values)
+        self._groups: dict[tuple[type, tuple[str, ...]], tuple] = {}
+
+    def add_row(
+        self,
+        entry: GenieStructure,
+        sub_members: list[ValueMember] = None
+    ) -> None:
+        """
+        Add the values of a record that was read into entry.
+
+        :param entry: Struct that the record was read into.
+        :type entry: GenieStructure
+        :param sub_members: Members read for the subtype definition of the record.
+        :type sub_members: list
+        """
+        sub_members = sub_members or ()
+        key = (type(entry), tuple(member.name for member in sub_members))
+
+        group = self._groups.get(key)
+        if group is None:
+            column_format = get_column_format(type(entry), self.game_version)
+            names = tuple(name for name, _ in column_format)
+
+            getter = None
+            if names:
+                # fetches all struct attributes at once
+                getter = attrgetter(*names)
+
+            # subtype members have no fixed type
+            column_format += tuple((member.name, None) for member in sub_members)
+
+            group = (column_format, names, getter, [], [])
+            self._groups[key] = group
+
+        _, names, getter, row_indices, rows = group
+
+        values = ()
+        if getter is not None:
+            try:
+                values = getter(entry)
+
+            except AttributeError:
+                # reading stopped before the last members of the record
+                values = tuple(getattr(entry, name, None) for name in names)
+
+            if len(names) == 1:
+                values = (values,)
+
+        row_indices.append(self._row_count)
+        rows.append(values + tuple(member.value for member in sub_members))
+
+        self._row_count += 1
+
+    def finish(self) -> ColumnarTable:
+        """
+        Create the table from the collected records.
+        """
+        row_count = self._row_count
+
+        # columns can appear in records of several struct classes
+        dtypes = {}
+        for column_format, _, _, _, rows in self._groups.values():
+            for column_index, (name, dtype) in enumerate(column_format):
+                if dtype is None:
+                    # subtype members have no fixed type
+                    dtype = numpy.asarray([row[column_index] for row in rows]).dtype
+
+                if name in dtypes:
+                    dtype = numpy.promote_types(dtypes[name], dtype)
+
+                dtypes[name] = dtype
+
+        columns = {}
+        masks = {}
+        for name, dtype in dtypes.items():
+            if dtype == STRING_COLUMN_TYPE:
+                columns[name] = numpy.full(row_count, "", dtype=STRING_COLUMN_TYPE)
+
+            else:
+                columns[name] = numpy.zeros(row_count, dtype=dtype)
+
+            masks[name] = numpy.zeros(row_count, dtype=numpy.bool_)
+
+        for column_format, _, _, row_indices, rows in self._groups.values():
+            if not rows:
+                continue
+
+            row_indices = numpy.array(row_indices, dtype=numpy.intp)
+            for (name, _), values in zip(column_format, zip(*rows)):
+                if None in values:
+                    present = numpy.array([value is not None for value in values],
+                                          dtype=numpy.bool_)
+                    indices = row_indices[present]
+                    values = [value for value in values if value is not None]
+
+                else:
+                    indices = row_indices
+
+                column = columns[name]
+                column[indices] = numpy.array(values, dtype=column.dtype)
+                masks[name][indices] = True
+
+        self._groups.clear()
+
+        return ColumnarTable(self.name, row_count, columns, masks, self.id_member_name)
+
+    def __repr__(self):
+        return f"ColumnarTableBuilder<{self.name}>"
+
+
+class ColumnarArrayMember(ArrayMember):
+    """
+    Stores an ordered list of container members and a columnar
+    table with the scalar members of the containers.
+    """
+
+    __slots__ = ('_table',)
+
+    def __init__(
+        self,
+        name: str,
+        allowed_member_type: StorageType,
+        members: list[ContainerMember],
+        table: ColumnarTable
+    ):
+        super().__init__(name, allowed_member_type, members)
+
+        if len(table) != len(members):
+            raise Exception(f"{self}: table {table} has {len(table)} rows "
+                            f"for {len(members)} members")
+
+        self._table = table
+
+    @property
+    def table(self) -> ColumnarTable:
+        """
+        Returns the columnar table of the records.
+        """
+        return self._table
+
+
+def _read_test_section() -> ColumnarArrayMember:
+    """
+    Read a section with three records for test().
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    import struct
+
+    from .genie_structure import GenieStructure
+    from .member_access import READ, READ_GEN
+    from .read_members import SubdataMember
+    from .value_members import StorageType as _StorageType
+
+    class Entry(GenieStructure):
+        """ Record with a fixed-size and a dynamic-size member. """
+        @classmethod
+        def get_data_format_members(cls, game_version):
+            return [
+                (READ_GEN, "entry_id", _StorageType.ID_MEMBER, "int16_t"),
+                (READ, "name_len", _StorageType.INT_MEMBER, "uint16_t"),
+                (READ_GEN, "name", _StorageType.STRING_MEMBER, "char[name_len]"),
+                (READ_GEN, "speed", _StorageType.FLOAT_MEMBER, "float"),
+            ]
+
+    class Section(GenieStructure):
+        """ Section with a table of its records. """
+        columnar_members = {"entries": "entry_id"}
+
+        @classmethod
+        def get_data_format_members(cls, game_version):
+            return [
+                (READ, "entry_count", _StorageType.INT_MEMBER, "uint16_t"),
+                (READ_GEN, "entries", _StorageType.ARRAY_CONTAINER,
+                 SubdataMember(ref_type=Entry, length="entry_count")),
+            ]
+
+    raw = struct.pack("<H", 3)
+    for entry_id, name in ((7, b"a"), (3, b""), (5, b"bc")):
+        raw += struct.pack("<hH", entry_id, len(name)) + name + struct.pack("<f", entry_id / 2)
+
+    _, members = Section().read(raw, 0, "test")
+
+    return members[0]
+
+
+def test() -> None:
+    """
+    The table of a section must match the members read for its records.
+    """
+    entries = _read_test_section()
+    table = entries.table
+
+    assert_value(isinstance(entries, ColumnarArrayMember), True)
+    assert_value(len(table), 3)
+    assert_value(table.get_ids().tolist(), [7, 3, 5])
+    assert_value(table.column("name").tolist(), ["a", "", "bc"])
+    assert_value(table.get_row_index(5), 2)
+    assert_value(table.select("speed", 1.5).tolist(), [1])
+
+    for row, entry in enumerate(entries.value):
+        for name in ("entry_id", "name", "speed"):
+            assert_value(table.column(name)[row], entry[name].value)
@@ -4,17 +4,125 @@
 
 """
 Dynamically load and unload data from a file at runtime.
+
+Records that are accessed without being loaded explicitly are parsed
+into a process-wide LRU cache, so that reading several members of the
+same record in a row only parses it once.
 """
 
 from __future__ import annotations
 import typing
 
+from collections import OrderedDict
+
 if typing.TYPE_CHECKING:
     from openage.convert.value_object.read.genie_structure import GenieStructure
     from openage.convert.value_object.init.game_version import GameVersion
     from openage.convert.value_object.read.value_members import ValueMember
 
 
+# Default memory budget of the record cache in bytes
+DEFAULT_CACHE_BUDGET = 64 * 1024 * 1024
+
+# Estimated memory used by the parsed members per byte of source data
+MEMBER_BYTES_PER_SOURCE_BYTE = 40
+
+
+class RecordCache:
+    """
+    LRU cache for the members of dynamically loaded records.
+
+    The memory used by a record is estimated from the size of its
+    source data, since measuring the member objects is expensive.
+    """
+
+    def __init__(self, budget: int = DEFAULT_CACHE_BUDGET):
+        """
+        :param budget: Maximum estimated memory of all cached records in bytes.
+        :type budget: int
+        """
+        self.budget = budget
+        self.size = 0
+
+        # (source data ID, offset, class) -> (source data, members, size)
+        self.entries: OrderedDict[tuple, tuple] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, loader: DynamicLoader) -> dict[str, ValueMember]:
+        """
+        Returns the members of the record of a loader, parsing
+        the record if it is not cached.
+        """
+        key = (id(loader.srcdata), loader.offset, loader.datacls)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        end_offset, members = loader.read_members()
+        size = (end_offset - loader.offset) * MEMBER_BYTES_PER_SOURCE_BYTE
+
+        if size <= self.budget:
+            # the source data is stored too, so that its ID
+            # is not reused while the entry exists
+            self.entries[key] = (loader.srcdata, members, size)
+            self.size += size
+            self.evict()
+
+        return members
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used records until the cache
+        is within its memory budget.
+        """
+        while self.size > self.budget and self.entries:
+            _, (_, _, size) = self.entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+    def set_budget(self, budget: int) -> None:
+        """
+        Change the memory budget and evict records if necessary.
+        """
+        self.budget = budget
+        self.evict()
+
+    def clear(self) -> None:
+        """
+        Remove all cached records.
+        """
+        self.entries.clear()
+        self.size = 0
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Returns the cache counters.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "records": len(self.entries),
+            "size": self.size,
+            "budget": self.budget,
+        }
+
+    def __repr__(self) -> str:
+        return (f"RecordCache<{len(self.entries)} records, "
+                f"{self.hits} hits, {self.misses} misses>")
+
+
+# Cache shared by all dynamic loaders of the process
+RECORD_CACHE = RecordCache()
+
+
 class DynamicLoader:
     """
     Member that can be loaded and unloaded at runtime, saving
@@ -41,17 +149,24 @@ class DynamicLoader:
         self.name = name
         self.members = None
 
-    def load(self) -> dict[str, ValueMember]:
+    def read_members(self) -> tuple[int, dict[str, ValueMember]]:
         """
-        Read the members from the provided source data.
+        Parse the members from the provided source data.
+
+        Returns the end offset of the record and the members.
         """
         datacls = self.datacls()
-        _, members = datacls.read(self.srcdata, self.offset, self.game_version, dynamic_load=False)
+        end_offset, members = datacls.read(self.srcdata, self.offset, self.game_version,
+                                           dynamic_load=False)
 
-        self.members = {}
-        for member in members:
-            self.members[member.name] = member
+        return end_offset, {member.name: member for member in members}
 
+    def load(self) -> dict[str, ValueMember]:
+        """
+        Read the members from the provided source data and keep
+        them until unload() is called.
+        """
+        _, self.members = self.read_members()
         self._loaded = True
 
         return self.members
@@ -60,22 +175,48 @@ class DynamicLoader:
         """
         Delete the loaded members.
         """
-        del self.members
+        self.members = None
         self._loaded = False
 
-    def __getitem__(self, key) -> ValueMember:
+    def get_members(self) -> dict[str, ValueMember]:
         """
-        Retrieve submembers from the loaded members or load them temporarily
+        Returns the loaded members or the members from the record cache
         if they have not been loaded previously.
         """
         if self._loaded:
-            return self.members[key]
+            return self.members
+
+        return RECORD_CACHE.get(self)
+
+    def __getitem__(self, key) -> ValueMember:
+        """
+        Retrieve submembers from the loaded members or the record cache.
+        """
+        return self.get_members()[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.get_members()
+
+    def __iter__(self):
+        return iter(self.get_members())
+
+    def __len__(self) -> int:
+        return len(self.get_members())
+
+    def get(self, key, default=None) -> ValueMember:
+        """
+        Retrieve a submember or default if it does not exist.
+        """
+        return self.get_members().get(key, default)
+
+    def keys(self):
+        return self.get_members().keys()
+
+    def values(self):
+        return self.get_members().values()
 
-        # else (expensive)
-        self.load()
-        item = self.members[key]
-        self.unload()
-        return item
+    def items(self):
+        return self.get_members().items()
 
     def __repr__(self) -> str:
         return f"DynamicLoader<{'loaded' if self._loaded else 'unloaded'}>"
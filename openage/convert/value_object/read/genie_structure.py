@@ -6,57 +6,60 @@ from __future__ import annotations
 import typing
 
 import math
-import re
-import struct
+
+import numpy
 
 from openage.convert.value_object.read.dynamic_loader import DynamicLoader
 
 from ....util.strings import decode_until_null
 from .member_access import READ, READ_GEN, READ_UNKNOWN, SKIP, MemberAccess
 from .read_members import (IncludeMembers, ContinueReadMember,
-                           MultisubtypeMember, GroupMember, SubdataMember,
+                           GroupMember, SubdataMember,
                            ReadMember,
                            EnumLookupMember)
 from .value_members import ContainerMember, ArrayMember, IntMember, FloatMember,\
-    StringMember, BooleanMember, IDMember, BitfieldMember, ValueMember
+    StringMember, BooleanMember, IDMember, BitfieldMember, ValueMember,\
+    PrimitiveArrayMember
 from .value_members import StorageType
+from .read_plan import ReadPlanStep, ReadStepKind, NUMPY_TYPE_LOOKUP, compile_read_plan,\
+    get_struct
+from .columnar_table import ColumnarArrayMember, ColumnarTableBuilder
 
 if typing.TYPE_CHECKING:
     from openage.convert.value_object.init.game_version import GameVersion
+    from openage.convert.value_object.read.offset_index import OffsetIndexCursor
+    from openage.convert.service.read.parallel_read import ParallelReader
+
 
+# ValueMember types for primitive members with data_count == 1
+SCALAR_MEMBER_TYPES = {
+    StorageType.INT_MEMBER:     IntMember,
+    StorageType.FLOAT_MEMBER:   FloatMember,
+    StorageType.BOOLEAN_MEMBER: BooleanMember,
+    StorageType.ID_MEMBER:      IDMember,
+}
 
-# regex for matching type array definitions like int[1337]
-# group 1: type name, group 2: length
-VARARRAY_MATCH = re.compile("([{0}]+) *\\[([{0}]+)\\] *;?".format("a-zA-Z0-9_"))
-
-# match a simple number
-INTEGER_MATCH = re.compile("\\d+")
-
-# type lookup for C -> python struct
-STRUCT_TYPE_LOOKUP = {
-    "char":               "b",
-    "unsigned char":      "B",
-    "int8_t":             "b",
-    "uint8_t":            "B",
-    "short":              "h",
-    "unsigned short":     "H",
-    "int16_t":            "h",
-    "uint16_t":           "H",
-    "int":                "i",
-    "unsigned int":       "I",
-    "int32_t":            "i",
-    "uint32_t":           "I",
-    "long":               "l",
-    "unsigned long":      "L",
-    "long long":          "q",
-    "unsigned long long": "Q",
-    "int64_t":            "q",
-    "uint64_t":           "Q",
-    "float":              "f",
-    "double":             "d",
-    "char[]":             "s",
+# ValueMember types (and the resulting allowed member type) for the
+# elements of primitive arrays
+ARRAY_MEMBER_TYPES = {
+    StorageType.ARRAY_INT:    (IntMember, StorageType.INT_MEMBER),
+    StorageType.ARRAY_FLOAT:  (FloatMember, StorageType.FLOAT_MEMBER),
+    StorageType.ARRAY_BOOL:   (BooleanMember, StorageType.BOOLEAN_MEMBER),
+    StorageType.ARRAY_ID:     (IDMember, StorageType.ID_MEMBER),
+    StorageType.ARRAY_STRING: (StringMember, StorageType.STRING_MEMBER),
 }
 
+# storage types of arrays that are read into a PrimitiveArrayMember
+PRIMITIVE_ARRAY_TYPES = {
+    StorageType.ARRAY_INT:   StorageType.INT_MEMBER,
+    StorageType.ARRAY_FLOAT: StorageType.FLOAT_MEMBER,
+    StorageType.ARRAY_BOOL:  StorageType.BOOLEAN_MEMBER,
+    StorageType.ARRAY_ID:    StorageType.ID_MEMBER,
+}
+
+# compiled read plans, keyed by (structure class, game version, projection)
+_READ_PLAN_CACHE: dict[tuple[type, GameVersion, frozenset], tuple[ReadPlanStep, ...]] = {}
+
 
 class GenieStructure:
     """
@@ -65,6 +68,13 @@ class GenieStructure:
 
     dynamic_load = False
 
+    # entries of this struct can be generated by a ParallelReader
+    parallel_read = False
+
+    # subdata members whose records are also stored in a ColumnarTable,
+    # mapped to the member that stores the record ID (None: entry index)
+    columnar_members: dict[str, str] = {}
+
     def __init__(self, **args):
         # store passed arguments as members
         self.__dict__.update(args)
@@ -76,78 +86,141 @@ class GenieStructure:
         game_version: GameVersion,
         cls: GenieStructure = None,
         members: tuple = None,
-        dynamic_load = False
+        dynamic_load = False,
+        offset_index: OffsetIndexCursor = None,
+        skip_generation: bool = False,
+        parallel_reader: ParallelReader = None,
+        projection: dict[type, frozenset[str]] = None
     ) -> tuple[int, list[ValueMember]]:
         """
         recursively read defined binary data from raw at given offset.
 
         this is used to fill the python classes with data from the binary input.
+
+        If an offset index cursor is passed, the offsets of subdata
+        entries are recorded in the index while reading.
+
+        If skip_generation is True, the data is only read to set the
+        attributes of the structs and no ValueMembers are created.
+
+        If a parallel reader is passed, the members of subdata entries
+        whose class has parallel_read set are generated by the parallel
+        reader instead.
+
+        If a projection is passed, only the members listed for a struct
+        class are generated for that struct. Structs without an entry
+        in the projection generate all members.
         """
         if cls:
             target_class = cls
         else:
             target_class = self
 
-        # Members are returned at the end
-        generated_value_members = []
+        member_projection = None
+        if projection:
+            member_projection = projection.get(cls or type(self))
 
-        # break out of the current reading loop when members don't exist in
-        # source data file
-        stop_reading_members = False
+        if members:
+            plan = compile_read_plan(members, member_projection)
 
-        if not members:
-            members = target_class.get_data_format(game_version,
-                                                   allowed_modes=(True,
-                                                                  READ,
-                                                                  READ_GEN,
-                                                                  READ_UNKNOWN,
-                                                                  SKIP),
-                                                   flatten_includes=False)
+        else:
+            plan = target_class.get_read_plan(game_version, member_projection)
 
         # Save the start offset in case dynamic loading is active
         # we still need to read over the whole structure to know
         # where it stops
         start_offset = offset
-        for _, export, var_name, storage_type, var_type in members:
-            if export == READ_GEN and dynamic_load and self.dynamic_load:
-                # Do not create members if dynamic loading is active
-                export = READ
+        offset, generated_value_members = self._read_plan(
+            raw, offset, game_version, plan, target_class,
+            skip_generation or (dynamic_load and self.dynamic_load),
+            offset_index, parallel_reader, dynamic_load, projection
+        )
+
+        if dynamic_load and self.dynamic_load:
+            return offset, DynamicLoader("", self.__class__, game_version, raw, start_offset)
+
+        return offset, generated_value_members
+
+    def _read_plan(
+        self,
+        raw: bytes,
+        offset: int,
+        game_version: GameVersion,
+        plan: tuple[ReadPlanStep, ...],
+        target_class: type,
+        skip_generation: bool = False,
+        offset_index: OffsetIndexCursor = None,
+        parallel_reader: ParallelReader = None,
+        dynamic_load: bool = False,
+        projection: dict[type, frozenset[str]] = None
+    ) -> tuple[int, list[ValueMember]]:
+        """
+        Execute a compiled read plan on raw at the given offset.
+        """
+        # Members are returned at the end
+        generated_value_members = []
+
+        # break out of the current reading loop when members don't exist in
+        # source data file
+        stop_reading_members = False
+
+        for step in plan:
+            kind = step.kind
 
             if stop_reading_members:
-                if isinstance(var_type, ReadMember):
-                    replacement_value = var_type.get_empty_value()
-                else:
-                    replacement_value = 0
+                self._set_empty_values(step)
+                continue
 
-                setattr(self, var_name, replacement_value)
+            if kind is ReadStepKind.STRUCT_RUN:
+                offset = self._read_struct_run(
+                    raw, offset, step, generated_value_members, skip_generation
+                )
                 continue
 
-            if isinstance(var_type, GroupMember):
+            export = step.export
+            if export == READ_GEN and skip_generation:
+                # Do not create members if dynamic loading is active
+                export = READ
+
+            if kind is ReadStepKind.GROUP:
                 offset, gen_members = self._read_group(
                     raw, offset, game_version, export,
-                    var_name, storage_type, var_type
+                    step.var_name, step.storage_type, step.var_type,
+                    offset_index, parallel_reader, projection
                 )
-                generated_value_members.extend(gen_members)
 
-            elif isinstance(var_type, MultisubtypeMember):
+            elif kind is ReadStepKind.MULTISUBTYPE:
                 offset, gen_members = self._read_multisubtye(
-                    raw, offset, game_version, export, var_name,
-                    storage_type, var_type, target_class
+                    raw, offset, game_version, export, step.var_name,
+                    step.storage_type, step.var_type, target_class,
+                    step.subtype_plan, offset_index, parallel_reader,
+                    dynamic_load, projection
                 )
-                generated_value_members.extend(gen_members)
 
             else:
                 offset, gen_members, stop_reading_members = self._read_primitive(
-                    raw, offset, export, var_name,
-                    storage_type, var_type
+                    raw, offset, export, step
                 )
-                generated_value_members.extend(gen_members)
 
-        if dynamic_load and self.dynamic_load:
-            return offset, DynamicLoader("", self.__class__, game_version, raw, start_offset)
+            generated_value_members.extend(gen_members)
 
         return offset, generated_value_members
 
+    def _set_empty_values(self, step: ReadPlanStep) -> None:
+        """
+        Assign replacement values for members that are absent
+        in the source data.
+        """
+        if step.kind is ReadStepKind.STRUCT_RUN:
+            for item in step.items:
+                setattr(self, item[1], 0)
+
+        elif isinstance(step.var_type, ReadMember):
+            setattr(self, step.var_name, step.var_type.get_empty_value())
+
+        else:
+            setattr(self, step.var_name, 0)
+
     def _read_group(
         self,
         raw: bytes,
@@ -156,10 +229,16 @@ class GenieStructure:
         export: MemberAccess,
         var_name: str,
         storage_type: StorageType,
-        var_type: GroupMember
+        var_type: GroupMember,
+        offset_index: OffsetIndexCursor = None,
+        parallel_reader: ParallelReader = None,
+        projection: dict[type, frozenset[str]] = None
     ) -> tuple[int, list[ValueMember]]:
         generated_value_members = []
 
+        # members of nested structs are only created if they are used
+        skip_generation = export != READ_GEN
+
         if not issubclass(var_type.cls, GenieStructure):
             raise Exception("class where members should be "
                             "included is not exportable: %s" % (
@@ -170,7 +249,11 @@ class GenieStructure:
             # but store the data to the current object (self).
             offset, gen_members = var_type.cls.read(self, raw, offset,
                                                     game_version,
-                                                    cls=var_type.cls)
+                                                    cls=var_type.cls,
+                                                    offset_index=offset_index,
+                                                    skip_generation=skip_generation,
+                                                    parallel_reader=parallel_reader,
+                                                    projection=projection)
 
             if export == READ_GEN:
                 # Push the passed members directly into the list of generated members
@@ -181,7 +264,9 @@ class GenieStructure:
             # depending on the storage type.
             # then save the result as a reference named `var_name`
             grouped_data = var_type.cls()
-            offset, gen_members = grouped_data.read(raw, offset, game_version)
+            offset, gen_members = grouped_data.read(raw, offset, game_version,
+                                                    skip_generation=skip_generation,
+                                                    projection=projection)
 
             setattr(self, var_name, grouped_data)
 
@@ -221,10 +306,18 @@ class GenieStructure:
         var_name: str,
         storage_type: StorageType,
         var_type: GroupMember,
-        target_class: type
+        target_class: type,
+        subtype_plan: tuple[ReadPlanStep, ...] = None,
+        offset_index: OffsetIndexCursor = None,
+        parallel_reader: ParallelReader = None,
+        dynamic_load: bool = False,
+        projection: dict[type, frozenset[str]] = None
     ) -> tuple[int, list[ValueMember]]:
         generated_value_members = []
 
+        # members of nested structs are only created if they are used
+        skip_generation = export != READ_GEN
+
         # subdata reference implies recursive call for reading the
         # binary data
 
@@ -254,6 +347,11 @@ class GenieStructure:
                                      for key in var_type.class_lookup})
             single_type_subdata = False
 
+            if subtype_plan is None:
+                subtype_plan = compile_read_plan(
+                    ((False,) + var_type.subtype_definition,)
+                )
+
         # List for storing the ValueMember instance of each subdata structure
         subdata_value_members = []
         allowed_member_type = StorageType.CONTAINER_MEMBER
@@ -264,10 +362,13 @@ class GenieStructure:
         else:
             offset_lookup = None
 
-        for i in range(list_len):
+        # collect the scalar members of the entries in a columnar table
+        table_builder = None
+        if export == READ_GEN and var_name in target_class.columnar_members:
+            table_builder = ColumnarTableBuilder(var_name, game_version,
+                                                 target_class.columnar_members[var_name])
 
-            # List of subtype members filled if there's a subtype to be read
-            sub_members = []
+        for i in range(list_len):
 
             # if datfile offset == 0, entry has to be skipped.
             if offset_lookup:
@@ -276,37 +377,55 @@ class GenieStructure:
                 # TODO: don't read sequentially, use the lookup as
                 #       new offset?
 
-            if single_type_subdata:
-                # append single data entry to the subdata object list
-                new_data_class = var_type.class_lookup[None]
-            else:
-                # to determine the subtype class, read the binary
-                # definition. this utilizes an on-the-fly definition
-                # of the data to be read.
-                offset, sub_members = self.read(
-                    raw, offset, game_version, cls=target_class,
-                    members=(((False,) + var_type.subtype_definition),)
-                )
+            if offset_index:
+                # entry index is the record ID, skipped entries keep their ID
+                offset_index.add(var_name, i, offset, varargs)
+                entry_index = offset_index.enter(var_name, i)
 
-                # read the variable set by the above read call to
-                # use the read data to determine the denominaton of
-                # the member type
-                subtype_name = getattr(
-                    self, var_type.subtype_definition[1])
-
-                # look up the subtype class
-                new_data_class = var_type.class_lookup[subtype_name]
+            else:
+                entry_index = None
 
-            if not issubclass(new_data_class, GenieStructure):
-                raise Exception("dumped data "
-                                "is not exportable: %s" % (
-                                    new_data_class.__name__))
+            offset, new_data_class, subtype_name, sub_members = self._read_entry_class(
+                raw, offset, game_version, var_type, target_class, subtype_plan
+            )
 
             # create instance of submember class
             new_data = new_data_class(**varargs)
 
-            # recursive call, read the subdata.
-            offset, gen_members = new_data.read(raw, offset, game_version, new_data_class)
+            generate_later = single_type_subdata and not skip_generation
+            if generate_later and parallel_reader and new_data_class.parallel_read:
+                # the members are generated by the parallel reader and
+                # filled in later. Here, we only need to know where the
+                # entry ends, which a stored offset index may already know.
+                start_offset = offset
+                end_offset = None
+                if not offset_index and table_builder is None:
+                    end_offset = parallel_reader.get_entry_end(var_name, i, offset)
+
+                if end_offset is None:
+                    # read over the entry
+                    offset, _ = new_data.read(raw, offset, game_version, new_data_class,
+                                              offset_index=entry_index,
+                                              skip_generation=True)
+
+                else:
+                    offset = end_offset
+
+                gen_members = parallel_reader.submit(new_data_class, start_offset, varargs)
+
+            else:
+                # recursive call, read the subdata.
+                # entries with a subtype are never loaded dynamically because
+                # the loader cannot store the subtype members.
+                offset, gen_members = new_data.read(raw, offset, game_version, new_data_class,
+                                                    dynamic_load=dynamic_load and single_type_subdata,
+                                                    offset_index=entry_index,
+                                                    skip_generation=skip_generation,
+                                                    parallel_reader=parallel_reader,
+                                                    projection=projection)
+
+            if table_builder is not None:
+                table_builder.add_row(new_data, sub_members)
 
             # append the new data to the appropriate list
             if single_type_subdata:
@@ -317,11 +436,17 @@ class GenieStructure:
             if export == READ_GEN:
                 # Append the data to the ValueMember list
                 if storage_type is StorageType.ARRAY_CONTAINER:
-                    # Put the subtype members in front
-                    sub_members.extend(gen_members)
-                    gen_members = sub_members
-                    # create a container for the retrieved members
-                    container = ContainerMember("", gen_members)
+                    if isinstance(gen_members, (dict, DynamicLoader)):
+                        # members are filled in by the parallel reader
+                        # or loaded on access
+                        container = ContainerMember("", gen_members)
+
+                    else:
+                        # Put the subtype members in front
+                        sub_members.extend(gen_members)
+                        gen_members = sub_members
+                        # create a container for the retrieved members
+                        container = ContainerMember("", gen_members)
 
                     # Save the container to a list
                     # The array is created after the for-loop
@@ -334,97 +459,288 @@ class GenieStructure:
                                     % (var_name, offset, var_type, storage_type,
                                         StorageType.ARRAY_CONTAINER))
 
+        if offset_index:
+            offset_index.end(var_name, offset)
+
         if export == READ_GEN:
             # Create an array from the subdata structures
             # and append it to the other generated members
-            array = ArrayMember(var_name, allowed_member_type, subdata_value_members)
+            if table_builder is not None:
+                array = ColumnarArrayMember(var_name, allowed_member_type,
+                                            subdata_value_members, table_builder.finish())
+
+            else:
+                array = ArrayMember(var_name, allowed_member_type, subdata_value_members)
+
             generated_value_members.append(array)
 
         return offset, generated_value_members
 
-    def _read_primitive(
+    def _read_entry_class(
         self,
         raw: bytes,
         offset: int,
-        export: MemberAccess,
+        game_version: GameVersion,
+        var_type: GroupMember,
+        target_class: type,
+        subtype_plan: tuple[ReadPlanStep, ...] = None
+    ) -> tuple[int, type, typing.Any, list[ValueMember]]:
+        """
+        Determine the class of a subdata entry starting at offset.
+
+        For multisubtype members, the subtype definition of the entry
+        is read first. Returns the offset of the entry data, the class,
+        the subtype name and the members generated for the subtype.
+        """
+        if isinstance(var_type, SubdataMember):
+            # single-subtype child data
+            subtype_name = None
+            sub_members = []
+
+        else:
+            # to determine the subtype class, read the binary
+            # definition. this utilizes an on-the-fly definition
+            # of the data to be read.
+            if subtype_plan is None:
+                subtype_plan = compile_read_plan(
+                    ((False,) + var_type.subtype_definition,)
+                )
+
+            offset, sub_members = self._read_plan(
+                raw, offset, game_version, subtype_plan, target_class
+            )
+
+            # read the variable set by the above read call to
+            # use the read data to determine the denominaton of
+            # the member type
+            subtype_name = getattr(
+                self, var_type.subtype_definition[1])
+
+        # look up the subtype class
+        new_data_class = var_type.class_lookup[subtype_name]
+
+        if not issubclass(new_data_class, GenieStructure):
+            raise Exception("dumped data "
+                            "is not exportable: %s" % (
+                                new_data_class.__name__))
+
+        return offset, new_data_class, subtype_name, sub_members
+
+    def _get_subdata_step(self, game_version: GameVersion, var_name: str) -> ReadPlanStep:
+        """
+        Returns the read plan step of the subdata member var_name.
+        """
+        for step in type(self).get_read_plan(game_version):
+            if step.kind is ReadStepKind.MULTISUBTYPE and step.var_name == var_name:
+                return step
+
+        raise Exception("%s has no subdata member %s in %s"
+                        % (type(self).__name__, var_name, game_version))
+
+    def resolve_entry(
+        self,
+        raw: bytes,
+        offset: int,
+        game_version: GameVersion,
+        var_name: str
+    ) -> tuple[type, int, list[ValueMember]]:
+        """
+        Determine the class of a single entry of the subdata member var_name
+        that starts at offset, e.g. an offset stored in an OffsetIndex.
+
+        Returns the class, the offset of the entry data and the members
+        generated for the subtype definition.
+        """
+        step = self._get_subdata_step(game_version, var_name)
+        offset, new_data_class, _, sub_members = self._read_entry_class(
+            raw, offset, game_version, step.var_type, type(self), step.subtype_plan
+        )
+
+        return new_data_class, offset, sub_members
+
+    def read_entry(
+        self,
+        raw: bytes,
+        offset: int,
+        game_version: GameVersion,
         var_name: str,
-        storage_type: StorageType,
-        var_type: GroupMember
-    ) -> tuple[int, list[ValueMember], bool]:
-        generated_value_members = []
-        # reading binary data, as this member is no reference but
-        # actual content.
+        varargs: dict[str, typing.Any] = None
+    ) -> ContainerMember:
+        """
+        Read a single entry of the subdata member var_name that starts at
+        offset without reading the rest of this structure.
+        """
+        new_data_class, offset, sub_members = self.resolve_entry(
+            raw, offset, game_version, var_name
+        )
 
-        stop_reading_members = False
+        new_data = new_data_class(**(varargs or {}))
+        _, gen_members = new_data.read(raw, offset, game_version, new_data_class)
 
-        data_count = 1
-        is_array = False
-        is_custom_member = False
+        sub_members.extend(gen_members)
+        return ContainerMember("", sub_members)
 
-        if isinstance(var_type, str):
-            is_array = VARARRAY_MATCH.match(var_type)
+    def _read_struct_run(
+        self,
+        raw: bytes,
+        offset: int,
+        step: ReadPlanStep,
+        generated_value_members: list[ValueMember],
+        skip_generation: bool = False
+    ) -> int:
+        """
+        Read a run of fixed-size primitive members with a single
+        precompiled struct and store the results.
+        """
+        fmt = step.fmt
+        result = fmt.unpack_from(raw, offset)
 
-            if is_array:
-                struct_type = is_array.group(1)
-                data_count = is_array.group(2)
-                if struct_type == "char":
-                    struct_type = "char[]"
+        for export, var_name, storage_type, symbol, index, rel_offset, \
+                data_count, is_array in step.items:
+            if export == READ_GEN and skip_generation:
+                export = READ
 
-                if INTEGER_MATCH.match(data_count):
-                    # integer length
-                    data_count = int(data_count)
-                else:
-                    # dynamic length specified by member name
-                    data_count = getattr(self, data_count)
-
-                if storage_type not in (StorageType.STRING_MEMBER,
-                                        StorageType.ARRAY_INT,
-                                        StorageType.ARRAY_FLOAT,
-                                        StorageType.ARRAY_BOOL,
-                                        StorageType.ARRAY_ID,
-                                        StorageType.ARRAY_STRING):
-                    raise Exception("%s at offset %# 08x: Data read via %s "
-                                    "cannot be stored as %s;"
-                                    " expected ArrayMember format"
-                                    % (var_name, offset, var_type, storage_type))
+            if symbol == "s":
+                # stringify char array
+                value = decode_until_null(result[index])
+
+                if export == READ_GEN:
+                    if storage_type is not StorageType.STRING_MEMBER:
+                        raise Exception("%s at offset %# 08x: Data read via %s "
+                                        "cannot be stored as %s;"
+                                        " expected %s"
+                                        % (var_name, offset + rel_offset,
+                                           "%d%s" % (data_count, symbol), storage_type,
+                                           StorageType.STRING_MEMBER))
+
+                    generated_value_members.append(StringMember(var_name, value))
+
+            elif is_array:
+                value = result[index:index + data_count]
+
+                if export == READ_GEN:
+                    generated_value_members.append(
+                        self._create_array_member(var_name, storage_type, symbol, value,
+                                                  raw, offset + rel_offset)
+                    )
 
             else:
-                struct_type = var_type
-                data_count = 1
+                value = result[index]
+
+                if symbol == "f":
+                    if not math.isfinite(value):
+                        raise Exception("invalid float when "
+                                        "reading %s at offset %# 08x" % (
+                                            var_name, offset + rel_offset))
+
+                if export == READ_GEN:
+                    member_type = SCALAR_MEMBER_TYPES.get(storage_type)
+                    if member_type is None:
+                        raise Exception("%s at offset %# 08x: Data read via %s "
+                                        "cannot be stored as %s;"
+                                        " expected %s, %s, %s or %s"
+                                        % (var_name, offset + rel_offset, symbol,
+                                           storage_type,
+                                           StorageType.INT_MEMBER,
+                                           StorageType.FLOAT_MEMBER,
+                                           StorageType.BOOLEAN_MEMBER,
+                                           StorageType.ID_MEMBER))
+
+                    generated_value_members.append(member_type(var_name, value))
+
+            # store member's data value
+            setattr(self, var_name, value)
+
+        return offset + fmt.size
+
+    @staticmethod
+    def _create_array_member(
+        var_name: str,
+        storage_type: StorageType,
+        symbol: str,
+        result: tuple,
+        raw: bytes,
+        offset: int
+    ) -> ArrayMember:
+        """
+        Create the ArrayMember for a primitive array.
+
+        Arrays of numbers are stored as zero-copy NumPy views of raw,
+        other arrays get a member for every element.
+        """
+        if storage_type in PRIMITIVE_ARRAY_TYPES and symbol in NUMPY_TYPE_LOOKUP:
+            values = numpy.frombuffer(raw, dtype=NUMPY_TYPE_LOOKUP[symbol],
+                                      count=len(result), offset=offset)
+
+            return PrimitiveArrayMember(var_name, PRIMITIVE_ARRAY_TYPES[storage_type], values)
+
+        if not result:
+            return ArrayMember(var_name, None, [])
 
-        elif isinstance(var_type, ReadMember):
-            # These could be EnumMember, EnumLookupMember, etc.
+        try:
+            member_type, allowed_member_type = ARRAY_MEMBER_TYPES[storage_type]
 
+        except KeyError:
+            raise Exception("%s at offset %# 08x: Data read via array "
+                            "cannot be stored as %s;"
+                            " expected %s, %s, %s, %s or %s"
+                            % (var_name, offset, storage_type,
+                                StorageType.ARRAY_INT,
+                                StorageType.ARRAY_FLOAT,
+                                StorageType.ARRAY_BOOL,
+                                StorageType.ARRAY_ID,
+                                StorageType.ARRAY_STRING)) from None
+
+        array_members = [member_type(var_name, elem) for elem in result]
+
+        return ArrayMember(var_name, allowed_member_type, array_members)
+
+    def _read_primitive(
+        self,
+        raw: bytes,
+        offset: int,
+        export: MemberAccess,
+        step: ReadPlanStep
+    ) -> tuple[int, list[ValueMember], bool]:
+        generated_value_members = []
+        # reading binary data, as this member is no reference but
+        # actual content.
+
+        stop_reading_members = False
+
+        var_name = step.var_name
+        var_type = step.var_type
+        storage_type = step.storage_type
+        symbol = step.symbol
+        is_custom_member = step.is_custom
+
+        if is_custom_member:
             # special type requires having set the raw data type
-            struct_type = var_type.raw_type
             data_count = var_type.get_length(self)
-            is_custom_member = True
 
         else:
-            raise Exception(
-                f"unknown data member definition {var_type} for member '{var_name}'")
+            # dynamic length specified by member name
+            data_count = getattr(self, step.length)
 
         if data_count < 0:
             raise Exception("invalid length %d < 0 in %s for member '%s'" % (
                 data_count, var_type, var_name))
 
-        if struct_type not in STRUCT_TYPE_LOOKUP:
-            raise Exception("%s: member %s requests unknown data type %s" % (
-                repr(self), var_name, struct_type))
-
         if export == READ_UNKNOWN:
-            # for unknown variables, generate uid for the unknown
-            # memory location
-            var_name = "unknown-0x%08x" % offset
+            if not is_custom_member:
+                # unknown values are never used, skip them by size
+                export = SKIP
 
-        # lookup c type to python struct scan type
-        symbol = STRUCT_TYPE_LOOKUP[struct_type]
+            else:
+                # for unknown variables, generate uid for the unknown
+                # memory location
+                var_name = "unknown-0x%08x" % offset
 
         # read that stuff!!11
-        struct_format = "< %d%s" % (data_count, symbol)
+        struct_format = get_struct(data_count, symbol)
 
         if export != SKIP:
-            result = struct.unpack_from(struct_format, raw, offset)
+            result = struct_format.unpack_from(raw, offset)
 
             if is_custom_member:
                 if not var_type.verify_read_data(self, result):
@@ -450,53 +766,12 @@ class GenieStructure:
 
                     generated_value_members.append(gen_member)
 
-            elif is_array:
+            elif step.is_array:
                 if export == READ_GEN:
-                    # Turn every element of result into a member
-                    # and put them into an array
-                    array_members = []
-                    allowed_member_type = None
-
-                    for elem in result:
-                        if storage_type is StorageType.ARRAY_INT:
-                            gen_member = IntMember(var_name, elem)
-                            allowed_member_type = StorageType.INT_MEMBER
-                            array_members.append(gen_member)
-
-                        elif storage_type is StorageType.ARRAY_FLOAT:
-                            gen_member = FloatMember(var_name, elem)
-                            allowed_member_type = StorageType.FLOAT_MEMBER
-                            array_members.append(gen_member)
-
-                        elif storage_type is StorageType.ARRAY_BOOL:
-                            gen_member = BooleanMember(var_name, elem)
-                            allowed_member_type = StorageType.BOOLEAN_MEMBER
-                            array_members.append(gen_member)
-
-                        elif storage_type is StorageType.ARRAY_ID:
-                            gen_member = IDMember(var_name, elem)
-                            allowed_member_type = StorageType.ID_MEMBER
-                            array_members.append(gen_member)
-
-                        elif storage_type is StorageType.ARRAY_STRING:
-                            gen_member = StringMember(var_name, elem)
-                            allowed_member_type = StorageType.STRING_MEMBER
-                            array_members.append(gen_member)
-
-                        else:
-                            raise Exception("%s at offset %# 08x: Data read via %s "
-                                            "cannot be stored as %s;"
-                                            " expected %s, %s, %s, %s or %s"
-                                            % (var_name, offset, var_type, storage_type,
-                                                StorageType.ARRAY_INT,
-                                                StorageType.ARRAY_FLOAT,
-                                                StorageType.ARRAY_BOOL,
-                                                StorageType.ARRAY_ID,
-                                                StorageType.ARRAY_STRING))
-
-                    # Create the array
-                    array = ArrayMember(var_name, allowed_member_type, array_members)
-                    generated_value_members.append(array)
+                    generated_value_members.append(
+                        self._create_array_member(var_name, storage_type, symbol, result,
+                                                  raw, offset)
+                    )
 
             elif data_count == 1:
                 # store first tuple element
@@ -553,19 +828,8 @@ class GenieStructure:
                                                     StorageType.BOOLEAN_MEMBER))
 
                     else:
-                        if storage_type is StorageType.INT_MEMBER:
-                            gen_member = IntMember(var_name, result)
-
-                        elif storage_type is StorageType.FLOAT_MEMBER:
-                            gen_member = FloatMember(var_name, result)
-
-                        elif storage_type is StorageType.BOOLEAN_MEMBER:
-                            gen_member = BooleanMember(var_name, result)
-
-                        elif storage_type is StorageType.ID_MEMBER:
-                            gen_member = IDMember(var_name, result)
-
-                        else:
+                        member_type = SCALAR_MEMBER_TYPES.get(storage_type)
+                        if member_type is None:
                             raise Exception("%s at offset %# 08x: Data read via %s "
                                             "cannot be stored as %s;"
                                             " expected %s, %s, %s or %s"
@@ -575,6 +839,8 @@ class GenieStructure:
                                                 StorageType.BOOLEAN_MEMBER,
                                                 StorageType.ID_MEMBER))
 
+                        gen_member = member_type(var_name, result)
+
                     generated_value_members.append(gen_member)
 
             # run entry hook for non-primitive members
@@ -589,10 +855,63 @@ class GenieStructure:
             setattr(self, var_name, result)
 
         # increase the current file position by the size we just read
-        offset += struct.calcsize(struct_format)
+        offset += struct_format.size
 
         return offset, generated_value_members, stop_reading_members
 
+    @classmethod
+    def get_entry_class(cls, game_version: GameVersion, var_name: str) -> type:
+        """
+        Returns the class of the entries of the single-subtype
+        subdata member var_name.
+        """
+        for step in cls.get_read_plan(game_version):
+            if step.kind is ReadStepKind.MULTISUBTYPE and step.var_name == var_name:
+                if not isinstance(step.var_type, SubdataMember):
+                    raise Exception("%s: entries of %s have multiple subtypes"
+                                    % (cls.__name__, var_name))
+
+                return step.var_type.class_lookup[None]
+
+        raise Exception("%s has no subdata member %s in %s"
+                        % (cls.__name__, var_name, game_version))
+
+    @classmethod
+    def get_read_plan(
+        cls,
+        game_version: GameVersion,
+        projection: frozenset[str] = None
+    ) -> tuple[ReadPlanStep, ...]:
+        """
+        Return the compiled read plan of this struct for a game version.
+
+        The plan is only compiled once per (struct, game version, projection)
+        and reused for every subsequent read.
+
+        :param projection: Names of the members that are generated.
+                           None generates all members.
+        :type projection: frozenset
+        """
+        key = (cls, game_version, projection)
+        try:
+            return _READ_PLAN_CACHE[key]
+
+        except KeyError:
+            pass
+
+        members = cls.get_data_format(game_version,
+                                      allowed_modes=(True,
+                                                     READ,
+                                                     READ_GEN,
+                                                     READ_UNKNOWN,
+                                                     SKIP),
+                                      flatten_includes=False)
+
+        plan = compile_read_plan(members, projection)
+        _READ_PLAN_CACHE[key] = plan
+
+        return plan
+
     @classmethod
     def get_data_format(
         cls,
@@ -18,6 +18,12 @@ if typing.TYPE_CHECKING:
 
 class Civ(GenieStructure):
 
+    # civ units are read by worker processes if possible
+    parallel_read = True
+
+    # unit table of the civ
+    columnar_members = {"units": "id0"}
+
     @classmethod
     def get_data_format_members(
         cls,
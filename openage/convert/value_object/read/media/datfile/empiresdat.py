@@ -39,6 +39,12 @@ class EmpiresDat(GenieStructure):
     represents the main game data file.
     """
 
+    # graphic and tech tables, techs are identified by their index
+    columnar_members = {
+        "graphics": "graphic_id",
+        "researches": None,
+    }
+
     @classmethod
     def get_data_format_members(
         cls,
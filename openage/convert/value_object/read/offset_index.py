@@ -0,0 +1,327 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+"""
+Random-access index of record offsets in data files.
+
+While a data file is read, the offsets of the entries of subdata members
+(e.g. civs, units, techs, graphics) can be recorded in an OffsetIndex.
+Afterwards, a single record can be read from the data without parsing
+everything that is stored before it.
+
+Records are addressed by a section path and a record ID. The section
+path consists of the member names separated by dots, the record ID
+contains one entry index per path element, e.g.
+
+    ("civs", (3,))          -> civ 3
+    ("civs.units", (3, 4))  -> unit 4 of civ 3
+"""
+from __future__ import annotations
+import typing
+
+import marshal
+import os
+from tempfile import NamedTemporaryFile
+
+from .dynamic_loader import DynamicLoader
+
+if typing.TYPE_CHECKING:
+    from openage.convert.value_object.init.game_version import GameVersion
+    from openage.convert.value_object.read.genie_structure import GenieStructure
+    from openage.convert.value_object.read.value_members import ContainerMember
+
+
+# Version of the stored index format
+OFFSET_INDEX_VERSION = 2
+
+
+class OffsetIndex:
+    """
+    Maps (section path, record ID) to the byte offset of the record.
+    """
+
+    def __init__(self, max_depth: int = 2, root_levels: int = 1):
+        """
+        Create a new empty index.
+
+        :param max_depth: Number of nested subdata levels that are indexed.
+        :type max_depth: int
+        :param root_levels: Number of wrapper levels that are not indexed
+                            and stripped from the section paths.
+        :type root_levels: int
+        """
+        self.max_depth = max_depth
+        self.root_levels = root_levels
+
+        # (section path, record ID) -> offset
+        self.offsets: dict[tuple[str, tuple[int, ...]], int] = {}
+
+        # (section path, ID of the parent record) -> offset after the last record
+        self.section_ends: dict[tuple[str, tuple[int, ...]], int] = {}
+
+        # section path -> arguments passed to the record structs
+        self.section_args: dict[str, dict[str, typing.Any]] = {}
+
+        # section path -> {record ID -> offset after the record}, created on demand
+        self._record_ends: dict[str, dict[tuple[int, ...], int]] = {}
+
+    def create_cursor(self) -> OffsetIndexCursor:
+        """
+        Returns the cursor for recording offsets, starting at the root level.
+        """
+        return OffsetIndexCursor(self, (), (), 0)
+
+    def get_offset(self, section: str, record_id: typing.Union[int, tuple[int, ...]]) -> int:
+        """
+        Returns the offset of a record.
+
+        :param section: Section path, e.g. 'civs.units'.
+        :type section: str
+        :param record_id: Entry index or indices of the record in the section path.
+        :type record_id: int, tuple
+        """
+        if isinstance(record_id, int):
+            record_id = (record_id,)
+
+        try:
+            return self.offsets[(section, tuple(record_id))]
+
+        except KeyError:
+            raise KeyError(f"{self}: no record {record_id} in section {section}") from None
+
+    def get_record_end(
+        self,
+        section: str,
+        record_id: typing.Union[int, tuple[int, ...]],
+        offset: int = None
+    ) -> typing.Union[int, None]:
+        """
+        Returns the offset after a record or None if it is unknown.
+
+        :param offset: Offset of the record in the data that is read. If it
+                       does not match the index, None is returned.
+        :type offset: int
+        """
+        if isinstance(record_id, int):
+            record_id = (record_id,)
+
+        record_id = tuple(record_id)
+        start = self.offsets.get((section, record_id))
+        if start is None or (offset is not None and start != offset):
+            return None
+
+        if section not in self._record_ends:
+            self._record_ends[section] = self._create_record_ends(section)
+
+        return self._record_ends[section].get(record_id)
+
+    def _create_record_ends(self, section: str) -> dict[tuple[int, ...], int]:
+        """
+        Find the end offsets of the records in a section. Records of the
+        same parent are stored one after another, so a record ends where
+        the next one starts.
+        """
+        # ID of the parent record -> [(offset, record ID)]
+        parents: dict[tuple[int, ...], list[tuple[int, tuple[int, ...]]]] = {}
+        for (record_section, record_id), offset in self.offsets.items():
+            if record_section == section:
+                parents.setdefault(record_id[:-1], []).append((offset, record_id))
+
+        record_ends = {}
+        for parent_id, records in parents.items():
+            records.sort()
+
+            for (_, record_id), (next_offset, _) in zip(records, records[1:]):
+                record_ends[record_id] = next_offset
+
+            section_end = self.section_ends.get((section, parent_id))
+            if section_end is not None:
+                record_ends[records[-1][1]] = section_end
+
+        return record_ends
+
+    def get_record_ids(self, section: str) -> list[tuple[int, ...]]:
+        """
+        Returns the IDs of all indexed records in a section.
+        """
+        return [record_id for (record_section, record_id) in self.offsets
+                if record_section == section]
+
+    @staticmethod
+    def _resolve_parent(
+        root_cls: type[GenieStructure],
+        section: str,
+        game_version: GameVersion
+    ) -> tuple[GenieStructure, str]:
+        """
+        Find the struct that stores the entries of a section.
+
+        Returns an instance of the parent struct and the member name
+        of the section.
+        """
+        path = section.split(".")
+        parent_cls = root_cls
+
+        for var_name in path[:-1]:
+            parent_cls = parent_cls.get_entry_class(game_version, var_name)
+
+        return parent_cls(), path[-1]
+
+    def read_record(
+        self,
+        raw: bytes,
+        game_version: GameVersion,
+        root_cls: type[GenieStructure],
+        section: str,
+        record_id: typing.Union[int, tuple[int, ...]]
+    ) -> ContainerMember:
+        """
+        Read a single record from the raw data.
+
+        :param raw: Data that the index was created from.
+        :type raw: bytes
+        :param root_cls: Struct that the section paths start at.
+        :type root_cls: GenieStructure
+        """
+        offset = self.get_offset(section, record_id)
+        parent, var_name = self._resolve_parent(root_cls, section, game_version)
+
+        return parent.read_entry(raw, offset, game_version, var_name,
+                                 self.section_args.get(section))
+
+    def get_loader(
+        self,
+        raw: bytes,
+        game_version: GameVersion,
+        root_cls: type[GenieStructure],
+        section: str,
+        record_id: typing.Union[int, tuple[int, ...]]
+    ) -> DynamicLoader:
+        """
+        Returns a DynamicLoader for a single record.
+        """
+        offset = self.get_offset(section, record_id)
+        parent, var_name = self._resolve_parent(root_cls, section, game_version)
+
+        data_cls, data_offset, _ = parent.resolve_entry(raw, offset, game_version, var_name)
+
+        return DynamicLoader("", data_cls, game_version, raw, data_offset)
+
+    def save(self, path: str) -> None:
+        """
+        Atomically write the index to a file.
+        """
+        data = (
+            OFFSET_INDEX_VERSION,
+            self.max_depth,
+            self.root_levels,
+            self.offsets,
+            self.section_ends,
+            self.section_args,
+        )
+
+        dirname = os.path.dirname(path)
+        with NamedTemporaryFile("wb", dir=dirname, suffix=".tmp", delete=False) as tmpfile:
+            try:
+                marshal.dump(data, tmpfile)
+
+            except BaseException:
+                tmpfile.close()
+                os.remove(tmpfile.name)
+                raise
+
+        os.replace(tmpfile.name, path)
+
+    @classmethod
+    def load(cls, path: str) -> OffsetIndex:
+        """
+        Load an index stored with save().
+        """
+        with open(path, "rb") as indexfile:
+            data = marshal.load(indexfile)
+
+        if data[0] != OFFSET_INDEX_VERSION:
+            raise ValueError(f"offset index {path} has unsupported version {data[0]}")
+
+        _, max_depth, root_levels, offsets, section_ends, section_args = data
+
+        index = cls(max_depth, root_levels)
+        index.offsets = offsets
+        index.section_ends = section_ends
+        index.section_args = section_args
+
+        return index
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __repr__(self):
+        return f"OffsetIndex<{len(self)} records>"
+
+
+class OffsetIndexCursor:
+    """
+    Position of the reader in the subdata hierarchy while recording
+    offsets into an OffsetIndex.
+    """
+
+    __slots__ = ('index', 'sections', 'records', 'level')
+
+    def __init__(
+        self,
+        index: OffsetIndex,
+        sections: tuple[str, ...],
+        records: tuple[int, ...],
+        level: int
+    ):
+        self.index = index
+        self.sections = sections
+        self.records = records
+        self.level = level
+
+    def add(
+        self,
+        var_name: str,
+        record_id: int,
+        offset: int,
+        varargs: dict[str, typing.Any] = None
+    ) -> None:
+        """
+        Record the offset of an entry of the subdata member var_name.
+        """
+        root_levels = self.index.root_levels
+        if self.level < root_levels:
+            return
+
+        section = ".".join(self.sections[root_levels:] + (var_name,))
+        record = self.records[root_levels:] + (record_id,)
+        self.index.offsets[(section, record)] = offset
+
+        if varargs and section not in self.index.section_args:
+            self.index.section_args[section] = varargs
+
+    def end(self, var_name: str, offset: int) -> None:
+        """
+        Record the offset after the last entry of the subdata member var_name.
+        """
+        root_levels = self.index.root_levels
+        if self.level < root_levels:
+            return
+
+        section = ".".join(self.sections[root_levels:] + (var_name,))
+        self.index.section_ends[(section, self.records[root_levels:])] = offset
+
+    def enter(self, var_name: str, record_id: int) -> typing.Union[OffsetIndexCursor, None]:
+        """
+        Returns the cursor for the members of an entry or None
+        if the entry is nested too deep to be indexed.
+        """
+        level = self.level + 1
+        if level >= self.index.root_levels + self.index.max_depth:
+            return None
+
+        return OffsetIndexCursor(
+            self.index,
+            self.sections + (var_name,),
+            self.records + (record_id,),
+            level
+        )
@@ -0,0 +1,304 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+"""
+Compiled read plans for GenieStructure.read().
+
+A read plan is a flat list of instructions for the members of a
+structure. Array lengths and struct formats are resolved once when the
+plan is compiled, and consecutive primitives with a fixed length are
+read with a single precompiled struct.
+"""
+from __future__ import annotations
+import typing
+
+from enum import Enum
+import re
+import struct
+
+import numpy
+
+from .member_access import READ, READ_GEN, READ_UNKNOWN, SKIP, MemberAccess
+from .read_members import GroupMember, MultisubtypeMember, ReadMember, SubdataMember
+from .value_members import StorageType
+
+
+# regex for matching type array definitions like int[1337]
+# group 1: type name, group 2: length
+VARARRAY_MATCH = re.compile("([a-zA-Z0-9_]+) *\\[([a-zA-Z0-9_]+)\\] *;?")
+
+# match a simple number
+INTEGER_MATCH = re.compile("\\d+")
+
+# type lookup for C -> python struct
+STRUCT_TYPE_LOOKUP = {
+    "char":               "b",
+    "unsigned char":      "B",
+    "int8_t":             "b",
+    "uint8_t":            "B",
+    "short":              "h",
+    "unsigned short":     "H",
+    "int16_t":            "h",
+    "uint16_t":           "H",
+    "int":                "i",
+    "unsigned int":       "I",
+    "int32_t":            "i",
+    "uint32_t":           "I",
+    "long":               "l",
+    "unsigned long":      "L",
+    "long long":          "q",
+    "unsigned long long": "Q",
+    "int64_t":            "q",
+    "uint64_t":           "Q",
+    "float":              "f",
+    "double":             "d",
+    "char[]":             "s",
+}
+
+# struct symbol -> NumPy dtype for arrays of numbers
+NUMPY_TYPE_LOOKUP = {
+    "b": numpy.dtype("<i1"),
+    "B": numpy.dtype("<u1"),
+    "h": numpy.dtype("<i2"),
+    "H": numpy.dtype("<u2"),
+    "i": numpy.dtype("<i4"),
+    "I": numpy.dtype("<u4"),
+    "l": numpy.dtype("<i4"),
+    "L": numpy.dtype("<u4"),
+    "q": numpy.dtype("<i8"),
+    "Q": numpy.dtype("<u8"),
+    "f": numpy.dtype("<f4"),
+    "d": numpy.dtype("<f8"),
+}
+
+# storage types that primitive arrays can be stored as
+ARRAY_STORAGE_TYPES = (
+    StorageType.STRING_MEMBER,
+    StorageType.ARRAY_INT,
+    StorageType.ARRAY_FLOAT,
+    StorageType.ARRAY_BOOL,
+    StorageType.ARRAY_ID,
+    StorageType.ARRAY_STRING,
+)
+
+# precompiled struct formats, keyed by (data count, struct symbol)
+_STRUCT_CACHE: dict[tuple[int, str], struct.Struct] = {}
+
+
+def get_struct(data_count: int, symbol: str) -> struct.Struct:
+    """
+    Return a precompiled little-endian struct reading data_count
+    values of the given struct symbol.
+    """
+    key = (data_count, symbol)
+    try:
+        return _STRUCT_CACHE[key]
+
+    except KeyError:
+        result = struct.Struct(f"< {data_count}{symbol}")
+        _STRUCT_CACHE[key] = result
+        return result
+
+
+class ReadStepKind(Enum):
+    """
+    Instruction types of a read plan.
+    """
+
+    GROUP        = "group"          # GroupMember/IncludeMembers
+    MULTISUBTYPE = "multisubtype"   # MultisubtypeMember/SubdataMember
+    PRIMITIVE    = "primitive"      # single primitive with dynamic length or ReadMember
+    STRUCT_RUN   = "struct_run"     # consecutive primitives with fixed length
+
+
+class ReadPlanStep:
+    """
+    Single instruction of a compiled read plan.
+
+    Struct runs merge consecutive fixed-size primitive members into one
+    precompiled struct. Their members are stored in 'items' as tuples of
+    (export, var_name, storage_type, symbol, value_index, rel_offset,
+    data_count, is_array).
+    """
+    # pylint: disable=too-many-instance-attributes,too-few-public-methods
+
+    __slots__ = ('kind', 'export', 'var_name', 'storage_type', 'var_type',
+                 'struct_type', 'symbol', 'length', 'is_array', 'is_custom',
+                 'items', 'fmt', 'subtype_plan')
+
+    def __init__(self, kind: ReadStepKind, export: MemberAccess = None,
+                 var_name: str = None, storage_type: StorageType = None,
+                 var_type: typing.Union[str, ReadMember] = None):
+        self.kind = kind
+        self.export = export
+        self.var_name = var_name
+        self.storage_type = storage_type
+        self.var_type = var_type
+
+        self.struct_type = None
+        self.symbol = None
+        self.length = None
+        self.is_array = False
+        self.is_custom = False
+
+        self.items = None
+        self.fmt = None
+        self.subtype_plan = None
+
+    def __repr__(self):
+        if self.kind is ReadStepKind.STRUCT_RUN:
+            return f"ReadPlanStep<{self.kind.value}:{self.fmt.format}>"
+
+        return f"ReadPlanStep<{self.kind.value}:{self.var_name}>"
+
+
+def compile_read_plan(
+    members: typing.Iterable[tuple],
+    projection: frozenset[str] = None
+) -> tuple[ReadPlanStep, ...]:
+    """
+    Compile a member list as returned by GenieStructure.get_data_format()
+    into a flat read plan.
+
+    Array lengths and struct formats are resolved once here instead of
+    on every read. Consecutive primitives with a fixed length are merged
+    into a single precompiled struct run. Unknown and skipped members with
+    a fixed length become padding in the struct run, so they are skipped
+    by size.
+
+    :param projection: Names of the members that are generated. Other
+                       members are only read. None generates all members.
+    :type projection: frozenset
+    """
+    plan = []
+    run_items = []
+    run_format = []
+    run_size = 0
+    run_value_count = 0
+
+    def flush_run():
+        nonlocal run_items, run_format, run_size, run_value_count
+        if run_format:
+            step = ReadPlanStep(ReadStepKind.STRUCT_RUN)
+            step.fmt = struct.Struct("< " + " ".join(run_format))
+            step.items = tuple(run_items)
+            plan.append(step)
+
+        run_items = []
+        run_format = []
+        run_size = 0
+        run_value_count = 0
+
+    for _, export, var_name, storage_type, var_type in members:
+        if export == READ_GEN and projection is not None:
+            if var_name not in projection:
+                export = READ
+
+        if isinstance(var_type, GroupMember):
+            flush_run()
+            plan.append(ReadPlanStep(ReadStepKind.GROUP, export, var_name,
+                                     storage_type, var_type))
+            continue
+
+        if isinstance(var_type, MultisubtypeMember):
+            flush_run()
+            step = ReadPlanStep(ReadStepKind.MULTISUBTYPE, export, var_name,
+                                storage_type, var_type)
+            if not isinstance(var_type, SubdataMember):
+                # on-the-fly definition for reading the subtype
+                step.subtype_plan = compile_read_plan(
+                    ((False,) + var_type.subtype_definition,)
+                )
+            plan.append(step)
+            continue
+
+        step = _compile_primitive(export, var_name, storage_type, var_type)
+
+        if not isinstance(step.length, int):
+            # length is only known while reading
+            flush_run()
+            plan.append(step)
+            continue
+
+        # fixed length primitive: append it to the current struct run
+        item_format = f"{step.length}{step.symbol}"
+
+        if export in (SKIP, READ_UNKNOWN):
+            # the value is never used, so don't unpack it
+            item_size = struct.calcsize("< " + item_format)
+            run_format.append(f"{item_size}x")
+            run_size += item_size
+            continue
+
+        run_items.append((export, var_name, storage_type, step.symbol,
+                          run_value_count, run_size, step.length, step.is_array))
+        run_format.append(item_format)
+        run_size += struct.calcsize("< " + item_format)
+
+        if step.symbol == "s":
+            run_value_count += 1
+
+        else:
+            run_value_count += step.length
+
+    flush_run()
+
+    return tuple(plan)
+
+
+def _compile_primitive(
+    export: MemberAccess,
+    var_name: str,
+    storage_type: StorageType,
+    var_type: typing.Union[str, ReadMember]
+) -> ReadPlanStep:
+    """
+    Create the read plan step of a primitive member and resolve
+    its struct symbol and length. The length is None for custom
+    members and a member name for dynamic arrays.
+    """
+    step = ReadPlanStep(ReadStepKind.PRIMITIVE, export, var_name,
+                        storage_type, var_type)
+
+    if isinstance(var_type, str):
+        is_array = VARARRAY_MATCH.match(var_type)
+
+        if is_array:
+            struct_type = is_array.group(1)
+            data_count = is_array.group(2)
+            if struct_type == "char":
+                struct_type = "char[]"
+
+            if INTEGER_MATCH.match(data_count):
+                # integer length
+                data_count = int(data_count)
+
+            if storage_type not in ARRAY_STORAGE_TYPES:
+                raise Exception(f"{var_name}: Data read via {var_type} "
+                                f"cannot be stored as {storage_type};"
+                                " expected ArrayMember format")
+
+        else:
+            struct_type = var_type
+            data_count = 1
+
+        step.is_array = bool(is_array)
+
+    elif isinstance(var_type, ReadMember):
+        # These could be EnumMember, EnumLookupMember, etc.
+        # the length is evaluated with the object when reading
+        struct_type = var_type.raw_type
+        data_count = None
+        step.is_custom = True
+
+    else:
+        raise Exception(
+            f"unknown data member definition {var_type} for member '{var_name}'")
+
+    if struct_type not in STRUCT_TYPE_LOOKUP:
+        raise Exception(f"member {var_name} requests unknown data type {struct_type}")
+
+    step.struct_type = struct_type
+    step.symbol = STRUCT_TYPE_LOOKUP[struct_type]
+    step.length = data_count
+
+    return step
@@ -20,15 +20,27 @@ Quick usage guide on when to use which ValueMember:
     - ArrayMember: Stores a list of members with uniform type. Can be used
                    when repeating substructures appear in a data file.
                    (e.g. multiple unit objects, list of coordinates)
+    - PrimitiveArrayMember: ArrayMember for primitive numbers that keeps the
+                            values in a NumPy array.
+                            (e.g. resource amounts, lists of unit IDs)
+
+Diffing containers and arrays compares their structural digests first,
+so identical subtrees are not traversed. The results of diffing the same
+pair of containers or arrays again are taken from the DIFF_CACHE. Cached
+diffs are shared by all callers and must not be modified.
 """
 from __future__ import annotations
 import typing
 
-
+import hashlib
+from collections import OrderedDict
 from enum import Enum
 from math import isclose
 from abc import ABC, abstractmethod
 
+import numpy
+
+from ....testing.testing import assert_value
 from .dynamic_loader import DynamicLoader
 
 
@@ -72,6 +84,13 @@ class ValueMember(ABC):
         If they are equal, return a NoDiffMember.
         """
 
+    def get_hash(self) -> bytes:
+        """
+        Returns the structural digest of the member. Members with
+        the same digest are considered equal when they are diffed.
+        """
+        return repr((self.get_type().value, self._value)).encode()
+
     def __repr__(self):
         return f"{self.__class__.__name__}<{self.name}>"
 
@@ -284,6 +303,8 @@ class ContainerMember(ValueMember):
     are the value of the dict.
     """
 
+    __slots__ = ('_hash',)
+
     def __init__(
         self,
         name: str,
@@ -303,6 +324,7 @@ class ContainerMember(ValueMember):
         super().__init__(name)
 
         self._value = {}
+        self._hash = None
 
         if isinstance(submembers, (dict, DynamicLoader)):
             # submembers is a list or loads dynamically
@@ -315,10 +337,34 @@ class ContainerMember(ValueMember):
     def get_type(self) -> StorageType:
         return StorageType.CONTAINER_MEMBER
 
+    def get_hash(self) -> bytes:
+        if self._hash is None:
+            digest = _create_digest(self.get_type())
+            for key, member in sorted(self.value.items(),
+                                      key=lambda item: repr(item[0])):
+                _update_digest(digest, repr(key).encode())
+                _update_digest(digest, member.get_hash())
+
+            self._hash = digest.digest()
+
+        return self._hash
+
     def diff(
         self,
         other: ContainerMember
     ) -> typing.Union[NoDiffMember, ContainerMember]:
+        if self is other or self.get_hash() == other.get_hash():
+            return NoDiffMember(self.name, self)
+
+        return DIFF_CACHE.get(self, other)
+
+    def _diff(
+        self,
+        other: ContainerMember
+    ) -> typing.Union[NoDiffMember, ContainerMember]:
+        """
+        Diff the submembers of the containers.
+        """
         if self.get_type() is other.get_type():
             diff_dict = {}
 
@@ -378,7 +424,7 @@ class ArrayMember(ValueMember):
     Stores an ordered list of members with the same type.
     """
 
-    __slots__ = ('_allowed_member_type')
+    __slots__ = ('_allowed_member_type', '_hash')
 
     def __init__(
         self,
@@ -396,6 +442,7 @@ class ArrayMember(ValueMember):
         super().__init__(name)
 
         self._value = members
+        self._hash = None
 
         self._allowed_member_type = allowed_member_type
 
@@ -476,10 +523,32 @@ class ArrayMember(ValueMember):
 
         return ContainerMember(self.name, member_dict)
 
+    def get_hash(self) -> bytes:
+        if self._hash is None:
+            digest = _create_digest(self.get_type())
+            for member in self.value:
+                _update_digest(digest, member.get_hash())
+
+            self._hash = digest.digest()
+
+        return self._hash
+
     def diff(
         self,
         other: ArrayMember
     ) -> typing.Union[NoDiffMember, ArrayMember]:
+        if self is other or self.get_hash() == other.get_hash():
+            return NoDiffMember(self.name, self)
+
+        return DIFF_CACHE.get(self, other)
+
+    def _diff(
+        self,
+        other: ArrayMember
+    ) -> typing.Union[NoDiffMember, ArrayMember]:
+        """
+        Diff the elements of the arrays.
+        """
         if self.get_type() == other.get_type():
             diff_list = []
             other_list = other.value
@@ -526,6 +595,106 @@ class ArrayMember(ValueMember):
         return len(self.value)
 
 
+class PrimitiveArrayMember(ArrayMember):
+    """
+    Stores an ordered list of primitive values with the same type
+    in a NumPy array. Member objects for the elements are only
+    created when they are accessed.
+
+    The array can be a zero-copy view of the source data.
+    """
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        name: str,
+        allowed_member_type: StorageType,
+        values: numpy.ndarray
+    ):
+        # ArrayMember.__init__() would check a member object for every element
+        # pylint: disable=super-init-not-called,non-parent-init-called
+        ValueMember.__init__(self, name)
+
+        if allowed_member_type not in PRIMITIVE_MEMBER_TYPES:
+            raise Exception("%s cannot store members of type %s"
+                            % (self, allowed_member_type))
+
+        self._value = values
+        self._hash = None
+
+        self._allowed_member_type = allowed_member_type
+
+    @property
+    def array(self) -> numpy.ndarray:
+        """
+        Returns the NumPy array storing the values.
+        """
+        return self._value
+
+    @property
+    def value(self) -> list[typing.Union[IntMember,
+                                         FloatMember,
+                                         BooleanMember,
+                                         IDMember]]:
+        """
+        Returns the values of the array as member objects.
+        """
+        member_type = PRIMITIVE_MEMBER_TYPES[self._allowed_member_type]
+        return [member_type(self.name, elem) for elem in self._value.tolist()]
+
+    def get_hash(self) -> bytes:
+        if self._hash is None:
+            digest = _create_digest(self.get_type())
+            _update_digest(digest, self._value.dtype.str.encode())
+            _update_digest(digest, self._value.tobytes())
+
+            self._hash = digest.digest()
+
+        return self._hash
+
+    def _diff(
+        self,
+        other: ArrayMember
+    ) -> typing.Union[NoDiffMember, ArrayMember]:
+        if isinstance(other, PrimitiveArrayMember) and\
+                self.get_type() is other.get_type() and\
+                len(self) == len(other):
+            if self._allowed_member_type is StorageType.FLOAT_MEMBER:
+                # same tolerance as FloatMember.diff()
+                left = self._value.astype(numpy.float64)
+                right = other.array.astype(numpy.float64)
+                tolerance = 1e-7 * numpy.maximum(numpy.abs(left), numpy.abs(right))
+                equal = numpy.all(numpy.abs(left - right) <= tolerance)
+
+            else:
+                equal = numpy.array_equal(self._value, other.array)
+
+            if equal:
+                return NoDiffMember(self.name, self)
+
+        # diff the element members
+        # pylint: disable=protected-access
+        left = ArrayMember(self.name, self._allowed_member_type, self.value)
+        if isinstance(other, PrimitiveArrayMember):
+            other = ArrayMember(other.name, other._allowed_member_type, other.value)
+
+        return left._diff(other)
+
+    def __getitem__(self, key):
+        """
+        Short command for getting a member in the array.
+        """
+        if isinstance(key, slice):
+            return self.value[key]
+
+        member_type = PRIMITIVE_MEMBER_TYPES[self._allowed_member_type]
+        return member_type(self.name, self._value[key].item())
+
+    def __len__(self):
+        return len(self._value)
+
+
 class NoDiffMember(ValueMember):
     """
     Is returned when no difference between two members is found.
@@ -671,6 +840,100 @@ class RightMissingMember(ValueMember):
             f"{type(self)} cannot be diffed")
 
 
+def _create_digest(member_type: StorageType) -> hashlib.blake2b:
+    """
+    Returns a new digest for the structural hash of a member
+    with the given type.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update_digest(digest, member_type.value.encode())
+
+    return digest
+
+
+def _update_digest(digest: hashlib.blake2b, data: bytes) -> None:
+    """
+    Adds length-prefixed data to a digest, so that the boundaries
+    between the hashed fields are unambiguous.
+    """
+    digest.update(len(data).to_bytes(8, "little"))
+    digest.update(data)
+
+
+class DiffCache:
+    """
+    LRU cache for the diffs of containers and arrays.
+
+    The diffed members are stored with the result, so that
+    their IDs are not reused while the entry exists.
+
+    The same diff object is returned to every caller that diffs
+    the pair, so the returned members must be treated as immutable.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        :param max_entries: Maximum number of cached diffs.
+        :type max_entries: int
+        """
+        self.max_entries = max_entries
+
+        # (left ID, right ID) -> (left, right, diff)
+        self.entries: OrderedDict[tuple[int, int], tuple] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self,
+        left: typing.Union[ContainerMember, ArrayMember],
+        right: typing.Union[ContainerMember, ArrayMember]
+    ) -> ValueMember:
+        """
+        Returns the diff between left and right, diffing the
+        members if the result is not cached.
+        """
+        key = (id(left), id(right))
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[2]
+
+        self.misses += 1
+        result = left._diff(right)  # pylint: disable=protected-access
+
+        self.entries[key] = (left, right, result)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        return result
+
+    def clear(self) -> None:
+        """
+        Remove all cached diffs.
+        """
+        self.entries.clear()
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Returns the cache counters.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+        }
+
+    def __repr__(self) -> str:
+        return f"DiffCache<{len(self.entries)} diffs, {self.hits} hits, {self.misses} misses>"
+
+
+# Cache shared by all diffs of the process
+DIFF_CACHE = DiffCache()
+
+
 class StorageType(Enum):
     """
     Types for values members.
@@ -692,3 +955,40 @@ class StorageType(Enum):
     ARRAY_BITFIELD   = "bitfieldarray"  # BitfieldMembers
     ARRAY_STRING     = "stringarray"    # StringMembers
     ARRAY_CONTAINER  = "contarray"      # ContainerMembers
+
+
+# member types that can be stored in a PrimitiveArrayMember
+PRIMITIVE_MEMBER_TYPES = {
+    StorageType.INT_MEMBER: IntMember,
+    StorageType.FLOAT_MEMBER: FloatMember,
+    StorageType.BOOLEAN_MEMBER: BooleanMember,
+    StorageType.ID_MEMBER: IDMember,
+}
+
+
+def test() -> None:
+    """
+    Members with values that collide in Python's hash()
+    must still be diffed.
+    """
+    left = ContainerMember("unit", [IntMember("x", -1)])
+    right = ContainerMember("unit", [IntMember("x", -2)])
+
+    diff = left.diff(right)
+    assert_value(isinstance(diff, ContainerMember), True)
+    assert_value(diff.value["x"].value, -1)
+
+    left = ArrayMember("units", StorageType.CONTAINER_MEMBER, [left])
+    right = ArrayMember("units", StorageType.CONTAINER_MEMBER, [right])
+
+    diff = left.diff(right)
+    assert_value(isinstance(diff, ArrayMember), True)
+    assert_value(diff.value[0].value["x"].value, -1)
+
+    left = PrimitiveArrayMember("ids", StorageType.INT_MEMBER, numpy.array([-1]))
+    right = PrimitiveArrayMember("ids", StorageType.INT_MEMBER, numpy.array([-2]))
+    assert_value(isinstance(left.diff(right), NoDiffMember), False)
+
+    same = ContainerMember("unit", [IntMember("x", -1)])
+    assert_value(isinstance(same.diff(ContainerMember("unit", [IntMember("x", -1)])),
+                            NoDiffMember), True)
@@ -65,15 +65,16 @@ def main(args, error):
     root["cfg"].mount(get_config_path(args.cfg_dir))
     args.cfg_dir = root["cfg"]
 
+    # try to get previously used source dir
+    asset_location_path = root["cfg"] / "asset_location"
+    try:
+        with asset_location_path.open("r") as file_obj:
+            prev_source_dir_path = file_obj.read().strip()
+    except FileNotFoundError:
+        prev_source_dir_path = None
+
     # ensure that the assets have been converted
-    if wanna_convert() or conversion_required(root["assets"], args):
-        # try to get previously used source dir
-        asset_location_path = root["cfg"] / "asset_location"
-        try:
-            with asset_location_path.open("r") as file_obj:
-                prev_source_dir_path = file_obj.read().strip()
-        except FileNotFoundError:
-            prev_source_dir_path = None
+    if wanna_convert() or conversion_required(root["assets"], args, prev_source_dir_path):
         used_asset_path = convert_assets(
             root["assets"],
             args,
@@ -60,15 +60,16 @@ def main(args, error):
     # mount the config folder at "cfg/"
     root["cfg"].mount(get_config_path(args.cfg_dir))
 
+    # try to get previously used source dir
+    asset_location_path = root["cfg"] / "asset_location"
+    try:
+        with asset_location_path.open("rb") as file_obj:
+            prev_source_dir_path = file_obj.read().strip()
+    except FileNotFoundError:
+        prev_source_dir_path = None
+
     # ensure that the assets have been converted
-    if conversion_required(root["assets"], args):
-        # try to get previously used source dir
-        asset_location_path = root["cfg"] / "asset_location"
-        try:
-            with asset_location_path.open("rb") as file_obj:
-                prev_source_dir_path = file_obj.read().strip()
-        except FileNotFoundError:
-            prev_source_dir_path = None
+    if conversion_required(root["assets"], args, prev_source_dir_path):
         used_asset_path = convert_assets(root["assets"], args,
                                          prev_source_dir_path=prev_source_dir_path)
         if used_asset_path:
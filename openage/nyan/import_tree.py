@@ -4,6 +4,7 @@
 Tree structure for resolving imports.
 """
 from __future__ import annotations
+from collections import deque
 from enum import Enum
 import typing
 
@@ -112,10 +113,10 @@ class Node:
         current_node = self
         fqon = []
         while current_node.node_type is not NodeType.ROOT:
-            fqon.insert(0, current_node.name)
+            fqon.append(current_node.name)
             current_node = current_node.parent
 
-        return tuple(fqon)
+        return tuple(reversed(fqon))
 
     def set_alias(self, alias: str) -> None:
         """
@@ -132,13 +133,16 @@ class ImportTree:
     Tree for storing nyan object references.
     """
 
-    __slots__ = ('root', 'alias_nodes')
+    __slots__ = ('root', 'alias_nodes', 'alias_cache')
 
     def __init__(self):
         self.root = Node("", NodeType.ROOT, None)
 
         self.alias_nodes = set()
 
+        # (fqon, namespace) -> alias fqon, for the file that is currently dumped
+        self.alias_cache: dict[tuple[tuple[str], tuple[str]], tuple[str]] = {}
+
     def add_alias(self, fqon: tuple[str], alias: str) -> None:
         """
         Adds an alias to the node with the specified fqon.
@@ -161,12 +165,18 @@ class ImportTree:
 
         current_node.set_alias(alias)
 
+        # the new alias may shorten cached fqons
+        self.alias_cache.clear()
+
     def clear_marks(self) -> None:
         """
         Remove all alias marks from the tree.
         """
         self.alias_nodes.clear()
 
+        # cached fqons do not mark their alias nodes again
+        self.alias_cache.clear()
+
     def expand_from_file(self, nyan_file: NyanFile) -> None:
         """
         Expands the tree from a nyan file.
@@ -252,17 +262,14 @@ class ImportTree:
         """
         Recursively search the nyan objects for nested objects
         """
-        unsearched_objects = []
-        unsearched_objects.extend(nyan_object.get_nested_objects())
+        unsearched_objects = deque(nyan_object.get_nested_objects())
         found_nested_objects = []
 
-        while len(unsearched_objects) > 0:
-            current_nested_object = unsearched_objects[0]
+        while unsearched_objects:
+            current_nested_object = unsearched_objects.popleft()
             unsearched_objects.extend(current_nested_object.get_nested_objects())
             found_nested_objects.append(current_nested_object)
 
-            unsearched_objects.remove(current_nested_object)
-
         # Process fqons of the nested objects
         for nested_object in found_nested_objects:
             current_node = self.root
@@ -306,6 +313,9 @@ class ImportTree:
         Find the (shortened) fqon by traversing the tree to the fqon node and
         then going upwards until an alias is found.
 
+        Results are cached until the alias marks are cleared, i.e. for
+        the file that is currently dumped.
+
         :param fqon: Object reference for which an alias should be found.
         :type fqon: tuple[str]
         :param namespace: Identifier of a namespace. If this is a (nested) object,
@@ -313,6 +323,20 @@ class ImportTree:
                           searching for an alias.
         :type namespace: tuple[str]
         """
+        # fqons set from strings are lists
+        cache_key = (tuple(fqon), tuple(namespace) if namespace else None)
+        if cache_key in self.alias_cache:
+            return self.alias_cache[cache_key]
+
+        sfqon = self._find_alias_fqon(fqon, namespace)
+        self.alias_cache[cache_key] = sfqon
+
+        return sfqon
+
+    def _find_alias_fqon(self, fqon: tuple[str], namespace: tuple[str] = None) -> tuple[str]:
+        """
+        Find the (shortened) fqon without using the cache.
+        """
         if namespace:
             current_node = self.root
 
@@ -340,12 +364,12 @@ class ImportTree:
         sfqon = []
         while current_node.depth > 0:
             if current_node.alias:
-                sfqon.insert(0, current_node.alias)
+                sfqon.append(current_node.alias)
                 self.alias_nodes.add(current_node)
                 break
 
-            sfqon.insert(0, current_node.name)
+            sfqon.append(current_node.name)
 
             current_node = current_node.parent
 
-        return tuple(sfqon)
+        return tuple(reversed(sfqon))
@@ -1,6 +1,7 @@
 # Copyright 2019-2023 the openage authors. See copying.md for legal info.
 #
 # pylint: disable=too-many-lines,too-many-arguments,too-many-return-statements,too-many-locals
+# pylint: disable=too-many-instance-attributes
 
 """
 Nyan structs.
@@ -17,7 +18,11 @@ from __future__ import annotations
 import typing
 
 
+from collections import deque
 from enum import Enum
+import functools
+import io
+from itertools import chain
 import re
 
 from ..util.ordered_set import OrderedSet
@@ -29,6 +34,40 @@ if typing.TYPE_CHECKING:
 INDENT = "    "
 MAX_LINE_WIDTH = 130
 
+# Allowed names of objects and members
+NAME_PATTERN = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+
+
+@functools.lru_cache(maxsize=4096)
+def is_valid_name(name: str) -> bool:
+    """
+    Check if a name conforms to nyan grammar rules.
+    """
+    return NAME_PATTERN.fullmatch(name) is not None
+
+
+# Orders the inheritance of members. Objects get a time when they
+# inherit from their parents, members when they are added to an object.
+#   time: latest time given to an object or member
+_INHERITANCE_CLOCK: dict[str, int] = {"time": 0}
+
+
+def _next_inheritance_time() -> int:
+    """
+    Returns a time that is later than all previous times.
+    """
+    _INHERITANCE_CLOCK["time"] += 1
+
+    return _INHERITANCE_CLOCK["time"]
+
+
+def advance_inheritance_time(time: int) -> None:
+    """
+    Make sure that objects and members created afterwards are newer
+    than the given time, e.g. after restoring objects with stored times.
+    """
+    _INHERITANCE_CLOCK["time"] = max(_INHERITANCE_CLOCK["time"], time)
+
 
 class NyanObject:
     """
@@ -36,7 +75,8 @@ class NyanObject:
     """
 
     __slots__ = ('name', '_fqon', '_parents', '_inherited_members', '_members',
-                 '_nested_objects', '_children')
+                 '_member_times', '_nested_objects', '_children', '_inheritance_time',
+                 '_inheritance')
 
     def __init__(
         self,
@@ -56,16 +96,26 @@ class NyanObject:
 
         # parent objects
         self._parents: OrderedSet[NyanObject] = OrderedSet()
-        # members inherited from parents
-        self._inherited_members: OrderedSet[InheritedNyanMember] = OrderedSet()
         if parents:
             self._parents.update(parents)
 
+        # members inherited from parents, created on first access
+        self._inherited_members: dict[tuple[str, NyanObject], InheritedNyanMember] = {}
+
+        # resolved inheritance (see _get_inheritance()), None if unresolved
+        self._inheritance: dict[tuple[str, NyanObject], tuple] = None
+
         # members unique to this object
         self._members: OrderedSet[NyanMember] = OrderedSet()
+        # time at which each member was added
+        self._member_times: dict[NyanMember, int] = {}
         if members:
             self._members.update(members)
 
+            time = _next_inheritance_time()
+            for member in self._members:
+                self._member_times[member] = time
+
         # nested objects
         self._nested_objects: OrderedSet[NyanObject]  = OrderedSet()
         if nested_objects:
@@ -77,7 +127,11 @@ class NyanObject:
         # Set of children
         self._children: OrderedSet[NyanObject] = OrderedSet()
 
-        self._sanity_check()
+        # time at which the object inherits the members of its parents
+        self._inheritance_time = _next_inheritance_time()
+
+        if _VALIDATION_STATE["mode"] is ValidationMode.EAGER:
+            self._sanity_check()
 
         if len(self._parents) > 0:
             self._process_inheritance()
@@ -109,20 +163,11 @@ class NyanObject:
             raise Exception("added member must have <NyanMember> type")
 
         self._members.add(new_member)
+        self._member_times.setdefault(new_member, _next_inheritance_time())
 
-        # Update child objects
-        for child in self._children:
-            # Create a new member for every child with self as parent and origin
-            inherited_member = InheritedNyanMember(
-                new_member.get_name(),
-                new_member.get_member_type(),
-                self,
-                self,
-                None,
-                None,
-                0
-            )
-            child.update_inheritance(inherited_member)
+        if self._children:
+            # descendants inherit the new member
+            self._invalidate_descendants()
 
     def add_child(self, new_child: NyanObject) -> None:
         """
@@ -133,47 +178,16 @@ class NyanObject:
 
         self._children.add(new_child)
 
-        # Pass members and inherited members to the child object
-        for member in self._members:
-            # Create a new member with self as parent and origin
-            inherited_member = InheritedNyanMember(
-                member.get_name(),
-                member.get_member_type(),
-                self,
-                self,
-                None,
-                None,
-                0
-            )
-            new_child.update_inheritance(inherited_member)
-
-        for inherited in self._inherited_members:
-            # Create a new member with self as parent
-            inherited_member = InheritedNyanMember(
-                inherited.get_name(),
-                inherited.get_member_type(),
-                self,
-                inherited.get_origin(),
-                None,
-                None,
-                0
-            )
-            new_child.update_inheritance(inherited_member)
-
     def has_member(self, member_name: str, origin: NyanObject = None) -> bool:
         """
         Returns True if the NyanMember with the specified name exists.
         """
         if origin and origin is not self:
-            for inherited_member in self._inherited_members:
-                if origin == inherited_member.get_origin():
-                    if inherited_member.get_name() == member_name:
-                        return True
+            return (member_name, origin) in self._get_inheritance()
 
-        else:
-            for member in self._members:
-                if member.get_name() == member_name:
-                    return True
+        for member in self._members:
+            if member.get_name() == member_name:
+                return True
 
         return False
 
@@ -187,20 +201,37 @@ class NyanObject:
         """
         Returns all NyanMembers of the object, including inherited members.
         """
-        return self._members.union(self._inherited_members)
+        return self._members.union(self.get_member_by_name(member_name, origin)
+                                   for member_name, origin in self._get_inheritance())
 
     def get_member_by_name(self, member_name: str, origin: NyanObject = None) -> NyanMember:
         """
         Returns the NyanMember with the specified name.
         """
         if origin and origin is not self:
-            # Inherited member: Search in the inheritance tree
-            for inherited_member in self._inherited_members:
-                if origin == inherited_member.get_origin():
-                    if inherited_member.get_name() == member_name:
-                        return inherited_member
+            # Inherited member: Create it on first access
+            key = (member_name, origin)
+            if key in self._inherited_members:
+                return self._inherited_members[key]
 
-            raise Exception(f"{repr(self)} has no member '{member_name}' with origin '{origin}'")
+            inheritance = self._get_inheritance()
+            if key not in inheritance:
+                raise Exception(f"{repr(self)} has no member '{member_name}' "
+                                f"with origin '{origin}'")
+
+            parent, member_type, _, _ = inheritance[key]
+            inherited_member = InheritedNyanMember(
+                member_name,
+                member_type,
+                parent,
+                origin,
+                None,
+                None,
+                0
+            )
+            self._inherited_members[key] = inherited_member
+
+            return inherited_member
 
         # Else: Member should be a direct member of this nyan object
         for member in self._members:
@@ -214,10 +245,14 @@ class NyanObject:
         Returns all uninitialized NyanMembers of the object.
         """
         uninit_members = []
-        for member in self.get_members():
+        for member in self._members:
             if not member.is_initialized():
                 uninit_members.append(member)
 
+        for member_name, origin in self._get_inheritance():
+            if not self.is_member_initialized(member_name, origin):
+                uninit_members.append(self.get_member_by_name(member_name, origin))
+
         return uninit_members
 
     def get_name(self) -> str:
@@ -253,11 +288,43 @@ class NyanObject:
 
         return False
 
+    def is_member_initialized(self, member_name: str, origin: NyanObject = None) -> bool:
+        """
+        Returns True if the NyanMember with the specified name has a value
+        in this object or in the ancestors it is inherited from.
+
+        Other than get_member_by_name(), this does not create inherited members.
+        """
+        # pylint: disable=protected-access
+        current_object = self
+        while origin and origin is not current_object:
+            key = (member_name, origin)
+            inherited_member = current_object._inherited_members.get(key)
+            if inherited_member is not None and inherited_member.has_value():
+                return True
+
+            inheritance = current_object._get_inheritance()
+            if key not in inheritance:
+                raise Exception(f"{repr(current_object)} has no member '{member_name}' "
+                                f"with origin '{origin}'")
+
+            current_object = inheritance[key][0]
+
+        return current_object.get_member_by_name(member_name).is_initialized()
+
     def is_abstract(self) -> bool:
         """
         Returns True if any unique or inherited members are uninitialized.
         """
-        return len(self.get_uninitialized_members()) > 0
+        for member in self._members:
+            if not member.is_initialized():
+                return True
+
+        for member_name, origin in self._get_inheritance():
+            if not self.is_member_initialized(member_name, origin):
+                return True
+
+        return False
 
     @staticmethod
     def is_patch() -> bool:
@@ -284,75 +351,59 @@ class NyanObject:
             nested_fqon = (*new_fqon, nested_object.get_name())
             nested_object.set_fqon(nested_fqon)
 
-    def update_inheritance(self, new_inherited_member: InheritedNyanMember) -> None:
+    def dump(self, indent_depth: int = 0, import_tree: ImportTree = None) -> str:
         """
-        Add an inherited member to the object. Should only be used by
-        parent objects.
+        Returns the string representation of the object.
         """
-        if not self.has_ancestor(new_inherited_member.get_origin()):
-            raise Exception(f"{repr(self)}: cannot add inherited member "
-                            f"{new_inherited_member} because "
-                            f"{new_inherited_member.get_origin()} is not "
-                            f"an ancestor of {repr(self)}")
+        stream = io.StringIO()
+        self.dump_to(stream, indent_depth, import_tree=import_tree)
 
-        if not isinstance(new_inherited_member, InheritedNyanMember):
-            raise Exception("added member must have <InheritedNyanMember> type")
+        return stream.getvalue()
 
-        # Only add it, if it was not inherited before
-        if not self.has_member(new_inherited_member.get_name(),
-                               new_inherited_member.get_origin()):
-            self._inherited_members.add(new_inherited_member)
-
-        # Update child objects
-        for child in self._children:
-            # Create a new member for every child with self as parent
-            inherited_member = InheritedNyanMember(
-                new_inherited_member.get_name(),
-                new_inherited_member.get_member_type(),
-                self,
-                new_inherited_member.get_origin(),
-                None,
-                None,
-                0
-            )
-            child.update_inheritance(inherited_member)
-
-    def dump(self, indent_depth: int = 0, import_tree: ImportTree = None) -> str:
+    def dump_to(
+        self,
+        stream: typing.TextIO,
+        indent_depth: int = 0,
+        import_tree: ImportTree = None
+    ) -> None:
         """
-        Returns the string representation of the object.
+        Writes the string representation of the object to a text stream.
         """
         # Header
-        output_str = f"{self.get_name()}"
+        stream.write(self.get_name())
 
-        output_str += self._prepare_inheritance_content(import_tree=import_tree)
+        stream.write(self._prepare_inheritance_content(import_tree=import_tree))
 
         # Members
-        output_str += self._prepare_object_content(indent_depth, import_tree=import_tree)
-
-        return output_str
+        self._write_object_content(stream, indent_depth, import_tree=import_tree)
 
-    def _prepare_object_content(self, indent_depth: int, import_tree: ImportTree = None) -> None:
+    def _write_object_content(
+        self,
+        stream: typing.TextIO,
+        indent_depth: int,
+        import_tree: ImportTree = None
+    ) -> None:
         """
-        Returns a string containing the nyan object's content
-        (members, nested objects).
+        Writes the nyan object's content (members, nested objects)
+        to a text stream.
 
-        Subroutine of dump().
+        Subroutine of dump_to().
         """
-        output_str = ""
         empty = True
 
         if len(self._inherited_members) > 0:
-            for inherited_member in self._inherited_members:
-                if inherited_member.has_value():
+            for key in self._get_inheritance():
+                inherited_member = self._inherited_members.get(key)
+                if inherited_member is not None and inherited_member.has_value():
                     empty = False
                     member_str = inherited_member.dump(
                         indent_depth + 1,
                         import_tree=import_tree,
                         namespace=self.get_fqon()
                     )
-                    output_str += f"{(indent_depth + 1) * INDENT}{member_str}\n"
+                    stream.write(f"{(indent_depth + 1) * INDENT}{member_str}\n")
             if not empty:
-                output_str += "\n"
+                stream.write("\n")
 
         if len(self._members) > 0:
             empty = False
@@ -372,27 +423,27 @@ class NyanObject:
                         namespace=self.get_fqon()
                     )
 
-                output_str += f"{(indent_depth + 1) * INDENT}{member_str}\n"
+                stream.write(f"{(indent_depth + 1) * INDENT}{member_str}\n")
 
-            output_str += "\n"
+            stream.write("\n")
 
         # Nested objects
         if len(self._nested_objects) > 0:
             empty = False
             for nested_object in self._nested_objects:
-                nested_str = nested_object.dump(
+                stream.write((indent_depth + 1) * INDENT)
+                nested_object.dump_to(
+                    stream,
                     indent_depth + 1,
                     import_tree=import_tree
                 )
-                output_str += f"{(indent_depth + 1) * INDENT}{nested_str}\n"
+                stream.write("\n")
 
-            output_str += "\n"
+            stream.write("\n")
 
         # Empty objects need a 'pass' line
         if empty:
-            output_str += f"{(indent_depth + 1) * INDENT}pass\n\n"
-
-        return output_str
+            stream.write(f"{(indent_depth + 1) * INDENT}pass\n\n")
 
     def _prepare_inheritance_content(self, import_tree: ImportTree = None) -> None:
         """
@@ -422,6 +473,76 @@ class NyanObject:
 
         return output_str
 
+    def _get_inheritance(
+        self
+    ) -> dict[tuple[str, NyanObject], tuple[NyanObject, NyanMemberType, int, tuple[int]]]:
+        """
+        Returns the members inherited from the parents as
+        (name, origin) -> (parent, member type, time, path)
+        in the order they are inherited.
+
+        Members that already exist when the object is created are
+        inherited in the order of the parents. Members that are added
+        to ancestors afterwards follow in the order they were added.
+        Such a member is inherited from the parent on the first path
+        from its origin through the children of each object, which
+        is described by the inheritance times of the objects on the path.
+        """
+        if self._inheritance is not None:
+            return self._inheritance
+
+        inheritance = {}
+        added_later = []
+        for parent in self._parents:
+            # pylint: disable=protected-access
+            for key, member_type, time, path in parent._get_inheritable_members():
+                if key in inheritance:
+                    continue
+
+                if time < self._inheritance_time:
+                    inheritance[key] = (parent, member_type, time, None)
+
+                else:
+                    added_later.append((time, path + (self._inheritance_time,),
+                                        key, parent, member_type))
+
+        added_later.sort(key=lambda item: item[:2])
+        for time, path, key, parent, member_type in added_later:
+            inheritance.setdefault(key, (parent, member_type, time, path))
+
+        self._inheritance = inheritance
+
+        return inheritance
+
+    def _invalidate_descendants(self) -> None:
+        """
+        Discard the resolved inheritance of all descendants.
+
+        Resolving an object resolves its ancestors, so the descendants
+        of an unresolved object are unresolved as well and are skipped.
+        """
+        # pylint: disable=protected-access
+        unchecked_objects = list(self._children)
+        while unchecked_objects:
+            nyan_object = unchecked_objects.pop()
+            if nyan_object._inheritance is None:
+                continue
+
+            nyan_object._inheritance = None
+            unchecked_objects.extend(nyan_object._children)
+
+    def _get_inheritable_members(self) -> typing.Generator[tuple, None, None]:
+        """
+        Yields the members that children inherit from this object as
+        ((name, origin), member type, time, path).
+        """
+        for member in self._members:
+            yield (member.get_name(), self), member.get_member_type(),\
+                self._member_times[member], ()
+
+        for key, (_, member_type, time, path) in self._get_inheritance().items():
+            yield key, member_type, time, path
+
     def _process_inheritance(self) -> None:
         """
         Notify parents of the object.
@@ -439,7 +560,7 @@ class NyanObject:
             raise Exception(f"{repr(self)}: 'name' must be a string")
 
         # self.name must conform to nyan grammar rules
-        if not re.fullmatch(r"[a-zA-Z_][a-zA-Z0-9_]*", self.name):
+        if not is_valid_name(self.name):
             raise Exception(f"{repr(self)}: 'name' is not well-formed")
 
         # self._parents must be NyanObjects
@@ -522,12 +643,17 @@ class NyanPatch(NyanObject):
         if not isinstance(self._target, NyanObject):
             raise Exception(f"{repr(self)}: '_target' must have NyanObject type")
 
-    def dump(self, indent_depth: int = 0, import_tree: ImportTree = None) -> str:
+    def dump_to(
+        self,
+        stream: typing.TextIO,
+        indent_depth: int = 0,
+        import_tree: ImportTree = None
+    ) -> None:
         """
-        Returns the string representation of the object.
+        Writes the string representation of the object to a text stream.
         """
         # Header
-        output_str = f"{self.get_name()}"
+        stream.write(self.get_name())
 
         if import_tree:
             sfqon = ".".join(import_tree.get_alias_fqon(self._target.get_fqon()))
@@ -535,32 +661,29 @@ class NyanPatch(NyanObject):
         else:
             sfqon = ".".join(self._target.get_fqon())
 
-        output_str += f"<{sfqon}>"
+        stream.write(f"<{sfqon}>")
 
         if len(self._add_inheritance) > 0:
-            output_str += "["
+            inheritance_strs = []
 
-            for new_inheritance in self._add_inheritance:
+            for mode, new_inheritance in self._add_inheritance:
                 if import_tree:
                     sfqon = ".".join(import_tree.get_alias_fqon(new_inheritance.get_fqon()))
 
                 else:
                     sfqon = ".".join(new_inheritance.get_fqon())
 
-                if new_inheritance[0] == "FRONT":
-                    output_str += f"+{sfqon}, "
-                elif new_inheritance[0] == "BACK":
-                    output_str += f"{sfqon}+, "
+                if mode == "FRONT":
+                    inheritance_strs.append(f"+{sfqon}")
+                elif mode == "BACK":
+                    inheritance_strs.append(f"{sfqon}+")
 
-            output_str = output_str[:-2] + "]"
+            stream.write(f"[{', '.join(inheritance_strs)}]")
 
-        output_str += super()._prepare_inheritance_content(import_tree = import_tree)
+        stream.write(super()._prepare_inheritance_content(import_tree = import_tree))
 
         # Members
-        output_str += super()._prepare_object_content(indent_depth = indent_depth,
-                                                      import_tree = import_tree)
-
-        return output_str
+        super()._write_object_content(stream, indent_depth, import_tree = import_tree)
 
     def _sanity_check(self) -> None:
         """
@@ -621,7 +744,8 @@ class NyanMemberType:
             self._element_types = tuple(element_types)
 
         # check for errors in the initilization
-        self._sanity_check()
+        if _VALIDATION_STATE["mode"] is ValidationMode.EAGER:
+            self._sanity_check()
 
     def get_type(self) -> MemberType:
         """
@@ -725,54 +849,12 @@ class NyanMemberType:
         if self.is_modifier():
             return self._element_types[0].accepts_op(operator)
 
-        if self._member_type in (MemberType.INT, MemberType.FLOAT)\
-            and operator not in (MemberOperator.ASSIGN,
-                                 MemberOperator.ADD,
-                                 MemberOperator.SUBTRACT,
-                                 MemberOperator.MULTIPLY,
-                                 MemberOperator.DIVIDE):
-            return False
-
-        if self._member_type is MemberType.TEXT\
-                and operator not in (MemberOperator.ASSIGN,
-                                     MemberOperator.ADD):
-            return False
-
-        if self._member_type is MemberType.FILE\
-                and operator is not MemberOperator.ASSIGN:
-            return False
-
-        if self._member_type is MemberType.BOOLEAN\
-                and operator not in (MemberOperator.ASSIGN,
-                                     MemberOperator.AND,
-                                     MemberOperator.OR):
-            return False
-
-        if self._member_type is MemberType.SET\
-                and operator not in (MemberOperator.ASSIGN,
-                                     MemberOperator.ADD,
-                                     MemberOperator.SUBTRACT,
-                                     MemberOperator.AND,
-                                     MemberOperator.OR):
-            return False
+        accepted_ops = ACCEPTED_OPERATORS.get(self._member_type)
+        if accepted_ops is None:
+            # object types accept all operators
+            return True
 
-        if self._member_type is MemberType.ORDEREDSET\
-                and operator not in (MemberOperator.ASSIGN,
-                                     MemberOperator.ADD,
-                                     MemberOperator.SUBTRACT,
-                                     MemberOperator.AND,
-                                     MemberOperator.OR):
-            return False
-
-        if self._member_type is MemberType.DICT\
-                and operator not in (MemberOperator.ASSIGN,
-                                     MemberOperator.ADD,
-                                     MemberOperator.SUBTRACT,
-                                     MemberOperator.AND,
-                                     MemberOperator.OR):
-            return False
-
-        return True
+        return operator in accepted_ops
 
     def accepts_value(self, value) -> bool:
         """
@@ -893,7 +975,8 @@ class NyanMember:
             self.set_value(value, operator)
 
         # check for errors in the initilization
-        self._sanity_check()
+        if _VALIDATION_STATE["mode"] is ValidationMode.EAGER:
+            self._sanity_check()
 
     def get_name(self) -> str:
         """
@@ -977,7 +1060,8 @@ class NyanMember:
         if self.value not in (MemberSpecialValue.NYAN_INF, MemberSpecialValue.NYAN_NONE):
             self._type_conversion()
 
-        self._sanity_check()
+        if _VALIDATION_STATE["mode"] is ValidationMode.EAGER:
+            self._sanity_check()
 
     def dump(
         self,
@@ -1027,7 +1111,7 @@ class NyanMember:
             raise Exception(f"{repr(self)}: 'name' must be a string")
 
         # self.name must conform to nyan grammar rules
-        if not re.fullmatch(r"[a-zA-Z_][a-zA-Z0-9_]*", self.name[0]):
+        if not is_valid_name(self.name[0]):
             raise Exception(f"{repr(self)}: 'name' is not well-formed")
 
         if (self.is_initialized() and not self.is_inherited()) or\
@@ -1190,25 +1274,14 @@ class NyanMember:
             values_per_line = space_left // longest_len
             values_per_line = max(values_per_line, 1)
 
-            output_str += (indent_depth + 2) * INDENT
-
-            val_index = 0
-            end_index = len(stored_values)
-            for val in stored_values:
-                val_index += 1
-                output_str += val
-
-                if val_index % values_per_line == 0:
-                    output_str += ",\n"
-
-                    if val_index != end_index:
-                        output_str += ((indent_depth + 2) * INDENT)
-
-                else:
-                    output_str += ", "
+            lines = (
+                ", ".join(stored_values[line_start:line_start + values_per_line])
+                for line_start in range(0, len(stored_values), values_per_line)
+            )
 
-            output_str = output_str[:-2] + "\n"
-            output_str += ((indent_depth + 1) * INDENT)
+            output_str += (indent_depth + 2) * INDENT
+            output_str += f",\n{(indent_depth + 2) * INDENT}".join(lines)
+            output_str += "\n" + ((indent_depth + 1) * INDENT)
 
         output_str = output_str + "}"
 
@@ -1407,7 +1480,7 @@ class InheritedNyanMember(NyanMember):
         Returns True if self or the parent is initialized.
         """
         return super().is_initialized() or\
-            self._parent.get_member_by_name(self.name, self._origin).is_initialized()
+            self._parent.is_member_initialized(self.name, self._origin)
 
     def dump(
         self,
@@ -1503,3 +1576,130 @@ class MemberOperator(Enum):
     DIVIDE    = "/="     # division
     AND       = "&="     # logical AND, intersect
     OR        = "|="     # logical OR, union
+
+
+# Operators that are compatible with primitive and complex member types
+ACCEPTED_OPERATORS: dict[MemberType, frozenset[MemberOperator]] = {
+    MemberType.INT: frozenset((MemberOperator.ASSIGN,
+                               MemberOperator.ADD,
+                               MemberOperator.SUBTRACT,
+                               MemberOperator.MULTIPLY,
+                               MemberOperator.DIVIDE)),
+    MemberType.FLOAT: frozenset((MemberOperator.ASSIGN,
+                                 MemberOperator.ADD,
+                                 MemberOperator.SUBTRACT,
+                                 MemberOperator.MULTIPLY,
+                                 MemberOperator.DIVIDE)),
+    MemberType.TEXT: frozenset((MemberOperator.ASSIGN,
+                                MemberOperator.ADD)),
+    MemberType.FILE: frozenset((MemberOperator.ASSIGN,)),
+    MemberType.BOOLEAN: frozenset((MemberOperator.ASSIGN,
+                                   MemberOperator.AND,
+                                   MemberOperator.OR)),
+    MemberType.SET: frozenset((MemberOperator.ASSIGN,
+                               MemberOperator.ADD,
+                               MemberOperator.SUBTRACT,
+                               MemberOperator.AND,
+                               MemberOperator.OR)),
+    MemberType.ORDEREDSET: frozenset((MemberOperator.ASSIGN,
+                                      MemberOperator.ADD,
+                                      MemberOperator.SUBTRACT,
+                                      MemberOperator.AND,
+                                      MemberOperator.OR)),
+    MemberType.DICT: frozenset((MemberOperator.ASSIGN,
+                                MemberOperator.ADD,
+                                MemberOperator.SUBTRACT,
+                                MemberOperator.AND,
+                                MemberOperator.OR)),
+}
+
+
+class ValidationMode(Enum):
+    """
+    Modes for checking nyan objects and members.
+    """
+
+    EAGER    = "eager"      # check on construction and when values are set
+    DEFERRED = "deferred"   # check with validate_nyan_objects() before export
+    OFF      = "off"        # never check
+
+
+# Validation mode used by all nyan structs
+_VALIDATION_STATE: dict[str, ValidationMode] = {
+    "mode": ValidationMode.EAGER,
+}
+
+
+def get_validation_mode() -> ValidationMode:
+    """
+    Returns the current validation mode.
+    """
+    return _VALIDATION_STATE["mode"]
+
+
+def set_validation_mode(mode: typing.Union[str, ValidationMode]) -> None:
+    """
+    Set the validation mode for nyan structs that are created
+    or changed afterwards.
+
+    :param mode: "eager", "deferred" or "off".
+    :type mode: str, ValidationMode
+    """
+    _VALIDATION_STATE["mode"] = ValidationMode(mode)
+
+
+def validate_nyan_objects(nyan_objects: typing.Iterable[NyanObject]) -> None:
+    """
+    Check the objects, their nested objects and their members in one
+    pass. This does the same checks as the eager validation, but only
+    once per object and once per structurally equal member type.
+
+    :param nyan_objects: Finished objects, e.g. all objects of a modpack.
+    :type nyan_objects: Iterable[NyanObject]
+    """
+    # pylint: disable=protected-access
+    checked_objects = set()
+    checked_types = set()
+
+    unchecked_objects = deque(nyan_objects)
+    while unchecked_objects:
+        nyan_object = unchecked_objects.popleft()
+        if id(nyan_object) in checked_objects:
+            continue
+
+        checked_objects.add(id(nyan_object))
+        nyan_object._sanity_check()
+
+        for member in chain(nyan_object._members, nyan_object._inherited_members.values()):
+            unchecked_types = [member.get_member_type()]
+            while unchecked_types:
+                member_type = unchecked_types.pop()
+                type_key = _get_type_key(member_type)
+                if type_key in checked_types:
+                    # the element types are part of the key,
+                    # so they have been checked as well
+                    continue
+
+                checked_types.add(type_key)
+                member_type._sanity_check()
+
+                if member_type.get_element_types():
+                    unchecked_types.extend(member_type.get_element_types())
+
+            member._sanity_check()
+
+        unchecked_objects.extend(nyan_object.get_nested_objects())
+
+
+def _get_type_key(member_type: NyanMemberType) -> tuple:
+    """
+    Returns a key for the structure of a member type, i.e. the
+    type and the keys of its element types. Member types with
+    the same key pass or fail the same sanity checks.
+    """
+    element_types = member_type.get_element_types()
+    if not element_types:
+        return (member_type.get_type(), None)
+
+    return (member_type.get_type(),
+            tuple(_get_type_key(element_type) for element_type in element_types))
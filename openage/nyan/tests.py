@@ -0,0 +1,48 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+""" Testing code for the openage.nyan package. """
+
+from ..testing.testing import assert_value
+from .nyan_structs import NyanObject, NyanMember, NyanMemberType, MemberOperator,\
+    MemberType
+
+
+def _create_member(name: str) -> NyanMember:
+    """ Returns an int member without a value. """
+    return NyanMember(name, NyanMemberType(MemberType.INT))
+
+
+def test_lazy_inheritance() -> None:
+    """ Tests the lazy resolution of inherited members """
+    # pylint: disable=protected-access
+    root = NyanObject("Root", members=[_create_member("a")])
+    child = NyanObject("Child", parents=[root])
+    grandchild = NyanObject("GrandChild", parents=[child])
+    unrelated = NyanObject("Unrelated", parents=[root])
+
+    # inherited members are only created when they are accessed
+    assert_value(grandchild.has_member("a", root), True)
+    assert_value(len(grandchild._inherited_members), 0)
+    assert_value(grandchild.is_member_initialized("a", root), False)
+    assert_value(len(grandchild._inherited_members), 0)
+
+    child.get_member_by_name("a", root).set_value(1, MemberOperator.ASSIGN)
+    assert_value(grandchild.is_member_initialized("a", root), True)
+
+    member = grandchild.get_member_by_name("a", root)
+    assert_value(member.get_parent(), child)
+    assert_value(grandchild.get_member_by_name("a", root), member)
+
+    # members added later are inherited by the descendants only
+    unrelated.get_members()
+    child.add_member(_create_member("b"))
+    assert_value(unrelated._inheritance is not None, True)
+    assert_value(grandchild._inheritance, None)
+    assert_value(unrelated.has_member("b", child), False)
+    assert_value(grandchild.has_member("b", child), True)
+
+    root.add_member(_create_member("c"))
+    assert_value(unrelated.has_member("c", root), True)
+    assert_value([(member.get_name(), member.get_origin().get_name())
+                  for member in grandchild.get_members()],
+                 [("a", "Root"), ("b", "Child"), ("c", "Root")])
@@ -0,0 +1,179 @@
+# Copyright 2022-2022 the openage authors. See copying.md for legal info.
+
+"""
+Benchmarks OrderedSet against the previous implementation, which stored
+the index of every element and updated all indices when elements were
+added to the front or removed.
+
+The workload resembles the use in nyan objects: many small sets that
+get elements added at both ends, some removed, and are iterated.
+"""
+
+from typing import Hashable
+
+from ..util.ordered_set import OrderedSet
+from .testing import assert_value
+
+
+# Number of sets and elements per set in one benchmark run
+SET_COUNT = 200
+SET_SIZE = 100
+
+
+class IndexedOrderedSet:
+    """
+    Previous OrderedSet implementation with an element -> index dict.
+    """
+
+    __slots__ = ('ordered_set',)
+
+    def __init__(self, elements: Hashable = None):
+        self.ordered_set = {}
+
+        if elements:
+            self.update(elements)
+
+    def add(self, elem: Hashable) -> None:
+        """
+        Set-like add that calls append_right().
+        """
+        self.append_right(elem)
+
+    def append_left(self, elem: Hashable) -> None:
+        """
+        Add an element to the front of the set.
+        """
+        if elem not in self.ordered_set:
+            temp_set = {elem: 0}
+
+            for key in self.ordered_set:
+                self.ordered_set[key] += 1
+
+            temp_set.update(self.ordered_set)
+            self.ordered_set = temp_set
+
+    def append_right(self, elem: Hashable) -> None:
+        """
+        Add an element to the back of the set.
+        """
+        if elem not in self.ordered_set:
+            self.ordered_set[elem] = len(self)
+
+    def discard(self, elem: Hashable) -> None:
+        """
+        Remove an element from the set.
+        """
+        index = self.ordered_set.pop(elem, -1)
+
+        if index > -1:
+            for key, value in self.ordered_set.items():
+                if value > index:
+                    self.ordered_set[key] -= 1
+
+    def index(self, elem: Hashable) -> int:
+        """
+        Returns the index of the element in the set or
+        -1 if it is not in the set.
+        """
+        return self.ordered_set.get(elem, -1)
+
+    def update(self, other) -> None:
+        """
+        Append the elements of another iterable to the right.
+        """
+        for elem in other:
+            self.append_right(elem)
+
+    def __contains__(self, elem):
+        return elem in self.ordered_set
+
+    def __iter__(self):
+        return iter(self.ordered_set.keys())
+
+    def __len__(self):
+        return len(self.ordered_set)
+
+
+def run_workload(set_type: type) -> int:
+    """
+    Run the benchmark workload with an ordered set type.
+    Returns a checksum of the results.
+    """
+    checksum = 0
+
+    for set_index in range(SET_COUNT):
+        elements = set_type(range(SET_SIZE // 2))
+
+        for elem in range(SET_SIZE // 2, SET_SIZE):
+            if elem % 4 == 0:
+                elements.append_left(elem)
+
+            else:
+                elements.append_right(elem)
+
+        for elem in range(set_index % 7, SET_SIZE, 7):
+            elements.discard(elem)
+
+        for elem in elements:
+            checksum += elem
+
+        checksum += elements.index(SET_SIZE - 1) + len(elements)
+
+    return checksum
+
+
+def benchmark_ordered_set() -> None:
+    """
+    Run the workload with OrderedSet.
+    """
+    run_workload(OrderedSet)
+
+
+def benchmark_indexed_ordered_set() -> None:
+    """
+    Run the workload with the previous OrderedSet implementation.
+    """
+    run_workload(IndexedOrderedSet)
+
+
+def _compare_sets(ordered_set: OrderedSet, indexed_set: IndexedOrderedSet) -> None:
+    """
+    Check that both sets store the same elements in the same order.
+    """
+    expected = list(indexed_set)
+
+    assert_value(list(ordered_set), expected)
+    assert_value(list(reversed(ordered_set)), expected[::-1])
+    assert_value(len(ordered_set), len(expected))
+
+    for elem in range(-1, SET_SIZE + 1):
+        assert_value(ordered_set.index(elem), indexed_set.index(elem))
+
+
+def test() -> None:
+    """
+    Both implementations must store the elements in the same order.
+    """
+    for set_index in range(SET_COUNT // 10):
+        ordered_set = OrderedSet(range(SET_SIZE // 2))
+        indexed_set = IndexedOrderedSet(range(SET_SIZE // 2))
+        _compare_sets(ordered_set, indexed_set)
+
+        # the indices computed above are updated by append_right()
+        for elem in range(SET_SIZE // 2, SET_SIZE):
+            if elem % (set_index + 2) == 0:
+                ordered_set.append_left(elem)
+                indexed_set.append_left(elem)
+
+            else:
+                ordered_set.append_right(elem)
+                indexed_set.append_right(elem)
+
+            if elem % 10 == 0:
+                _compare_sets(ordered_set, indexed_set)
+
+        for elem in range(set_index % 7, SET_SIZE, 7):
+            ordered_set.discard(elem)
+            indexed_set.discard(elem)
+
+        _compare_sets(ordered_set, indexed_set)
@@ -1,4 +1,4 @@
-# Copyright 2015-2021 the openage authors. See copying.md for legal info.
+# Copyright 2015-2022 the openage authors. See copying.md for legal info.
 
 """ Lists of all possible tests; enter your tests here. """
 
@@ -9,6 +9,7 @@ def doctest_modules():
     """
 
     yield "openage.util.math"
+    yield "openage.util.ordered_set"
     yield "openage.util.strings"
     yield "openage.util.system"
 
@@ -27,11 +28,21 @@ def tests_py():
     yield ("openage.cabextract.test.test", "test CAB archive extraction",
            lambda env: env["has_assets"])
     yield "openage.convert.service.init.changelog.test"
+    yield ("openage.convert.service.read.nyan_api_snapshot.test",
+           "load the nyan API objects from a snapshot")
+    yield ("openage.convert.value_object.read.columnar_table.test",
+           "store the records of a dat section in columns")
+    yield ("openage.convert.value_object.read.value_members.test",
+           "diff members with colliding values")
     yield "openage.cppinterface.exctranslate_tests.cpp_to_py"
     yield ("openage.cppinterface.exctranslate_tests.cpp_to_py_bounce",
            "translates the exception back and forth a few times")
+    yield ("openage.nyan.tests.test_lazy_inheritance",
+           "resolve inherited nyan members on access")
     yield ("openage.testing.misc_cpp.enum",
            "tests the interface for C++'s util::Enum class")
+    yield ("openage.testing.ordered_set_benchmark.test",
+           "compare OrderedSet with its previous implementation")
     yield ("openage.util.fslike.test.test",
            "test the filesystem abstraction subsystem")
     yield "openage.util.threading.test_concurrent_chain"
@@ -65,6 +76,10 @@ def benchmark_py():
     # TODO Add a real benchmark here, and remove this one
     yield ("openage.testing.benchmark.benchmark_test_function",
            "Benchmark yourself")
+    yield ("openage.testing.ordered_set_benchmark.benchmark_ordered_set",
+           "OrderedSet operations used by nyan objects")
+    yield ("openage.testing.ordered_set_benchmark.benchmark_indexed_ordered_set",
+           "same operations with the previous OrderedSet implementation")
 
 
 def tests_cpp():
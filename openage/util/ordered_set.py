@@ -6,7 +6,7 @@ Python dictionaries as a basis because they are guaranteed to
 be ordered since Python 3.6.
 """
 
-
+from itertools import chain
 from typing import Generic, Hashable, TypeVar
 
 OrderedSetItem = TypeVar("OrderedSetItem")
@@ -15,12 +15,33 @@ OrderedSetItem = TypeVar("OrderedSetItem")
 class OrderedSet(Generic[OrderedSetItem]):
     """
     Set that saves the input order of elements.
+
+    Elements added to the front are stored in reverse order in a
+    second dict, so adding elements at both ends and removing them
+    does not depend on the size of the set. Indices are only computed
+    when they are requested.
+
+    >>> elements = OrderedSet((2, 3))
+    >>> elements.append_left(1)
+    >>> elements.add(4)
+    >>> elements.discard(3)
+    >>> elements.get_list()
+    [1, 2, 4]
+    >>> elements.index(4)
+    2
     """
 
-    __slots__ = ('ordered_set',)
+    __slots__ = ('_front', '_back', '_indices')
 
     def __init__(self, elements: Hashable = None):
-        self.ordered_set = {}
+        # elements added to the front, in reverse order
+        self._front: dict[Hashable, None] = {}
+
+        # elements added to the back
+        self._back: dict[Hashable, None] = {}
+
+        # element -> index, created by index()
+        self._indices: dict[Hashable, int] = None
 
         if elements:
             self.update(elements)
@@ -35,92 +56,101 @@ class OrderedSet(Generic[OrderedSetItem]):
         """
         Add an element to the front of the set.
         """
-        if elem not in self.ordered_set:
-            temp_set = {elem: 0}
-
-            # Update indices
-            for key in self.ordered_set:
-                self.ordered_set[key] += 1
-
-            temp_set.update(self.ordered_set)
-            self.ordered_set = temp_set
+        if elem not in self._back and elem not in self._front:
+            self._front[elem] = None
+            self._indices = None
 
     def append_right(self, elem: Hashable) -> None:
         """
         Add an element to the back of the set.
         """
-        if elem not in self.ordered_set:
-            self.ordered_set[elem] = len(self)
+        if elem not in self._back and elem not in self._front:
+            self._back[elem] = None
+
+            if self._indices is not None:
+                # the indices of the other elements do not change
+                self._indices[elem] = len(self._indices)
 
     def discard(self, elem: Hashable) -> None:
         """
         Remove an element from the set.
         """
-        index = self.ordered_set.pop(elem, -1)
+        if elem in self._back:
+            del self._back[elem]
 
-        if index > -1:
-            # Update indices
-            for key, value in self.ordered_set.items():
-                if value > index:
-                    self.ordered_set[key] -= 1
+        elif elem in self._front:
+            del self._front[elem]
+
+        else:
+            return
+
+        self._indices = None
 
     def get_list(self) -> list:
         """
         Returns a normal list containing the values from the ordered set.
         """
-        return list(self.ordered_set.keys())
+        return list(self)
 
     def index(self, elem: Hashable) -> int:
         """
         Returns the index of the element in the set or
         -1 if it is not in the set.
         """
-        if elem in self.ordered_set:
-            return self.ordered_set[elem]
+        if self._indices is None:
+            self._indices = {key: index for index, key in enumerate(self)}
 
-        return -1
+        return self._indices.get(elem, -1)
 
     def intersection_update(self, other):
         """
         Only keep elements that are both in self and other.
         """
-        keys_self = set(self.ordered_set.keys())
-        keys_other = set(other.keys())
-        intersection = keys_self & keys_other
-
-        for elem in self:
-            if elem not in intersection:
-                self.discard(elem)
+        for elem in [elem for elem in self if elem not in other]:
+            self.discard(elem)
 
     def union(self, other):
         """
         Returns a new ordered set with the elements from self and other.
         """
-        element_list = self.get_list() + other.get_list()
-        return OrderedSet(element_list)
+        result = OrderedSet()
+        result._back = dict.fromkeys(chain(self, other))  # pylint: disable=protected-access
+
+        return result
 
     def update(self, other) -> None:
         """
         Append the elements of another iterable to the right of the
         ordered set.
         """
+        front = self._front
+        back = self._back
         for elem in other:
-            self.append_right(elem)
+            if elem not in front:
+                back.setdefault(elem)
+
+        self._indices = None
 
     def __contains__(self, elem):
-        return elem in self.ordered_set
+        return elem in self._back or elem in self._front
 
     def __iter__(self):
-        return iter(self.ordered_set.keys())
+        if self._front:
+            return chain(reversed(self._front), self._back)
+
+        return iter(self._back)
 
     def __len__(self):
-        return len(self.ordered_set)
+        return len(self._front) + len(self._back)
 
     def __reversed__(self):
-        return reversed(self.ordered_set.keys())
+        if self._front:
+            return chain(reversed(self._back), self._front)
+
+        return reversed(self._back)
 
     def __str__(self):
-        return f'OrderedSet({list(self.ordered_set.keys())})'
+        return f'OrderedSet({list(self)})'
 
     def __repr__(self):
         return str(self)